@@ -0,0 +1,232 @@
+"""
+Read replica routing with read-your-writes stickiness.
+
+``ReplicaRouter`` sends reads to the aliases in ``READ_REPLICAS['ALIASES']``
+only while a request is being handled by a view that opts in: views with
+``replica_reads = True`` for GET, HEAD and OPTIONS, and GraphQL queries
+(see ``replica_reads``). Everything else (writes, reads inside a
+transaction, mutations, Celery tasks, commands) uses the primary.
+
+Each request reads from one replica, taken in turn and skipping any that
+failed a health check in the last ``HEALTH_CHECK_INTERVAL`` seconds. A request that wrote anything makes
+its user sticky for ``STICKY_SECONDS``: their reads go to the primary until
+the replicas have caught up, so editors see their own changes. Stickiness
+is kept in the default cache. A per-process backend (LocMemCache,
+DummyCache) cannot tell one process about another's writers, so with one
+every authenticated user reads from the primary.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 10,
+    'HEALTH_CHECK_INTERVAL': 30,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'db:sticky:{}'
+
+
+def replica_setting(name):
+    return getattr(settings, 'READ_REPLICAS', {}).get(name, DEFAULTS[name])
+
+
+class RequestReads:
+    """Where the reads of the request being handled may go, and whether it wrote."""
+
+    def __init__(self, request):
+        self.request = request
+        self.allowed = None
+        self.wrote = False
+        self.sticky = None
+        self.resolving = False
+        # One replica per request, so its reads see one snapshot
+        self.replica = None
+
+    def replica_allowed(self):
+        if self.allowed is None:
+            match = self.request.resolver_match
+            if match is None:
+                return False
+            # DRF's viewsets only set ``cls``
+            view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+            self.allowed = self.request.method in SAFE_METHODS and getattr(view_class, 'replica_reads', False)
+        return self.allowed and not self.wrote and not self.is_sticky()
+
+    def is_sticky(self):
+        if self.sticky is not None:
+            return self.sticky
+        if self.resolving:
+            # Queries made while finding the user (sessions, a database cache)
+            return True
+        self.resolving = True
+        try:
+            user = getattr(self.request, 'user', None)
+            if user is None or not user.is_authenticated:
+                # Not remembered: DRF may authenticate the request later on
+                return False
+            if isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache)):
+                # The user may have written through another process
+                self.sticky = True
+            else:
+                self.sticky = cache.get(STICKY_KEY.format(user.pk)) is not None
+        finally:
+            self.resolving = False
+        return self.sticky
+
+
+# The request being handled; copied into the worker threads of async views
+current_reads = ContextVar('current_reads', default=None)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Allow (or forbid) replica reads for the rest of the block, whatever the view says."""
+    reads = current_reads.get()
+    if reads is None:
+        yield
+        return
+    previous, reads.allowed = reads.allowed, allowed
+    try:
+        yield
+    finally:
+        reads.allowed = previous
+
+
+def _usable(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            # A SQLite stand-in without the schema would open as an empty file
+            cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        return True
+    except DatabaseError:
+        return False
+
+
+class ReplicaPool:
+    """Round robin over replica aliases, skipping those whose last health check failed."""
+
+    def __init__(self, aliases, check_interval):
+        self.aliases = list(aliases)
+        self.check_interval = check_interval
+        self.turn = itertools.count()
+        self.checked = {}
+        self.healthy = {}
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            due = now - self.checked.get(alias, float('-inf')) >= self.check_interval
+            if due:
+                # Other threads keep the last verdict while this one checks
+                self.checked[alias] = now
+        if due:
+            self.healthy[alias] = _usable(alias)
+        return self.healthy.get(alias, False)
+
+    def choose(self):
+        """A healthy replica alias, or None to read from the primary."""
+        for _ in range(len(self.aliases)):
+            alias = self.aliases[next(self.turn) % len(self.aliases)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ReplicaPool(replica_setting('ALIASES'), replica_setting('HEALTH_CHECK_INTERVAL'))
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    global _pool
+    if setting in ('READ_REPLICAS', 'DATABASES'):
+        _pool = None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        reads = current_reads.get()
+        if reads is None or not get_pool().aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if not reads.replica_allowed():
+            return None
+        if reads.replica is None:
+            reads.replica = get_pool().choose() or DEFAULT_DB_ALIAS
+        return reads.replica
+
+    def db_for_write(self, model, **hints):
+        reads = current_reads.get()
+        if reads is not None:
+            reads.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in replica_setting('ALIASES')
+
+
+class ReplicaRoutingMiddleware:
+    """Lets ReplicaRouter see the request being handled, and makes users who wrote sticky."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        reads = RequestReads(request)
+        token = current_reads.set(reads)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_reads.reset(token)
+        self.remember_writer(reads)
+        return response
+
+    async def __acall__(self, request):
+        reads = RequestReads(request)
+        token = current_reads.set(reads)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_reads.reset(token)
+        if reads.wrote:
+            await sync_to_async(self.remember_writer)(reads)
+        return response
+
+    def remember_writer(self, reads):
+        if not reads.wrote:
+            return
+        # DRF puts the user it authenticated on the Django request
+        user = getattr(reads.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(STICKY_KEY.format(user.pk), 1, replica_setting('STICKY_SECONDS'))
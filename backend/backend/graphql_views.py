@@ -0,0 +1,169 @@
+import math
+from inspect import isawaitable
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from graphene_django.views import HttpError
+from graphql import ExecutionResult, GraphQLError, Lexer, Source, TokenKind
+from content.graphql_views import ConditionalGraphQLView
+from content.schema import async_schema
+from .db_routers import replica_reads
+from .renderers import dumps, orjson
+from .throttling import AnonGraphQLThrottle
+
+# Keywords that open an operation other than a query
+WRITE_OPERATIONS = {'mutation', 'subscription'}
+
+
+def only_queries(source):
+    """Whether every operation in the GraphQL document ``source`` is a query.
+
+    Only the first token of each definition (at the start, or after a brace
+    closes at the top level) is looked at, so the document is lexed but not
+    parsed; graphene parses it once, to execute it. A document that does not
+    lex counts as not read-only, and is left for graphene to reject.
+    """
+    lexer = Lexer(Source(source))
+    depth = 0
+    starts_definition = True
+    try:
+        token = lexer.advance()
+        while token.kind != TokenKind.EOF:
+            if token.kind == TokenKind.BRACE_L:
+                depth += 1
+            elif token.kind == TokenKind.BRACE_R:
+                depth -= 1
+            elif starts_definition and token.kind == TokenKind.NAME and token.value in WRITE_OPERATIONS:
+                return False
+            starts_definition = token.kind == TokenKind.BRACE_R and not depth
+            token = lexer.advance()
+    except GraphQLError:
+        return False
+    return True
+
+
+class GraphQLView(ConditionalGraphQLView):
+    """The GraphQL endpoint, encoding and decoding JSON bodies through orjson when it is installed.
+
+    Responses are the bytes graphene writes (ASCII, with non-ASCII characters
+    escaped); pretty output for GraphiQL and anything unusual in a request
+    body are left to graphene. Anonymous requests are rate limited at the
+    'graphql_anon' scope, and queries may read from a replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        throttled = self.throttled(request)
+        if throttled:
+            return throttled
+        with replica_reads(self.read_query(request) is not None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def throttled(self, request):
+        """A 429 response if ``request`` is over its rate limit, else None."""
+        throttle = AnonGraphQLThrottle()
+        if throttle.allow_request(request, self):
+            return None
+        payload = {'errors': [{'message': 'Request was throttled.'}]}
+        response = HttpResponse(status=429, content=self.json_encode(request, payload), content_type='application/json')
+        response['Retry-After'] = str(math.ceil(throttle.wait()))
+        return response
+
+    def read_query(self, request):
+        """The request data of a document made only of queries, else None."""
+        if request.method not in ('GET', 'POST') or self.batch:
+            return None
+        try:
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return None
+            query = self.get_graphql_params(request, data)[0]
+        except HttpError:
+            return None
+        if not query or not only_queries(query):
+            return None
+        return data
+
+    def json_encode(self, request, d, pretty=False):
+        if orjson is None or self.pretty or pretty or request.GET.get('pretty'):
+            return super().json_encode(request, d, pretty=pretty)
+        return dumps(d, ensure_ascii=True)
+
+    def parse_body(self, request):
+        # read_query reads the body before graphene does
+        parsed = getattr(self, 'parsed_body', None)
+        if parsed is not None and parsed[0] is request:
+            return parsed[1]
+        data = self.decode_body(request)
+        self.parsed_body = request, data
+        return data
+
+    def decode_body(self, request):
+        if orjson is None or self.get_content_type(request) != 'application/json':
+            return super().parse_body(request)
+        try:
+            data = orjson.loads(request.body)
+        except orjson.JSONDecodeError:
+            data = None
+        if isinstance(data, list) and data if self.batch else isinstance(data, dict):
+            return data
+        # Let graphene reject it with its usual message
+        return super().parse_body(request)
+
+
+class AsyncGraphQLView(GraphQLView):
+    """GraphQLView for ASGI: queries are executed on the event loop against ``async_schema``.
+
+    Queries go through graphene's own ``execute_graphql_request`` and
+    ``get_response``; with coroutine resolvers the execution is an awaitable,
+    which is awaited here before graphene builds the response. Everything
+    else (GraphiQL, batches, mutations and requests graphene would reject)
+    goes to the sync view in a worker thread.
+    """
+    view_is_async = True
+    async_schema = async_schema
+    execution_result = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        throttled = await sync_to_async(self.throttled)(request)
+        if throttled:
+            return throttled
+        data = self.read_query(request)
+        if data is None:
+            return await sync_to_async(self.dispatch_on_primary)(request, *args, **kwargs)
+        with replica_reads():
+            return await self.dispatch_query(request, data)
+
+    async def dispatch_query(self, request, data):
+        validators = None
+        if request.method == 'GET':
+            validators = await sync_to_async(self.get_validators)(request)
+            if validators is not None:
+                not_modified = validators.not_modified(request)
+                if not_modified:
+                    return not_modified
+
+        self.execution_result = await self.execute_query(request, data)
+        result, status_code = self.get_response(request, data)
+        response = HttpResponse(status=status_code, content=result, content_type='application/json')
+        return validators.apply(response) if validators is not None else response
+
+    def dispatch_on_primary(self, request, *args, **kwargs):
+        # Past GraphQLView.dispatch, which would count the request again
+        with replica_reads(False):
+            return super(GraphQLView, self).dispatch(request, *args, **kwargs)
+
+    async def execute_query(self, request, data):
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        self.schema = self.async_schema
+        result = super().execute_graphql_request(request, data, query, variables, operation_name)
+        if not isawaitable(result):
+            return result
+        try:
+            return await result
+        except Exception as error:
+            return ExecutionResult(errors=[error])
+
+    def execute_graphql_request(self, *args, **kwargs):
+        # get_response asks for the result that execute_query awaited
+        if self.execution_result is not None:
+            return self.execution_result
+        return super().execute_graphql_request(*args, **kwargs)
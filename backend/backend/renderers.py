@@ -0,0 +1,87 @@
+"""
+JSON rendering and parsing through orjson, when it is installed.
+
+The output matches DRF's JSONRenderer and graphene's GraphQLView byte for
+byte in the compact form: datetimes, dates, times and UUIDs are encoded by
+orjson itself (UTC as ``Z``, as DRF writes it) and everything else it does
+not know goes through DRF's JSONEncoder.default. The remaining differences
+are in forms these APIs do not produce: floats in exponent notation are
+written without the ``+``/leading zero (``1e16`` rather than ``1e+16``), NaN
+and infinities become ``null`` rather than an error, and UTC offsets with
+seconds lose them. Anything orjson rejects outright (e.g. integers wider
+than 64 bits) is encoded again with the standard library.
+"""
+import io
+import json
+import re
+from rest_framework import parsers, renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z) if orjson else 0
+
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_default = JSONEncoder().default
+
+
+def _escape(match):
+    code = ord(match.group())
+    if code > 0xffff:
+        code -= 0x10000
+        return '\\u{:04x}\\u{:04x}'.format(0xd800 | code >> 10, 0xdc00 | code & 0x3ff)
+    return f'\\u{code:04x}'
+
+
+def dumps(data, ensure_ascii=False):
+    """Compact JSON for ``data`` as bytes, as json.dumps would write it with DRF's encoder."""
+    if orjson is not None:
+        try:
+            content = orjson.dumps(data, default=_default, option=OPTIONS)
+        except TypeError:
+            pass
+        else:
+            if ensure_ascii and not content.isascii():
+                # Outside strings JSON is ASCII, so this only rewrites string contents
+                content = NON_ASCII.sub(_escape, content.decode()).encode()
+            return content
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=ensure_ascii, separators=(',', ':')).encode()
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, through orjson for compact output."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        content = dumps(data, ensure_ascii=self.ensure_ascii)
+        if not content.isascii():
+            for separator, escaped in LINE_SEPARATORS:
+                content = content.replace(separator, escaped)
+        return content
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSONParser, through orjson for UTF-8 bodies."""
+
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = parsers.get_encoding(parser_context or {})
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Let the standard parser accept what it allows (NaN, huge
+            # integers) and word the error as usual
+            return super().parse(io.BytesIO(content), media_type, parser_context)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,15 +46,20 @@ INSTALLED_APPS = [
     'graphene_django',
     'content',
     'recommendations',
+    'metrics',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so request timings include every other middleware
+    'metrics.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -105,24 +111,123 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connections are kept for reuse by the next requests of their thread
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Transactions take the write lock when they begin, so one that
+            # reads first cannot fail with "database is locked" when it writes
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Pragmas for every SQLite connection, and in-process queueing of page
+# writes (see content.sqlite); None leaves SQLite's default
+SQLITE_PROFILE = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE': -64 * 1024,
+    'BUSY_TIMEOUT': 5000,
+    'SERIALIZE_WRITES': True,
+}
+
+# Read replicas (see backend.db_routers). READ_REPLICA_SQLITE lists SQLite
+# files standing in for replicas, e.g. copies made with
+#   sqlite3 db.sqlite3 "VACUUM INTO 'replica1.sqlite3'"
+for number, path in enumerate(filter(None, os.environ.get('READ_REPLICA_SQLITE', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['backend.db_routers.ReplicaRouter']
+
+# Reads of views with replica_reads = True (and GraphQL queries) go to
+# ALIASES in turn; users who wrote read from the primary for STICKY_SECONDS
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 10,
+    'HEALTH_CHECK_INTERVAL': 30,
 }
 
 REST_FRAMEWORK = {
+    # orjson when installed, with the same output as DRF's own JSON classes
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'backend.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Shared by every process (see backend.throttling); views with a
+    # throttle_scope are limited at that scope's rate instead of 'user'
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
+        'backend.throttling.SharedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'user': '100/day'
+        'user': '100/day',
+        'login': '10/min',
+        'register': '5/hour',
+        'graphql_anon': '60/min',
     }
 }
 
+# Rate limit state: in Redis when REDIS_URL is set, else in a SQLite file
+# at PATH (default: throttle.sqlite3 beside a SQLite default database)
+THROTTLING = {
+    'REDIS_URL': None,
+    'PATH': None,
+}
+
+# Keyset pagination for content lists (REST and GraphQL)
+CONTENT_PAGINATION = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+    'INCLUDE_COUNT': True,
+}
+
+# Saves of a published page within DEBOUNCE_SECONDS trigger one regeneration;
+# BACKEND is 'redis' (the Celery broker) or 'memory' (single process, tests)
+STATIC_REGENERATION = {
+    'BACKEND': 'redis',
+    'DEBOUNCE_SECONDS': 5,
+    'MAX_BATCH_SIZE': 50,
+}
+
+# Lifetime in seconds of the signed tokens from generate-preview-token
+PREVIEW_TOKEN_MAX_AGE = 60 * 60
+
+# Prebuilt HTML/JSON artifacts of published pages (see content.prerender)
+STATIC_PRERENDER = {
+    'ROOT': BASE_DIR / 'prerendered',
+    'WORKERS': 4,
+}
+
+# Request, SQL, GraphQL and Celery metrics served at /metrics (see
+# metrics.registry). Each process writes its counts under DIR. The endpoint
+# answers scrapers that send 'Authorization: Bearer <TOKEN>' or connect from
+# ALLOWED_IPS, and is a 404 while neither is set.
+METRICS = {
+    'ENABLED': True,
+    'DIR': BASE_DIR / 'metrics-data',
+    'FLUSH_INTERVAL': 1.0,
+    'SERVER_TIMING': DEBUG,
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'] if DEBUG else [],
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -144,9 +249,18 @@ AUTH_PASSWORD_VALIDATORS = [
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-outstanding-tokens': {
+        'task': 'users.tasks.purge_expired_outstanding_tokens',
+        'schedule': 60 * 60,
+    },
+}
 
 GRAPHENE = {
-    'SCHEMA': 'content.schema.schema'
+    'SCHEMA': 'content.schema.schema',
+    'MIDDLEWARE': ['metrics.graphql.ResolverTimingMiddleware'] + (
+        ['graphene_django.debug.DjangoDebugMiddleware'] if DEBUG else []
+    ),
 }
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -160,6 +274,20 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+}
+
+# Users resolved from access tokens are cached per process for USER_TTL
+# seconds (see users.authentication); the refresh token blacklist filter
+# stays in step across processes through the default cache, and is only
+# used when that cache is a shared backend (Redis, Memcached, files)
+JWT_CACHE = {
+    'USER_CACHE_SIZE': 10_000,
+    'USER_TTL': 60,
+    'BLACKLIST_CAPACITY': 100_000,
+    'BLACKLIST_ERROR_RATE': 0.001,
+    'PURGE_BATCH_SIZE': 1000,
+    'PURGE_MAX_BATCHES': 50,
 }
 
 # Internationalization
@@ -0,0 +1,185 @@
+"""
+Rate limits shared by every process, with constant state per client.
+
+``SharedRateThrottle`` applies the generic cell rate algorithm (GCRA): a
+rate of N requests per period lets one request through every period / N
+seconds on average, with bursts of up to N. The only state per client is
+the time at which its allowance is next fully spent (the "theoretical
+arrival time"), updated in one atomic step per request. A throttled
+request is told how long to wait, which DRF sends as ``Retry-After``.
+
+The state lives in Redis when ``THROTTLING['REDIS_URL']`` is set. Otherwise
+it lives in a SQLite file, ``PATH`` or ``throttle.sqlite3`` beside a SQLite
+default database, which every process on the host shares; with an
+in-memory default database (tests) it is kept in memory as well.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from rest_framework import throttling
+
+DEFAULTS = {
+    'REDIS_URL': None,
+    'PATH': None,
+    'KEY_PREFIX': 'throttle:',
+}
+
+# The SQLite store deletes spent rows once every this many requests
+PRUNE_EVERY = 1000
+
+
+def throttling_setting(name):
+    return getattr(settings, 'THROTTLING', {}).get(name, DEFAULTS[name])
+
+
+class RedisRateStore:
+    # Redis's clock is used, so web hosts with different clocks agree
+    ACQUIRE = """
+        local now = redis.call('TIME')
+        now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+        local interval, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now) + interval
+        if tat - now > period then
+            return tostring(tat - now - period)
+        end
+        redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+        return false
+    """
+
+    def __init__(self, url, prefix):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.acquire_script = self.client.register_script(self.ACQUIRE)
+
+    def acquire(self, key, interval, period):
+        """Take one request from ``key``'s allowance. None if allowed, else seconds to wait."""
+        wait = self.acquire_script(keys=[self.prefix + key], args=[interval, period])
+        return None if wait is None else float(wait)
+
+
+class SQLiteRateStore:
+    ACQUIRE = """
+        INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval)
+        ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval
+        WHERE max(tat, :now) + :interval - :now <= :period
+        RETURNING tat
+    """
+
+    def __init__(self, path, uri=False):
+        self.path = path
+        self.uri = uri
+        self.local = threading.local()
+        self.requests = itertools.count(1)
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Autocommit, so each statement is its own transaction
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, uri=self.uri)
+            if not self.uri:
+                connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+            self.local.connection = connection
+        return connection
+
+    def acquire(self, key, interval, period):
+        """Take one request from ``key``'s allowance. None if allowed, else seconds to wait."""
+        connection = self.connection()
+        now = time.time()
+        params = {'key': key, 'now': now, 'interval': interval, 'period': period}
+        if connection.execute(self.ACQUIRE, params).fetchone() is not None:
+            if next(self.requests) % PRUNE_EVERY == 0:
+                connection.execute('DELETE FROM rate_limits WHERE tat < ?', (now,))
+            return None
+        row = connection.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+        return max(0.0, row[0] + interval - now - period) if row else 0.0
+
+
+def _sqlite_store():
+    path = throttling_setting('PATH')
+    if path is None:
+        database = connections['default']
+        if database.vendor == 'sqlite' and not database.is_in_memory_db():
+            path = Path(database.settings_dict['NAME']).with_name('throttle.sqlite3')
+        else:
+            # A per-process database that lives as long as one of its connections
+            return SQLiteRateStore(f'file:throttle-{os.getpid()}?mode=memory&cache=shared', uri=True)
+    return SQLiteRateStore(str(path))
+
+
+_store = None
+_store_pid = None
+
+
+def get_store():
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        # A forked child (gunicorn, Celery prefork) opens its own connections
+        url = throttling_setting('REDIS_URL')
+        _store = RedisRateStore(url, throttling_setting('KEY_PREFIX')) if url else _sqlite_store()
+        _store_pid = os.getpid()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting in ('THROTTLING', 'DATABASES'):
+        _store = None
+
+
+class SharedRateThrottle(throttling.SimpleRateThrottle):
+    """Limits a client to the rate of its scope in ``DEFAULT_THROTTLE_RATES``.
+
+    The scope is the view's ``throttle_scope`` when it has one, else the
+    class's ``scope``. Clients are users when authenticated and addresses
+    otherwise, as with UserRateThrottle.
+    """
+    scope = 'user'
+
+    def __init__(self):
+        # The rate depends on the view, so it is read in allow_request
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None) or self.scope
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.wait_seconds = get_store().acquire(key, self.duration / self.num_requests, self.duration)
+        return self.wait_seconds is None
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonGraphQLThrottle(SharedRateThrottle):
+    """Limits anonymous GraphQL requests; authenticated ones are not counted."""
+    scope = 'graphql_anon'
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
@@ -16,13 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from .graphql_views import GraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('content.urls')),
     path('api/auth/', include('users.urls')),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True)), name='graphql'),
     path('api/recommendations/', include('recommendations.urls')),
+    path('metrics', include('metrics.urls')),
 ]
@@ -0,0 +1,26 @@
+"""
+URL configuration for the ASGI application (backend.asgi).
+
+The public read endpoints are served by async views; each falls back to
+its sync view for writes. Every other route is the same as backend.urls.
+"""
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from content.views import AsyncPageContentDetail, AsyncPageContentList, AsyncPublicContentStats, PageContentViewSet
+from recommendations.views import AsyncRecommendations
+from .graphql_views import AsyncGraphQLView
+from .urls import urlpatterns as sync_urlpatterns
+
+content_list = PageContentViewSet.as_view({'get': 'list', 'post': 'create'})
+content_detail = PageContentViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+
+urlpatterns = [
+    path('api/content/', AsyncPageContentList.as_view(fallback=content_list), name='pagecontent-list'),
+    path('api/content/<int:pk>/', AsyncPageContentDetail.as_view(fallback=content_detail), name='pagecontent-detail'),
+    path('api/public/', AsyncPublicContentStats.as_view(), name='public_content_stats'),
+    path('api/recommendations/<slug:slug>/', AsyncRecommendations.as_view(), name='get_recommendations'),
+    path("graphql/", csrf_exempt(AsyncGraphQLView.as_view(graphiql=True)), name='graphql'),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,164 @@
+"""
+Mixed read and write load on the database, with and without the SQLite profile.
+
+``concurrency`` threads each run their share of ``operations`` through the
+ORM: the public list page and page-by-slug reads, and ``write_share`` of
+writes. Half the writes edit an existing page in a transaction (read, then
+save), as an editor's update does; the other half create a draft, which
+allocates a slug. Each thread has its own connection, as each thread of a
+web server does.
+
+The 'tuned' profile is the configured one (``SQLITE_PROFILE`` and the
+default database's ``transaction_mode``); 'stock' is SQLite's and Django's
+defaults: rollback journal, full syncs, deferred transactions and no write
+queue. Pages created by a run are deleted afterwards, and task dispatch
+from the save receivers is stubbed out, so the run measures the database
+alone and leaves the corpus as it found it.
+"""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import count
+from unittest import mock
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.test import override_settings
+from django.utils import timezone
+from content.models import PageContent
+from content.pagination import paginate
+from .corpus import SLUG_PREFIX
+from .harness import SAMPLE_SLUGS, percentile
+
+WRITE_TITLE = 'Concurrency benchmark draft'
+
+PROFILES = {
+    'tuned': None,
+    'stock': {
+        'SQLITE_PROFILE': {
+            'JOURNAL_MODE': 'DELETE',
+            'SYNCHRONOUS': 'FULL',
+            'MMAP_SIZE': 0,
+            'CACHE_SIZE': -2000,
+            'BUSY_TIMEOUT': 5000,
+            'SERIALIZE_WRITES': False,
+        },
+        'transaction_mode': None,
+    },
+}
+
+
+@contextmanager
+def database_profile(name):
+    """Open the default database's connections with profile ``name`` for the block."""
+    profile = PROFILES[name]
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    connections.close_all()
+    try:
+        with ExitStack() as stack:
+            if profile is not None:
+                options = {**database.get('OPTIONS', {}), 'transaction_mode': profile['transaction_mode']}
+                # Worker threads build their connections from these settings
+                connections.settings[DEFAULT_DB_ALIAS] = {**database, 'OPTIONS': options}
+                stack.enter_context(override_settings(SQLITE_PROFILE=profile['SQLITE_PROFILE']))
+            yield
+    finally:
+        connections.close_all()
+        connections.settings[DEFAULT_DB_ALIAS] = database
+
+
+def _read_list():
+    paginate(PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now()))
+
+
+def _read_page(slug):
+    PageContent.objects.filter(slug=slug, is_published=True).first()
+
+
+def _edit(pk):
+    with transaction.atomic():
+        page = PageContent.objects.get(pk=pk)
+        # Saved unchanged, so the corpus stays as generated
+        page.save()
+
+
+def _create(number):
+    PageContent.objects.create(title=f'{WRITE_TITLE} {number}', body='Draft.', is_published=False)
+
+
+def run_mixed_workload(operations=2000, concurrency=8, write_share=0.2, profile='tuned', seed=0):
+    """Run the workload under ``profile`` and return its results as a JSON-serialisable dict."""
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown profile: {profile}')
+    pages = list(PageContent.objects.filter(slug__startswith=SLUG_PREFIX, is_published=True)
+                 .order_by('id').values_list('pk', 'slug')[:SAMPLE_SLUGS])
+    if not pages:
+        raise ValueError('No benchmark corpus in this database; run generate_benchmark_corpus first')
+    rng = random.Random(seed)
+    plan = []
+    for index in range(operations):
+        if rng.random() < write_share:
+            plan.append(('edit', rng.choice(pages)[0]) if index % 2 else ('create', index))
+        else:
+            plan.append(('read-list', None) if rng.random() < 0.5 else ('read-page', rng.choice(pages)[1]))
+    actions = {'read-list': lambda _: _read_list(), 'read-page': _read_page, 'edit': _edit, 'create': _create}
+    sequence = count()
+
+    def worker(_):
+        samples = []
+        try:
+            while (index := next(sequence)) < len(plan):
+                kind, argument = plan[index]
+                started = time.perf_counter()
+                try:
+                    actions[kind](argument)
+                    failed = None
+                except OperationalError as error:
+                    failed = str(error)
+                samples.append((kind, time.perf_counter() - started, failed))
+        finally:
+            connections.close_all()
+        return samples
+
+    with ExitStack() as stack:
+        # Saves would otherwise queue Celery tasks on the broker
+        stack.enter_context(mock.patch('content.models.schedule_static_regeneration'))
+        stack.enter_context(mock.patch('recommendations.tasks.update_recommendations.delay'))
+        stack.enter_context(database_profile(profile))
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = [sample for thread in executor.map(worker, range(concurrency)) for sample in thread]
+        elapsed = time.perf_counter() - started
+
+        for page in PageContent.objects.filter(title__startswith=WRITE_TITLE, is_published=False):
+            page.delete()
+
+    results = {}
+    for kind in actions:
+        latencies = sorted(duration * 1000 for sample_kind, duration, _ in samples if sample_kind == kind)
+        errors = [failed for sample_kind, _, failed in samples if sample_kind == kind and failed]
+        results[kind] = {
+            'operations': len(latencies),
+            'errors': len(errors),
+            'error_messages': sorted(set(errors)),
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3) if latencies else None,
+                'p50': round(percentile(latencies, 0.50), 3) if latencies else None,
+                'p95': round(percentile(latencies, 0.95), 3) if latencies else None,
+                'p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None,
+            },
+        }
+    return {
+        'profile': profile,
+        'journal_mode': journal_mode,
+        'operations': len(samples),
+        'errors': sum(result['errors'] for result in results.values()),
+        'throughput_ops': round(len(samples) / elapsed, 1) if elapsed else None,
+        'results': results,
+    }
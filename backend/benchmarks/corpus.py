@@ -0,0 +1,136 @@
+"""
+Deterministic synthetic corpus for benchmarks.
+
+The same ``seed`` and sizes always produce the same users and pages, so
+results from different commits are measured against identical data. Rows
+are written with bulk_create in batches; the per-row save receivers are
+replaced by one pass over the whole corpus at the end, as import_content
+does for an import.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from content.models import PageContent, SiteCounter
+from recommendations.models import ContentToken
+
+USERNAME_PREFIX = 'bench-user-'
+SLUG_PREFIX = 'bench-'
+PASSWORD = 'benchmark'
+
+# Dates are spread back from a fixed point so they do not depend on when
+# the corpus was generated
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+SPREAD_MINUTES = 3 * 365 * 24 * 60
+
+PUBLISHED_SHARE = 0.85
+CONTENT_TYPES = [('article', 70), ('news', 15), ('guide', 10), ('landing', 5)]
+ROLES = [('viewer', 80), ('author', 15), ('editor', 4), ('admin', 1)]
+FIRST_NAMES = ['Ada', 'Grace', 'Alan', 'Edsger', 'Barbara', 'Donald', 'Frances', 'Ken', 'Radia', 'Tim']
+LAST_NAMES = ['Lovelace', 'Hopper', 'Turing', 'Dijkstra', 'Liskov', 'Knuth', 'Allen', 'Thompson', 'Perlman', 'Lee']
+STREAM_LENGTH = 500_000
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'qua', 'zen', 'dor', 'pel', 'cri', 'ban', 'gu', 'fy']
+
+
+class Vocabulary:
+    """Text drawn from pseudo-words with Zipfian frequencies, like words in real text.
+
+    One long stream of words is drawn up front and each text is a slice of
+    it at a random offset, which is far cheaper than a weighted draw per word.
+    """
+
+    def __init__(self, rng, size, stream_length=STREAM_LENGTH):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        words = sorted(words)
+        rng.shuffle(words)
+        weights = [1 / rank for rank in range(1, size + 1)]
+        self.stream = rng.choices(words, weights, k=stream_length)
+        self.rng = rng
+
+    def text(self, count):
+        offset = self.rng.randrange(len(self.stream) - count)
+        return ' '.join(self.stream[offset:offset + count])
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def existing_corpus():
+    return (get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).exists()
+            or PageContent.objects.filter(slug__startswith=SLUG_PREFIX).exists())
+
+
+def generate_users(count, seed, batch_size=5000):
+    """Create ``count`` users. Returns their ids in creation order."""
+    rng = random.Random(f'{seed}:users')
+    User = get_user_model()
+    # Hashing is deliberately slow, so every user shares one hash
+    password = make_password(PASSWORD)
+    ids = []
+    for start in range(0, count, batch_size):
+        users = [
+            User(
+                username=f'{USERNAME_PREFIX}{index:07d}',
+                email=f'{USERNAME_PREFIX}{index:07d}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                role=_weighted(rng, ROLES),
+                password=password,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ]
+        with transaction.atomic():
+            ids.extend(user.pk for user in User.objects.bulk_create(users))
+    return ids
+
+
+def generate_pages(count, author_ids, seed, body_words=150, vocabulary_size=20000, batch_size=2000,
+                   recommendation_pages=None, progress=None):
+    """Create ``count`` pages by ``author_ids``. Returns the number created.
+
+    Only the first ``recommendation_pages`` pages (all of them if None) are
+    indexed for recommendations; indexing costs far more than the insert.
+    """
+    if recommendation_pages is None:
+        recommendation_pages = count
+    rng = random.Random(f'{seed}:pages')
+    vocabulary = Vocabulary(rng, vocabulary_size)
+    created = 0
+    for start in range(0, count, batch_size):
+        pages = []
+        for index in range(start, min(start + batch_size, count)):
+            published = rng.random() < PUBLISHED_SHARE
+            pages.append(PageContent(
+                title=vocabulary.text(rng.randint(3, 8)).capitalize(),
+                slug=f'{SLUG_PREFIX}{index:07d}',
+                body=vocabulary.text(rng.randint(body_words // 2, body_words * 3 // 2)),
+                content_type=_weighted(rng, CONTENT_TYPES),
+                meta_description=vocabulary.text(20),
+                is_published=published,
+                publish_date=EPOCH - timedelta(minutes=rng.randrange(SPREAD_MINUTES)) if published else None,
+                author_id=rng.choice(author_ids) if author_ids else None,
+            ))
+        for page in pages:
+            page.update_summary()
+        with transaction.atomic():
+            pages = PageContent.objects.bulk_create(pages)
+            if start < recommendation_pages:
+                ContentToken.objects.index_new(pages[:recommendation_pages - start])
+        created += len(pages)
+        if progress:
+            progress(created)
+    return created
+
+
+def generate_corpus(users, pages, seed=0, body_words=150, recommendation_pages=None, progress=None):
+    """Create the users and pages, then bring the counters up to date."""
+    author_ids = generate_users(users, seed)
+    created = generate_pages(pages, author_ids, seed, body_words=body_words,
+                             recommendation_pages=recommendation_pages, progress=progress)
+    SiteCounter.objects.reconcile()
+    return len(author_ids), created
@@ -0,0 +1,374 @@
+"""
+Load harness for the public read endpoints.
+
+Each scenario is a fixed list of requests built from the database up front
+(so every run replays the same URLs in the same order) and is driven by
+``concurrency`` threads until ``requests`` have completed, after
+``warmup`` untimed ones. Requests go through ``django.test.Client`` in this
+process (the sync WSGI stack), through the ASGI application with
+``concurrency`` coroutines on one event loop, or over HTTP to ``base_url``.
+WSGI runs count SQL queries with an execute wrapper; the others read them
+from the Server-Timing header, which is present when
+METRICS['SERVER_TIMING'] is on (ASGI runs turn it on themselves).
+
+In-process runs also make ``memory_samples`` untimed requests one at a
+time under tracemalloc and report the peak memory each allocated, so a
+change that loads less per request shows up against an earlier report.
+"""
+import asyncio
+import json
+import math
+import re
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import count
+from urllib.parse import quote
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.utils import timezone
+from content.models import PageContent
+from content.pagination import encode_cursor, paginate
+from recommendations.models import Recommendation
+from rest_framework_simplejwt.tokens import AccessToken
+
+SAMPLE_SLUGS = 200
+
+SERVER_TIMING_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+
+LIST_QUERY = 'query List($after: String) { allPageContents(first: 20, after: $after) { edges { cursor node { title slug publishDate author { username } } } pageInfo { hasNextPage } } }'
+SLUG_QUERY = 'query Page($slug: String!) { pageContentBySlug(slug: $slug) { title body publishDate author { username } } }'
+
+
+class Call:
+    def __init__(self, path, body=None, headers=None):
+        self.path = path
+        self.body = body
+        self.headers = headers or {}
+
+
+def _published_slugs(limit):
+    return list(
+        PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now())
+        .order_by('id').values_list('slug', flat=True)[:limit]
+    )
+
+
+def _logins(limit):
+    """Authorization headers for up to ``limit`` users, for endpoints that need a login.
+
+    Requests are spread over many users so the per-user rate limit is
+    exercised without rejecting the run.
+    """
+    users = get_user_model().objects.order_by('id')[:limit]
+    return [{'Authorization': f'Bearer {AccessToken.for_user(user)}'} for user in users] or [{}]
+
+
+def _graphql(query, **variables):
+    return Call('/graphql/', json.dumps({'query': query, 'variables': variables}))
+
+
+def build_scenarios(names=None):
+    """``{name: [Call, ...]}`` for each requested scenario (all by default)."""
+    slugs = _published_slugs(SAMPLE_SLUGS)
+    with_neighbours = list(
+        Recommendation.objects.filter(source__is_published=True)
+        .order_by('source_id').values_list('source__slug', flat=True).distinct()[:SAMPLE_SLUGS]
+    )
+    first_page, has_next = paginate(PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now()))
+    logins = _logins(SAMPLE_SLUGS)
+    second_page = f'/api/content/?cursor={quote(encode_cursor(first_page[-1]))}' if has_next else None
+
+    scenarios = {
+        'content-list': [Call('/api/content/')],
+        'content-list-next': [Call(second_page)] if second_page else [],
+        'public-stats': [Call('/api/public/')],
+        'recommendations': [
+            Call(f'/api/recommendations/{slug}/', headers=logins[index % len(logins)])
+            for index, slug in enumerate(with_neighbours)
+        ],
+        'graphql-list': [_graphql(LIST_QUERY)],
+        'graphql-by-slug': [_graphql(SLUG_QUERY, slug=slug) for slug in slugs],
+    }
+    if names:
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise ValueError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        scenarios = {name: scenarios[name] for name in names}
+    return scenarios
+
+
+class InProcessClient:
+    def __init__(self):
+        self.local = threading.local()
+        self.addresses = count(1)
+
+    def request(self, call):
+        """``(status, queries)`` for one call."""
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        # Every request comes from its own address, so the per-client rate
+        # limit is exercised without rejecting the run
+        number = next(self.addresses)
+        address = f'10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}'
+        with ExitStack() as stack:
+            # Replicas too, when reads are routed to them
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            if call.body is None:
+                response = client.get(call.path, headers=call.headers, REMOTE_ADDR=address)
+            else:
+                response = client.post(call.path, call.body, content_type='application/json',
+                                       headers=call.headers, REMOTE_ADDR=address)
+        return response.status_code, queries
+
+
+class ASGIClient:
+    """Calls the ASGI application directly, without a server."""
+    is_async = True
+
+    def __init__(self, application=None):
+        if application is None:
+            from backend.asgi import application
+        self.application = application
+        self.addresses = count(1)
+
+    async def request(self, call):
+        path, _, query = call.path.partition('?')
+        headers = [(b'host', b'testserver')]
+        headers += [(name.lower().encode(), value.encode()) for name, value in call.headers.items()]
+        body = b''
+        if call.body is not None:
+            body = call.body.encode()
+            headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        number = next(self.addresses)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET' if call.body is None else 'POST',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': (f'10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}', 0),
+            'server': ('testserver', 80),
+        }
+
+        finished = asyncio.Event()
+        received = False
+        status = None
+        server_timing = ''
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status, server_timing
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                server_timing = {name.lower(): value for name, value in message['headers']}.get(b'server-timing', b'').decode()
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        await self.application(scope, receive, send)
+        return status, _server_timing_queries(server_timing)
+
+
+def _server_timing_queries(header):
+    match = SERVER_TIMING_QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+class HTTPClient:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, call):
+        data = call.body.encode() if call.body is not None else None
+        request = urllib.request.Request(self.base_url + call.path, data=data, headers={
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            **call.headers,
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        return status, _server_timing_queries(headers.get('Server-Timing'))
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure_memory(client, calls, samples):
+    """Peak memory allocated by each of ``samples`` calls made one at a time, in KiB."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for index in range(samples):
+            call = calls[index % len(calls)]
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            if getattr(client, 'is_async', False):
+                asyncio.run(client.request(call))
+            else:
+                client.request(call)
+            peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return sorted(peaks)
+
+
+def run_scenario(client, calls, requests, concurrency, warmup=0, memory_samples=0):
+    """Drive ``calls`` round-robin and summarise latency, throughput, queries and memory."""
+    sequence = count()
+
+    def worker(quota):
+        samples = []
+        try:
+            for _ in range(quota):
+                call = calls[next(sequence) % len(calls)]
+                started = time.perf_counter()
+                status, queries = client.request(call)
+                samples.append((time.perf_counter() - started, status, queries))
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        return samples
+
+    async def coroutine_worker(quota):
+        samples = []
+        for _ in range(quota):
+            call = calls[next(sequence) % len(calls)]
+            started = time.perf_counter()
+            status, queries = await client.request(call)
+            samples.append((time.perf_counter() - started, status, queries))
+        return samples
+
+    async def drive_coroutines(quotas):
+        return await asyncio.gather(*(coroutine_worker(quota) for quota in quotas))
+
+    def drive(total):
+        quotas = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+        if getattr(client, 'is_async', False):
+            return [sample for samples in asyncio.run(drive_coroutines(quotas)) for sample in samples]
+        if concurrency == 1:
+            return worker(total)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return [sample for samples in executor.map(worker, quotas) for sample in samples]
+
+    if warmup:
+        drive(warmup)
+    started = time.perf_counter()
+    samples = drive(requests)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(duration * 1000 for duration, _, _ in samples)
+    peaks = measure_memory(client, calls, memory_samples) if memory_samples else []
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    queries = [queries for _, _, queries in samples if queries is not None]
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 3) if latencies else None,
+            'p50': round(percentile(latencies, 0.50), 3) if latencies else None,
+            'p95': round(percentile(latencies, 0.95), 3) if latencies else None,
+            'p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+            'max': round(latencies[-1], 3) if latencies else None,
+        },
+        'queries_per_request': {
+            'mean': round(statistics.fmean(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+        'peak_memory_kib': {
+            'mean': round(statistics.fmean(peaks), 1) if peaks else None,
+            'max': round(peaks[-1], 1) if peaks else None,
+        },
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scenarios=None, requests=500, concurrency=4, warmup=50, base_url=None, interface='wsgi',
+                   memory_samples=20):
+    """Run every scenario and return the report as a JSON-serialisable dict.
+
+    ``interface`` picks the in-process stack: 'wsgi' or 'asgi'. Memory is
+    only measured in-process.
+    """
+    overrides = {}
+    if base_url:
+        client = HTTPClient(base_url)
+    elif interface == 'asgi':
+        client = ASGIClient()
+        # Queries run in worker threads, so they are counted from the header
+        overrides['METRICS'] = {**getattr(settings, 'METRICS', {}), 'SERVER_TIMING': True}
+    else:
+        client = InProcessClient()
+    results = {}
+    built = build_scenarios(scenarios)
+    with ExitStack() as stack:
+        if not base_url:
+            # Rate limits start afresh, so earlier runs do not reject this one
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            overrides['THROTTLING'] = {**getattr(settings, 'THROTTLING', {}), 'PATH': f'{directory}/throttle.sqlite3',
+                                       'KEY_PREFIX': f'throttle:bench-{time.time_ns()}:'}
+        stack.enter_context(override_settings(**overrides))
+        for name, calls in built.items():
+            if not calls:
+                results[name] = {'skipped': 'no data for this scenario'}
+                continue
+            results[name] = run_scenario(client, calls, requests, concurrency, warmup=warmup,
+                                         memory_samples=0 if base_url else memory_samples)
+    return {
+        'commit': current_commit(),
+        'mode': 'http' if base_url else 'in-process',
+        'interface': None if base_url else interface,
+        'base_url': base_url,
+        'database': {'vendor': connection.vendor, 'pages': PageContent.objects.count()},
+        'requests': requests,
+        'concurrency': concurrency,
+        'warmup': warmup,
+        'memory_samples': 0 if base_url else memory_samples,
+        'results': results,
+    }
@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.corpus import existing_corpus, generate_corpus
+from content.stats import invalidate_public_stats
+from recommendations.similarity import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a deterministic synthetic corpus of users and pages for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--pages', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--body-words', type=int, default=150, help='Average words per page body')
+        parser.add_argument('--recommendation-pages', type=int, default=10_000,
+                            help='Index only this many pages for recommendations (0 to skip); '
+                                 'rebuilding neighbour lists for a million pages takes hours')
+
+    def handle(self, *args, **options):
+        if existing_corpus():
+            raise CommandError('A benchmark corpus already exists in this database; start from an empty one')
+
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING('DEBUG is on: every query is logged, which slows generation down'))
+        started = time.monotonic()
+
+        def progress(created):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{created} pages ({created / elapsed:,.0f} rows/s)')
+
+        users, pages = generate_corpus(
+            options['users'], options['pages'], seed=options['seed'], body_words=options['body_words'],
+            recommendation_pages=options['recommendation_pages'], progress=progress,
+        )
+        invalidate_public_stats()
+        if options['recommendation_pages']:
+            self.stdout.write('Building recommendations...')
+            rebuild_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {users} users and {pages} pages in {time.monotonic() - started:.1f}s'
+        ))
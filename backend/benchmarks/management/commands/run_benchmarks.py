@@ -0,0 +1,88 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.harness import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the public read endpoints at a fixed concurrency and report latency percentiles, '
+        'throughput, SQL queries and peak memory per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Scenario to run (repeatable); all of them by default')
+        parser.add_argument('--requests', type=int, default=500, help='Timed requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=50, help='Untimed requests per scenario')
+        parser.add_argument('--memory-samples', type=int, default=20,
+                            help='Untimed requests per scenario made one at a time to measure peak memory (0 to skip)')
+        parser.add_argument('--base-url', help='Send requests over HTTP to this server instead of in-process')
+        parser.add_argument('--interface', choices=['wsgi', 'asgi', 'both'], default='wsgi',
+                            help='In-process stack to drive; "both" runs WSGI then ASGI and compares them')
+        parser.add_argument('--output', help='Write the JSON report to this file as well as stdout')
+        parser.add_argument('--compare', help='An earlier JSON report to print changes against')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1')
+        if options['memory_samples'] < 0:
+            raise CommandError('--memory-samples must not be negative')
+        if settings.DEBUG and not options['base_url']:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG is on: query logging and the GraphQL debug middleware will skew the results'
+            ))
+        interfaces = ['wsgi', 'asgi'] if options['interface'] == 'both' else [options['interface']]
+        if options['base_url'] and len(interfaces) > 1:
+            raise CommandError('--interface both runs in-process; leave out --base-url')
+        try:
+            reports = {
+                interface: run_benchmarks(
+                    scenarios=options['scenarios'], requests=options['requests'], concurrency=options['concurrency'],
+                    warmup=options['warmup'], base_url=options['base_url'], interface=interface,
+                    memory_samples=options['memory_samples'],
+                )
+                for interface in interfaces
+            }
+        except ValueError as error:
+            raise CommandError(error)
+        report = reports if len(reports) > 1 else reports[interfaces[0]]
+
+        document = json.dumps(report, indent=2)
+        self.stdout.write(document)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+        if len(reports) > 1:
+            self.compare(reports['wsgi'], reports['asgi'], label='ASGI against WSGI')
+        elif options['compare']:
+            with open(options['compare']) as baseline:
+                self.compare(json.load(baseline), report)
+
+    def compare(self, baseline, report, label=None):
+        self.stderr.write(f'{label or "Against " + (baseline.get("commit") or "baseline")}:')
+        self.stderr.write(f'{"scenario":<20} {"p50 ms":>16} {"p95 ms":>16} {"req/s":>16} {"queries":>12} {"peak KiB":>16}')
+        for name, result in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if not before or 'skipped' in before or 'skipped' in result:
+                continue
+            self.stderr.write(
+                f'{name:<20} '
+                f'{self.change(before["latency_ms"]["p50"], result["latency_ms"]["p50"]):>16} '
+                f'{self.change(before["latency_ms"]["p95"], result["latency_ms"]["p95"]):>16} '
+                f'{self.change(before["throughput_rps"], result["throughput_rps"]):>16} '
+                f'{self.change(before["queries_per_request"]["mean"], result["queries_per_request"]["mean"]):>12} '
+                f'{self.change(self.peak(before), self.peak(result)):>16}'
+            )
+
+    def peak(self, result):
+        # Reports from before memory was measured have no peak
+        return result.get('peak_memory_kib', {}).get('mean')
+
+    def change(self, before, after):
+        if before is None or after is None:
+            return '-'
+        if not before:
+            return f'{after:g}'
+        return f'{after:g} ({(after - before) / before:+.0%})'
@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from benchmarks.concurrency import run_mixed_workload
+from benchmarks.harness import current_commit
+
+
+class Command(BaseCommand):
+    help = (
+        'Run mixed reads and writes on the database from several threads and report errors, '
+        'latency percentiles and throughput per operation as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000, help='Operations across all threads')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--write-share', type=float, default=0.2, help='Share of operations that write')
+        parser.add_argument('--profile', choices=['tuned', 'stock', 'both'], default='both',
+                            help='SQLite settings to run with; "both" runs stock then tuned and compares them')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file as well as stdout')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['operations'] < 1:
+            raise CommandError('--operations and --concurrency must be at least 1')
+        if not 0 <= options['write_share'] <= 1:
+            raise CommandError('--write-share must be between 0 and 1')
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError('The default database must be a SQLite file')
+        profiles = ['stock', 'tuned'] if options['profile'] == 'both' else [options['profile']]
+        try:
+            runs = {
+                profile: run_mixed_workload(
+                    operations=options['operations'], concurrency=options['concurrency'],
+                    write_share=options['write_share'], profile=profile, seed=options['seed'],
+                )
+                for profile in profiles
+            }
+        except ValueError as error:
+            raise CommandError(error)
+        report = {
+            'commit': current_commit(),
+            'operations': options['operations'],
+            'concurrency': options['concurrency'],
+            'write_share': options['write_share'],
+            'runs': runs,
+        }
+
+        document = json.dumps(report, indent=2)
+        self.stdout.write(document)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+        self.summarise(runs)
+
+    def summarise(self, runs):
+        self.stderr.write(f'{"profile":<8} {"operation":<10} {"errors":>7} {"p50 ms":>9} {"p99 ms":>9}')
+        for profile, run in runs.items():
+            for kind, result in run['results'].items():
+                self.stderr.write(
+                    f'{profile:<8} {kind:<10} {result["errors"]:>7} '
+                    f'{result["latency_ms"]["p50"] or 0:>9.2f} {result["latency_ms"]["p99"] or 0:>9.2f}'
+                )
+            self.stderr.write(f'{profile:<8} {"total":<10} {run["errors"]:>7} {run["throughput_ops"]:>14} ops/s')
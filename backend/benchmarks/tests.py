@@ -0,0 +1,88 @@
+import io
+import json
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from content.models import PageContent, SiteCounter
+from recommendations.similarity import rebuild_recommendations
+from .corpus import generate_corpus
+from .harness import percentile, run_benchmarks
+
+
+class CorpusTests(TestCase):
+    @mock.patch('content.models.schedule_static_regeneration')
+    def test_deterministic(self, schedule):
+        generate_corpus(users=5, pages=40, seed=7, body_words=10)
+        first = list(PageContent.objects.order_by('slug').values_list('title', 'body', 'is_published', 'publish_date'))
+        authors = list(PageContent.objects.order_by('slug').values_list('author__username', flat=True))
+        PageContent.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        generate_corpus(users=5, pages=40, seed=7, body_words=10)
+        self.assertEqual(list(PageContent.objects.order_by('slug').values_list('title', 'body', 'is_published', 'publish_date')), first)
+        self.assertEqual(list(PageContent.objects.order_by('slug').values_list('author__username', flat=True)), authors)
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(SiteCounter.objects.value(SiteCounter.PUBLISHED_CONTENT),
+                         PageContent.objects.filter(is_published=True).count())
+
+    def test_command_refuses_existing_corpus(self):
+        generate_corpus(users=1, pages=1, recommendation_pages=0)
+        with self.assertRaisesMessage(Exception, 'already exists'):
+            call_command('generate_benchmark_corpus', users=1, pages=1, recommendation_pages=0, stdout=io.StringIO())
+
+
+class HarnessTests(TestCase):
+    def setUp(self):
+        generate_corpus(users=3, pages=30, seed=1, body_words=10)
+        rebuild_recommendations()
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 0.5), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 0.99), 4)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_report(self):
+        report = run_benchmarks(scenarios=['content-list', 'graphql-by-slug', 'recommendations'], requests=6, concurrency=1, warmup=1)
+        self.assertEqual(report['mode'], 'in-process')
+        for result in report['results'].values():
+            self.assertEqual(result['requests'], 6)
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries_per_request']['mean'], 0)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+            self.assertGreater(result['peak_memory_kib']['mean'], 0)
+
+    def test_command_writes_json_and_compares(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        baseline = {'commit': 'abc123', 'results': {'public-stats': {
+            'latency_ms': {'p50': 1.0, 'p95': 2.0}, 'throughput_rps': 100.0, 'queries_per_request': {'mean': 3.0},
+        }}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as handle:
+            json.dump(baseline, handle)
+            handle.flush()
+            call_command('run_benchmarks', scenarios=['public-stats'], requests=3, concurrency=1, warmup=0,
+                         compare=handle.name, stdout=stdout, stderr=stderr)
+        self.assertEqual(json.loads(stdout.getvalue())['results']['public-stats']['requests'], 3)
+        self.assertIn('Against abc123', stderr.getvalue())
+        self.assertIn('public-stats', stderr.getvalue())
+
+    def test_concurrency_command_needs_a_database_file(self):
+        with self.assertRaisesMessage(Exception, 'must be a SQLite file'):
+            call_command('run_concurrency_benchmark', operations=10, stdout=io.StringIO())
+
+
+class ASGIHarnessTests(TransactionTestCase):
+    # The ASGI handler runs each request's queries on threads of its own,
+    # which only see committed rows
+
+    @mock.patch('content.models.schedule_static_regeneration')
+    def test_report(self, schedule):
+        generate_corpus(users=3, pages=30, seed=1, body_words=10)
+        rebuild_recommendations()
+        report = run_benchmarks(scenarios=['content-list', 'public-stats', 'recommendations', 'graphql-list'],
+                                requests=8, concurrency=4, warmup=0, interface='asgi')
+        self.assertEqual(report['interface'], 'asgi')
+        for result in report['results'].values():
+            self.assertEqual((result['requests'], result['errors']), (8, 0))
+        self.assertGreater(report['results']['content-list']['queries_per_request']['mean'], 0)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import PageContent
+from .search import matching_ids
 
 @admin.register(PageContent)
 class PageContentAdmin(admin.ModelAdmin):
@@ -9,3 +10,9 @@ class PageContentAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE scans over search_fields
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
@@ -0,0 +1,76 @@
+"""
+Support for the async read views served under ASGI (see backend.urls_async).
+
+Django runs async ORM calls on one thread per request, one after another,
+so ``gather_reads`` is what lets independent queries overlap: each runs in
+its own worker thread on its own connection. ``AsyncAPIView`` is an
+APIView whose handlers are coroutines.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from rest_framework.views import APIView
+
+
+def _in_transaction():
+    return transaction.get_connection().in_atomic_block
+
+
+def _on_own_connection(function):
+    def run():
+        try:
+            return function()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_reads(*functions):
+    """Call the sync read-only ``functions`` concurrently and return their results in order.
+
+    Inside a transaction (tests, or a caller holding one) other connections
+    would not see its rows, so the functions run one after another on the
+    request's own connection instead.
+    """
+    if len(functions) > 1 and not await sync_to_async(_in_transaction)():
+        return await asyncio.gather(*(
+            sync_to_async(_on_own_connection(function), thread_sensitive=False)() for function in functions
+        ))
+    return [await sync_to_async(function)() for function in functions]
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines.
+
+    Content negotiation, authentication, permissions and throttling are DRF's
+    own and may touch the database, so ``initial`` runs in a worker thread;
+    the handler itself runs on the event loop. Requests other than GET and
+    HEAD are passed to ``fallback``, a sync view, when one is given.
+    """
+    view_is_async = True
+    fallback = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.fallback is not None and request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
@@ -0,0 +1,82 @@
+"""
+Conditional GET for content reads.
+
+Validators are derived from ``updated_at`` plus the author columns that show
+up in the representation, so they can be computed without reading ``body``.
+A list is validated by an aggregate over its filtered queryset, with an
+ETag only: rows that leave the list (deleted, unpublished) or join it by
+reaching their publish date do not move its latest ``updated_at``, but do
+change the count or last id the ETag covers. When the client's ``If-None-Match`` / ``If-Modified-Since`` match, the view answers
+304 before anything is serialized.
+"""
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Everything besides the row's own columns that a representation depends on
+VALIDATOR_FIELDS = ('id', 'updated_at', 'author', 'author__username', 'author__first_name', 'author__last_name')
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+class Validators:
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def for_rows(cls, kind, rows, *extra):
+        """Validators for a representation built from ``rows`` (values() dicts)."""
+        rows = sorted(rows, key=lambda row: row['id'])
+        etag = make_etag(kind, *extra, *[tuple(row.get(field) for field in VALIDATOR_FIELDS) for row in rows])
+        last_modified = max((row['updated_at'] for row in rows), default=None)
+        return cls(etag, last_modified)
+
+    @classmethod
+    def for_list(cls, queryset, *extra):
+        """Validators and row count for a filtered list, from a single aggregate."""
+        totals = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_at'), last_id=Max('id'))
+        return cls._from_totals(totals, extra)
+
+    @classmethod
+    async def afor_list(cls, queryset, *extra):
+        """``for_list`` through the async ORM API."""
+        totals = await queryset.order_by().aaggregate(count=Count('id'), last_modified=Max('updated_at'), last_id=Max('id'))
+        return cls._from_totals(totals, extra)
+
+    @classmethod
+    def _from_totals(cls, totals, extra):
+        validators = cls(make_etag('list', *extra, *totals.values()))
+        return validators, totals['count']
+
+    def not_modified(self, request):
+        """A 304 response if the client's copy is current, else None."""
+        return get_conditional_response(
+            request,
+            etag=self.etag,
+            last_modified=int(self.last_modified.timestamp()) if self.last_modified else None,
+        )
+
+    def apply(self, response):
+        if response.status_code == 200:
+            response.headers['ETag'] = self.etag
+            if self.last_modified:
+                response.headers['Last-Modified'] = http_date(self.last_modified.timestamp())
+        return response
+
+
+def row_validators(kind, queryset, *extra):
+    """Validators for the rows of ``queryset``, read without their text columns."""
+    return Validators.for_rows(kind, queryset.values(*VALIDATOR_FIELDS), *extra)
+
+
+async def arow_validators(kind, queryset, *extra):
+    """``row_validators`` through the async ORM API."""
+    return Validators.for_rows(kind, [row async for row in queryset.values(*VALIDATOR_FIELDS)], *extra)
@@ -0,0 +1,134 @@
+"""
+Debounced static page regeneration.
+
+Saving a published page marks its slug as pending until the debounce window
+closes; saves of a slug that is already pending are absorbed. The first mark
+queues ``flush_static_regenerations`` for when the window closes, and the
+flush hands the due slugs to one revalidation call per ``MAX_BATCH_SIZE``.
+
+Pending slugs live in a sorted set on the Redis instance behind
+``CELERY_BROKER_URL``, so every web process and worker shares them. The
+``memory`` backend keeps them in the current process instead, for tests.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'BACKEND': 'redis',
+    'DEBOUNCE_SECONDS': 5,
+    'MAX_BATCH_SIZE': 50,
+    'KEY': 'content:pending_regenerations',
+}
+
+FLUSH_GRACE = 1
+
+
+def regeneration_setting(name):
+    return getattr(settings, 'STATIC_REGENERATION', {}).get(name, DEFAULTS[name])
+
+
+class MemoryPendingStore:
+    def __init__(self):
+        self.due = {}
+        self.lock = threading.Lock()
+
+    def add(self, slug, due):
+        """Mark ``slug`` pending until ``due``. False if it already was."""
+        with self.lock:
+            if slug in self.due:
+                return False
+            self.due[slug] = due
+            return True
+
+    def pop_due(self, now, limit):
+        with self.lock:
+            ready = sorted((due, slug) for slug, due in self.due.items() if due <= now)[:limit]
+            for _, slug in ready:
+                del self.due[slug]
+            return [slug for _, slug in ready]
+
+    def next_due(self):
+        with self.lock:
+            return min(self.due.values(), default=None)
+
+
+class RedisPendingStore:
+    # Reading and removing the due slugs in one step keeps two flushes from
+    # revalidating the same slug.
+    POP_DUE = """
+        local slugs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+        if #slugs > 0 then
+            redis.call('ZREM', KEYS[1], unpack(slugs))
+        end
+        return slugs
+    """
+
+    def __init__(self, url, key):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.key = key
+        self.pop_script = self.client.register_script(self.POP_DUE)
+
+    def add(self, slug, due):
+        return bool(self.client.zadd(self.key, {slug: due}, nx=True))
+
+    def pop_due(self, now, limit):
+        return self.pop_script(keys=[self.key], args=[now, limit])
+
+    def next_due(self):
+        first = self.client.zrange(self.key, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if regeneration_setting('BACKEND') == 'memory':
+            _store = MemoryPendingStore()
+        else:
+            _store = RedisPendingStore(settings.CELERY_BROKER_URL, regeneration_setting('KEY'))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting == 'STATIC_REGENERATION':
+        _store = None
+
+
+def schedule_static_regeneration(slug):
+    """Regenerate ``slug`` once the debounce window that this save opens (or joins) closes."""
+    from .tasks import flush_static_regenerations
+
+    store = get_store()
+    window = regeneration_setting('DEBOUNCE_SECONDS')
+    now = time.time()
+    if store.add(slug, now + window):
+        # The grace second covers clocks that differ between web and worker hosts
+        flush_static_regenerations.apply_async(countdown=window + FLUSH_GRACE)
+        return
+    next_due = store.next_due()
+    if next_due is not None and next_due + window < now:
+        # A whole window overdue means its flush was lost, e.g. with a worker
+        flush_static_regenerations.delay()
+
+
+def flush_due(revalidate, now=None):
+    """Pass every due slug to ``revalidate``, at most MAX_BATCH_SIZE per call. Returns the number flushed."""
+    store = get_store()
+    now = time.time() if now is None else now
+    flushed = 0
+    while True:
+        slugs = store.pop_due(now, regeneration_setting('MAX_BATCH_SIZE'))
+        if not slugs:
+            return flushed
+        revalidate(slugs)
+        flushed += len(slugs)
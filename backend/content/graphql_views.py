@@ -0,0 +1,82 @@
+import json
+from django.db.models import Q
+from django.utils import timezone
+from graphene_django.views import GraphQLView
+from graphql import GraphQLError, OperationType, parse
+from graphql.language import FieldNode, OperationDefinitionNode, VariableNode
+from graphql.utilities import value_from_ast_untyped
+from .conditional import row_validators
+from .models import PageContent
+
+# Root fields whose result is fully determined by the page rows they look up
+CONDITIONAL_FIELDS = {'pageContentBySlug': 'slug', 'pageContent': 'id'}
+
+
+def _lookups(query, variables, operation_name):
+    """``{model field: [values]}`` read by a GET query made only of CONDITIONAL_FIELDS, else None."""
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    operations = [
+        definition for definition in document.definitions
+        if isinstance(definition, OperationDefinitionNode)
+        and (operation_name is None or definition.name and definition.name.value == operation_name)
+    ]
+    if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+        return None
+
+    lookups = {}
+    for selection in operations[0].selection_set.selections:
+        if not isinstance(selection, FieldNode) or selection.name.value not in CONDITIONAL_FIELDS:
+            return None
+        field = CONDITIONAL_FIELDS[selection.name.value]
+        for argument in selection.arguments:
+            value = argument.value
+            if isinstance(value, VariableNode):
+                value = variables.get(value.name.value)
+            else:
+                value = value_from_ast_untyped(value)
+            lookups.setdefault(field, []).append(value)
+    return lookups
+
+
+class ConditionalGraphQLView(GraphQLView):
+    """GraphQLView that answers GET reads of single pages with ETag/Last-Modified validators."""
+
+    def dispatch(self, request, *args, **kwargs):
+        validators = None
+        if request.method == 'GET' and not self.batch and not self.request_wants_html(request):
+            validators = self.get_validators(request)
+            if validators is not None:
+                not_modified = validators.not_modified(request)
+                if not_modified:
+                    return not_modified
+
+        response = super().dispatch(request, *args, **kwargs)
+        return validators.apply(response) if validators is not None else response
+
+    def get_validators(self, request):
+        query = request.GET.get('query')
+        if not query:
+            return None
+        try:
+            variables = json.loads(request.GET.get('variables') or '{}')
+        except ValueError:
+            return None
+        if not isinstance(variables, dict):
+            return None
+        operation_name = request.GET.get('operationName') or None
+
+        lookups = _lookups(query, variables, operation_name)
+        if not lookups:
+            return None
+        condition = Q()
+        for field, values in lookups.items():
+            condition |= Q(**{f'{field}__in': values})
+        queryset = PageContent.objects.filter(condition, is_published=True, publish_date__lte=timezone.now())
+        try:
+            return row_validators('graphql', queryset, query, sorted(variables.items()), operation_name)
+        except (TypeError, ValueError):
+            # Malformed ids; let the query itself report the error
+            return None
@@ -0,0 +1,129 @@
+"""
+Query planning and batching for GraphQL relations.
+
+``optimize_queryset`` reads the selection set of the field being resolved
+and adds ``select_related``/``prefetch_related`` for every relation the
+client asked for, so list fields cost a fixed number of queries.
+``unselected_fields`` names the large columns a resolver can defer.
+
+``get_loader`` returns a per-request loader that batches primary-key lookups
+for relations reached outside a planned queryset (mutation payloads, search
+hits, single-object fields). Keys primed by list resolvers are fetched
+together on the first ``load``.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+LOADERS_ATTRIBUTE = '_graphql_loaders'
+
+
+class ModelLoader:
+    def __init__(self, model):
+        self.model = model
+        self.cache = {}
+        self.pending = set()
+
+    def prime(self, keys):
+        """Queue keys to be fetched with the next cache miss."""
+        self.pending.update(key for key in keys if key is not None and key not in self.cache)
+
+    def load(self, key):
+        if key is None:
+            return None
+        if key not in self.cache:
+            batch, self.pending = self.pending | {key}, set()
+            found = self.model._default_manager.in_bulk(batch)
+            for batch_key in batch:
+                self.cache[batch_key] = found.get(batch_key)
+        return self.cache[key]
+
+
+def get_loader(info, model):
+    """The loader for ``model`` bound to the current request."""
+    context = info.context
+    if context is None:
+        return ModelLoader(model)
+    loaders = getattr(context, LOADERS_ATTRIBUTE, None)
+    if loaders is None:
+        loaders = {}
+        setattr(context, LOADERS_ATTRIBUTE, loaders)
+    if model not in loaders:
+        loaders[model] = ModelLoader(model)
+    return loaders[model]
+
+
+def prime_relations(info, rows, field_names):
+    """Queue the related keys of ``rows`` that are not already cached on them."""
+    for name in field_names:
+        field = rows[0]._meta.get_field(name) if rows else None
+        if field is None:
+            continue
+        keys = [getattr(row, field.attname) for row in rows if not field.is_cached(row)]
+        if keys:
+            get_loader(info, field.related_model).prime(keys)
+
+
+def _field_nodes(selection_set, fragments):
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _field_nodes(selection.selection_set, fragments)
+        elif isinstance(selection, FragmentSpreadNode):
+            yield from _field_nodes(fragments[selection.name.value].selection_set, fragments)
+
+
+def selected_nodes(info, path=()):
+    """Field nodes selected under ``path`` (GraphQL names) of the current field."""
+    nodes = list(info.field_nodes)
+    for name in path:
+        nodes = [
+            child
+            for node in nodes
+            for child in _field_nodes(node.selection_set, info.fragments)
+            if child.name.value == name
+        ]
+    return [child for node in nodes for child in _field_nodes(node.selection_set, info.fragments)]
+
+
+def plan_relations(model, nodes, fragments, prefix=''):
+    """``(select_related, prefetch_related)`` lookups for the selected relations."""
+    select, prefetch = [], []
+    for node in nodes:
+        try:
+            field = model._meta.get_field(to_snake_case(node.name.value))
+        except FieldDoesNotExist:
+            continue
+        if not field.is_relation:
+            continue
+
+        lookup = prefix + field.name
+        children = list(_field_nodes(node.selection_set, fragments))
+        nested_select, nested_prefetch = plan_relations(field.related_model, children, fragments, lookup + '__')
+        if field.many_to_one or field.one_to_one:
+            select.append(lookup)
+            select.extend(nested_select)
+        else:
+            prefetch.append(lookup)
+            prefetch.extend(nested_select)
+        prefetch.extend(nested_prefetch)
+    return select, prefetch
+
+
+def unselected_fields(info, names, path=()):
+    """The fields among ``names`` that the client did not select under ``path``."""
+    selected = {to_snake_case(node.name.value) for node in selected_nodes(info, path)}
+    return [name for name in names if name not in selected]
+
+
+def optimize_queryset(queryset, info, path=()):
+    """Join or prefetch every relation selected under ``path``."""
+    select, prefetch = plan_relations(queryset.model, selected_nodes(info, path), info.fragments)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
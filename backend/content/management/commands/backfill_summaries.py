@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from content.models import SUMMARY_FIELDS, PageContent
+from content.stats import invalidate_public_stats
+
+
+class Command(BaseCommand):
+    help = 'Store the excerpt, word count and reading time of pages written without them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', dest='everything',
+                            help='Recompute every page, e.g. after the excerpt length changed')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        pages = PageContent.objects.only('id', 'body').order_by('id')
+        if not options['everything']:
+            pages = pages.filter(word_count=0).exclude(body='')
+
+        updated, last = 0, 0
+        while True:
+            # Keyset batches, so each one reads only the rows it updates
+            batch = list(pages.filter(id__gt=last)[:batch_size])
+            if not batch:
+                break
+            for page in batch:
+                page.update_summary()
+            with transaction.atomic():
+                PageContent.objects.bulk_update(batch, SUMMARY_FIELDS)
+            updated += len(batch)
+            last = batch[-1].pk
+            self.stdout.write(f'{updated} pages')
+        if updated:
+            # The homepage stats show the excerpts
+            invalidate_public_stats()
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} pages'))
@@ -0,0 +1,79 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from content.models import PageContent
+from content.serializers import (
+    PageContentListSerializer,
+    PageContentSerializer,
+    page_content_list_reader,
+    page_content_reader,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the REST content serializers against the values() fast path. '
+        'Synthetic rows are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--body-chars', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        authors = get_user_model().objects.bulk_create(
+            [get_user_model()(username=f'bench-author-{index}') for index in range(50)]
+        )
+        now = timezone.now()
+        PageContent.objects.bulk_create(
+            [
+                PageContent(title=f'Benchmark page {index}', slug=f'benchmark-page-{index}',
+                            body='x' * options['body_chars'], is_published=True, publish_date=now,
+                            author=authors[index % len(authors)])
+                for index in range(options['rows'])
+            ],
+            batch_size=1000,
+        )
+        # Each case builds its queryset afresh so no run reuses the rows (and
+        # cached authors) fetched by an earlier one.
+        def queryset():
+            return PageContent.objects.filter(slug__startswith='benchmark-page-')
+
+        cases = [
+            ('list serializer', lambda: PageContentListSerializer(queryset(), many=True).data),
+            ('list serializer + select_related',
+             lambda: PageContentListSerializer(queryset().select_related('author'), many=True).data),
+            ('list fast path',
+             lambda: [page_content_list_reader.to_representation(row) for row in page_content_list_reader.values(queryset())]),
+            ('detail serializer', lambda: PageContentSerializer(queryset(), many=True).data),
+            ('detail serializer + select_related',
+             lambda: PageContentSerializer(queryset().select_related('author'), many=True).data),
+            ('detail fast path',
+             lambda: [page_content_reader.to_representation(row) for row in page_content_reader.values(queryset())]),
+        ]
+
+        rows = options['rows']
+        self.stdout.write(f'{"case":<36} {"rows/sec":>12}')
+        for name, case in cases:
+            best = min(self.time(case) for _ in range(options['repeat']))
+            self.stdout.write(f'{name:<36} {rows / best:>12,.0f}')
+
+    def time(self, case):
+        started = time.perf_counter()
+        case()
+        return time.perf_counter() - started
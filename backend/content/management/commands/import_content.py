@@ -0,0 +1,179 @@
+import csv
+import json
+import time
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from content.models import PageContent, SiteCounter
+from content.slugs import SLUG_ATTEMPTS, allocate_slugs
+from content.stats import invalidate_public_stats
+from content.tasks import regenerate_static_pages
+from recommendations.models import ContentToken
+from recommendations.tasks import rebuild_recommendations
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def read_jsonl(handle):
+    for line in handle:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Reported as an invalid row rather than ending the import
+                yield None
+
+
+def read_csv(handle):
+    yield from csv.DictReader(handle)
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def build_page(record, author):
+    """An unsaved PageContent for one input record, checked the way full_clean would."""
+    if not isinstance(record, dict):
+        raise InvalidRow('not a JSON object')
+    title = (record.get('title') or '').strip()
+    body = record.get('body') or ''
+    if not title:
+        raise InvalidRow('title is required')
+    if not body:
+        raise InvalidRow('body is required')
+
+    page = PageContent(
+        title=title,
+        slug=(record.get('slug') or '').strip(),
+        body=body,
+        content_type=record.get('content_type') or 'article',
+        meta_description=record.get('meta_description') or '',
+        is_published=parse_bool(record.get('is_published')),
+        author=author,
+    )
+    if record.get('publish_date'):
+        page.publish_date = parse_datetime(record['publish_date'])
+        if page.publish_date is None:
+            raise InvalidRow(f'invalid publish_date {record["publish_date"]!r}')
+        if timezone.is_naive(page.publish_date):
+            page.publish_date = timezone.make_aware(page.publish_date)
+    # The author was looked up once for the whole import, and missing slugs
+    # are allocated per batch
+    page.clean_fields(exclude=['author'] if page.slug else ['author', 'slug'])
+    page.clean()
+    # bulk_create does not call save()
+    page.update_summary()
+    return page
+
+
+class Command(BaseCommand):
+    help = 'Stream pages from a JSONL or CSV file into PageContent in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format; taken from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--author', help='Username to set as the author of every imported page')
+        parser.add_argument('--skip-recommendations', action='store_true',
+                            help='Do not index the pages for recommendations or queue a rebuild')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        author = None
+        if options['author']:
+            author = get_user_model().objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'No user named {options["author"]!r}')
+
+        self.imported = self.skipped = 0
+        self.recommendations = not options['skip_recommendations']
+        started = time.monotonic()
+        with open(path, newline='' if file_format == 'csv' else None, encoding='utf-8') as handle:
+            records = enumerate(read_csv(handle) if file_format == 'csv' else read_jsonl(handle), start=1)
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch, author)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{self.imported} imported, {self.skipped} skipped ({self.imported / elapsed:,.0f} rows/s)')
+
+        if self.imported and self.recommendations:
+            rebuild_recommendations.delay()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} pages in {time.monotonic() - started:.1f}s, skipped {self.skipped}'
+        ))
+
+    def import_batch(self, batch, author):
+        pages = []
+        for number, record in batch:
+            try:
+                pages.append((number, build_page(record, author)))
+            except (InvalidRow, ValidationError) as error:
+                self.skip(number, error)
+
+        given = [page.slug for _, page in pages if page.slug]
+        taken = set(PageContent.objects.filter(slug__in=given).values_list('slug', flat=True))
+        kept = []
+        for number, page in pages:
+            if page.slug in taken:
+                self.skip(number, f'slug {page.slug!r} is already taken')
+                continue
+            if page.slug:
+                taken.add(page.slug)
+            kept.append((number, page))
+
+        supplied = {number for number, page in kept if page.slug}
+        generated = [page for _, page in kept if not page.slug]
+        attempts = 0
+        while True:
+            slugs = allocate_slugs(PageContent, [page.title for page in generated], reserved=given)
+            for page, slug in zip(generated, slugs):
+                page.slug = slug
+            try:
+                with transaction.atomic():
+                    self.after_insert(PageContent.objects.bulk_create([page for _, page in kept]))
+                break
+            except IntegrityError:
+                # Another writer took one of the slugs meanwhile. Rows that
+                # brought a slug it took are skipped; allocated slugs are
+                # picked again, up to SLUG_ATTEMPTS times
+                taken = set(PageContent.objects.filter(slug__in=given).values_list('slug', flat=True))
+                if not taken:
+                    attempts += 1
+                    if attempts == SLUG_ATTEMPTS:
+                        raise
+                for number, page in kept:
+                    if number in supplied and page.slug in taken:
+                        self.skip(number, f'slug {page.slug!r} is already taken')
+                kept = [(number, page) for number, page in kept if number not in supplied or page.slug not in taken]
+                given = [slug for slug in given if slug not in taken]
+        self.imported += len(kept)
+
+    def after_insert(self, pages):
+        """What the per-row post_save receivers would have done, once for the batch."""
+        published = [page for page in pages if page.is_published]
+        SiteCounter.objects.adjust(SiteCounter.PUBLISHED_CONTENT, len(published))
+        if self.recommendations:
+            ContentToken.objects.index_new(pages)
+        invalidate_public_stats()
+        if published:
+            slugs = [page.slug for page in published]
+            transaction.on_commit(lambda: regenerate_static_pages.delay(slugs))
+
+    def skip(self, where, reason):
+        self.skipped += 1
+        self.stderr.write(f'Skipped record {where}: {reason}')
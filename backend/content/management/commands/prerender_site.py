@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from content.prerender import (
+    BUILT,
+    live_pages,
+    prerender_setting,
+    prerendered_slugs,
+    remove_artifacts,
+    render_artifacts,
+)
+from content.serializers import page_content_reader
+from content.tasks import regenerate_static_pages
+
+
+class Command(BaseCommand):
+    help = 'Prerender every published page, skipping pages whose content hash is unchanged'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Rendering threads (defaults to STATIC_PRERENDER["WORKERS"])')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Rebuild pages whose hash is unchanged')
+        parser.add_argument('--async', action='store_true', dest='run_async',
+                            help='Queue one Celery job per chunk instead of rendering here')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['run_async']:
+            slugs = list(live_pages().order_by('id').values_list('slug', flat=True))
+            for start in range(0, len(slugs), chunk_size):
+                regenerate_static_pages.delay(slugs[start:start + chunk_size])
+            self.stdout.write(self.style.SUCCESS(f'Queued {len(slugs)} pages in chunks of {chunk_size}'))
+            return
+
+        started = time.monotonic()
+        live = set()
+        built = total = 0
+        rows = page_content_reader.values(live_pages().order_by('id')).iterator(chunk_size=chunk_size)
+        # Only this thread touches the database; rendering and compression
+        # happen on the pool, one chunk of rows at a time.
+        with ThreadPoolExecutor(max_workers=options['workers'] or prerender_setting('WORKERS')) as pool:
+            while True:
+                chunk = [row for _, row in zip(range(chunk_size), rows)]
+                if not chunk:
+                    break
+                live.update(row['slug'] for row in chunk)
+                outcomes = list(pool.map(lambda row: render_artifacts(row, force=options['force']), chunk))
+                built += outcomes.count(BUILT)
+                total += len(chunk)
+
+        stale = prerendered_slugs() - live
+        for slug in stale:
+            remove_artifacts(slug)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Prerendered {total} pages in {time.monotonic() - started:.1f}s: '
+            f'{built} built, {total - built} unchanged, {len(stale)} removed'
+        ))
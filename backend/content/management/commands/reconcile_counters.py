@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from content.models import SiteCounter
+
+
+class Command(BaseCommand):
+    help = 'Recount the site counters from the content and user tables'
+
+    def handle(self, *args, **options):
+        before = dict(SiteCounter.objects.values_list('name', 'value'))
+        for name, value in SiteCounter.objects.reconcile().items():
+            previous = before.get(name)
+            change = '' if previous == value else f' (was {previous})'
+            self.stdout.write(f'{name}: {value}{change}')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE content_pagecontent_fts USING fts5(
+        title, body, meta_description,
+        content='content_pagecontent', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER content_pagecontent_fts_insert AFTER INSERT ON content_pagecontent BEGIN
+        INSERT INTO content_pagecontent_fts(rowid, title, body, meta_description)
+        VALUES (new.id, new.title, new.body, new.meta_description);
+    END
+    """,
+    """
+    CREATE TRIGGER content_pagecontent_fts_delete AFTER DELETE ON content_pagecontent BEGIN
+        INSERT INTO content_pagecontent_fts(content_pagecontent_fts, rowid, title, body, meta_description)
+        VALUES ('delete', old.id, old.title, old.body, old.meta_description);
+    END
+    """,
+    """
+    CREATE TRIGGER content_pagecontent_fts_update AFTER UPDATE OF title, body, meta_description ON content_pagecontent BEGIN
+        INSERT INTO content_pagecontent_fts(content_pagecontent_fts, rowid, title, body, meta_description)
+        VALUES ('delete', old.id, old.title, old.body, old.meta_description);
+        INSERT INTO content_pagecontent_fts(rowid, title, body, meta_description)
+        VALUES (new.id, new.title, new.body, new.meta_description);
+    END
+    """,
+    "INSERT INTO content_pagecontent_fts(content_pagecontent_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS content_pagecontent_fts_update',
+    'DROP TRIGGER IF EXISTS content_pagecontent_fts_delete',
+    'DROP TRIGGER IF EXISTS content_pagecontent_fts_insert',
+    'DROP TABLE IF EXISTS content_pagecontent_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE content_pagecontent ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(meta_description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX content_pagecontent_search_vector_idx ON content_pagecontent USING GIN (search_vector)',
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS content_pagecontent_search_vector_idx',
+    'ALTER TABLE content_pagecontent DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_pagecontent_author_pagecontent_content_type_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
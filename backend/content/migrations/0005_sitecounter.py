@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_existing_rows(apps, schema_editor):
+    SiteCounter = apps.get_model('content', 'SiteCounter')
+    PageContent = apps.get_model('content', 'PageContent')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    SiteCounter.objects.bulk_create([
+        SiteCounter(name='published_content', value=PageContent.objects.filter(is_published=True).count()),
+        SiteCounter(name='active_users', value=User.objects.filter(is_active=True).count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0004_pagecontent_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('content.migrations.0004_pagecontent_search_index')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding (and on older SQLite, removing) a column remakes the table,
+    # which drops the triggers that keep the search index in step with it
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in search_index.SQLITE_FORWARD:
+            if 'CREATE TRIGGER' in statement:
+                schema_editor.execute(statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_sitecounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='preview_token_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
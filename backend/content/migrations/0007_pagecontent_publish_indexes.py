@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:08
+
+import content.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0006_pagecontent_preview_token_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=content.models.PublishOrderIndex(condition=models.Q(('is_published', True)), fields=['-publish_date', '-id'], name='content_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=content.models.PublishOrderIndex(condition=models.Q(('is_published', True)), fields=['content_type', '-publish_date', '-id'], name='content_published_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=content.models.PublishOrderIndex(fields=['author', '-publish_date', '-id'], name='content_author_date_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('content.migrations.0004_pagecontent_search_index')
+
+BACKFILL_BATCH_SIZE = 1000
+
+# content.models.summarise as of this migration, so later changes to it do
+# not change what the migration writes
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+
+def summarise(body):
+    body = body or ''
+    excerpt = body[:EXCERPT_LENGTH] + '...' if len(body) > EXCERPT_LENGTH else body
+    word_count = len(body.split())
+    return excerpt, word_count, -(-word_count // WORDS_PER_MINUTE)
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding a NOT NULL column remakes the table on SQLite, which drops the
+    # search index triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in search_index.SQLITE_FORWARD:
+            if 'CREATE TRIGGER' in statement:
+                schema_editor.execute(statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS'))
+
+
+def backfill_summaries(apps, schema_editor):
+    PageContent = apps.get_model('content', 'PageContent')
+    pages = PageContent.objects.using(schema_editor.connection.alias).only('id', 'body').order_by('id')
+    last = 0
+    while batch := list(pages.filter(id__gt=last)[:BACKFILL_BATCH_SIZE]):
+        for page in batch:
+            page.excerpt, page.word_count, page.reading_time = summarise(page.body)
+        PageContent.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ['excerpt', 'word_count', 'reading_time'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0007_pagecontent_publish_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pagecontent',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
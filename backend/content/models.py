@@ -1,12 +1,46 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.core.exceptions import ValidationError
-from django.utils.text import slugify
 from django.utils import timezone
 from django.conf import settings
 import re
-from django.db.models.signals import post_save
+from django.db.models import F, Q
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .tasks import regenerate_static_page
+from .slugs import save_with_unique_slug
+from .debounce import schedule_static_regeneration
+from .sqlite import apply_profile, serialized_write
+
+
+# Stored with each page so list views never read the body
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+SUMMARY_FIELDS = ['excerpt', 'word_count', 'reading_time']
+
+
+def summarise(body):
+    """``(excerpt, word_count, reading_time)`` for a page body, the reading time in whole minutes."""
+    body = body or ''
+    excerpt = body[:EXCERPT_LENGTH] + '...' if len(body) > EXCERPT_LENGTH else body
+    word_count = len(body.split())
+    return excerpt, word_count, -(-word_count // WORDS_PER_MINUTE)
+
+
+class PublishOrderIndex(models.Index):
+    """
+    An index that reads rows in ``pagination.ORDERING`` order, NULL publish
+    dates last. SQLite already sorts NULLs last for DESC (and rejects NULLS
+    LAST in CREATE INDEX); PostgreSQL sorts them first unless told.
+    """
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        statement = super().create_sql(model, schema_editor, using=using, **kwargs)
+        if schema_editor.connection.vendor == 'postgresql':
+            columns = statement.parts['columns']
+            columns.col_suffixes = [
+                f'{suffix} NULLS LAST' if column == 'publish_date' and suffix == 'DESC' else suffix
+                for column, suffix in zip(columns.columns, columns.col_suffixes)
+            ]
+        return statement
 
 
 class PageContent(models.Model):
@@ -20,6 +54,24 @@ class PageContent(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='content', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped to revoke every preview token issued for the page
+    preview_token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Derived from body on save; backfill_summaries fills in rows written
+    # without it
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Public reads: published rows up to now, newest first
+            PublishOrderIndex(fields=['-publish_date', '-id'], condition=Q(is_published=True),
+                              name='content_published_idx'),
+            PublishOrderIndex(fields=['content_type', '-publish_date', '-id'], condition=Q(is_published=True),
+                              name='content_published_type_idx'),
+            # An author's own pages, drafts included
+            PublishOrderIndex(fields=['author', '-publish_date', '-id'], name='content_author_date_idx'),
+        ]
 
     def clean(self):
         # Validate slug format
@@ -32,23 +84,187 @@ class PageContent(models.Model):
             # Auto-set publish date to now if content is published but no date is set
             self.publish_date = timezone.now()
 
+    def update_summary(self):
+        self.excerpt, self.word_count, self.reading_time = summarise(self.body)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            num = 1
-            while PageContent.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{num}"
-                num += 1
-            self.slug = slug
-
-        self.full_clean()  # Run model validations
-        super().save(*args, **kwargs)
+        # A body that was never loaded has not changed
+        if 'body' not in self.get_deferred_fields():
+            self.update_summary()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'body' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *SUMMARY_FIELDS}
+
+        # Signal receivers write too (counters), so they wait their turn with
+        # the row, and are rolled back with it if the save fails
+        using = kwargs.get('using') or router.db_for_write(PageContent, instance=self)
+        with serialized_write(using), transaction.atomic(using=using):
+            if self.slug:
+                self.full_clean()  # Run model validations
+                super().save(*args, **kwargs)
+                return
+
+            # Generated slugs are kept unique by the index rather than validate_unique
+            self.full_clean(exclude=['slug'])
+            save_with_unique_slug(self, lambda: super(PageContent, self).save(*args, **kwargs), self.title)
+
+    def delete(self, *args, **kwargs):
+        with serialized_write(kwargs.get('using') or router.db_for_write(PageContent, instance=self)):
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.title
+
+
+class SiteCounterManager(models.Manager):
+    def adjust(self, name, delta):
+        if not delta:
+            return
+        if not self.filter(name=name).update(value=F('value') + delta):
+            self.get_or_create(name=name)
+            self.filter(name=name).update(value=F('value') + delta)
+
+    def value(self, name):
+        return self.filter(name=name).values_list('value', flat=True).first() or 0
+
+    def values_for(self, *names):
+        values = dict(self.filter(name__in=names).values_list('name', 'value'))
+        return [values.get(name, 0) for name in names]
+
+    def reconcile(self):
+        """Recount every counter from its source table. Returns ``{name: value}``."""
+        from django.contrib.auth import get_user_model
+
+        totals = {
+            self.model.PUBLISHED_CONTENT: PageContent.objects.filter(is_published=True).count(),
+            self.model.ACTIVE_USERS: get_user_model().objects.filter(is_active=True).count(),
+        }
+        with transaction.atomic():
+            for name, value in totals.items():
+                self.update_or_create(name=name, defaults={'value': value})
+        return totals
+
+
+class SiteCounter(models.Model):
+    """Running totals kept up to date by signals, so reading one is a primary-key lookup."""
+    PUBLISHED_CONTENT = 'published_content'
+    ACTIVE_USERS = 'active_users'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = SiteCounterManager()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
     
+@receiver(connection_created)
+def configure_sqlite(connection, **kwargs):
+    apply_profile(connection)
+
+
+# Connected before count_state_change, which writes the new state to the row
+@receiver(pre_save, sender=PageContent)
+def remember_published_state(sender, instance, using, **kwargs):
+    instance._was_published = instance.pk is not None and (
+        sender._default_manager.using(using).filter(pk=instance.pk, is_published=True).exists())
+
+
+def _remove_artifacts_on_commit(slug, using):
+    from .prerender import remove_artifacts
+
+    # At once rather than at the debounced regeneration, so the page is no
+    # longer served from its artifacts as soon as the change commits
+    transaction.on_commit(lambda: remove_artifacts(slug), using=using)
+
+
 @receiver(post_save, sender=PageContent)
-def trigger_page_regeneration(sender, instance, **kwargs):
+def trigger_page_regeneration(sender, instance, using, **kwargs):
+    from recommendations.tasks import update_recommendations
+    from .prerender import is_live
+
+    # Unpublishing also regenerates (and drops) the static page
+    if instance.is_published or getattr(instance, '_was_published', False):
+        if not is_live(instance):
+            _remove_artifacts_on_commit(instance.slug, using)
+        schedule_static_regeneration(instance.slug)
+    # Also runs on unpublish so the page is evicted from other neighbour lists
+    update_recommendations.delay(instance.pk)
+
+
+@receiver(post_delete, sender=PageContent)
+def drop_static_page(sender, instance, using, **kwargs):
     if instance.is_published:
-        regenerate_static_page.delay(instance.slug)
\ No newline at end of file
+        _remove_artifacts_on_commit(instance.slug, using)
+        # The regeneration removes them too, in case the commit hook failed
+        schedule_static_regeneration(instance.slug)
+
+
+# Other user saves (a login's last_login, on every sign-in) only reach the
+# stats when they change the active user count; see _adjust_counter
+@receiver(post_save, sender=PageContent)
+@receiver(post_delete, sender=PageContent)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_homepage_stats(sender, **kwargs):
+    from .stats import invalidate_public_stats
+
+    invalidate_public_stats()
+
+
+# Rows changed with QuerySet.update() or bulk_create() bypass these signals;
+# the reconcile_counters command recounts from scratch.
+def _counter_for(sender):
+    if sender is PageContent:
+        return SiteCounter.PUBLISHED_CONTENT, 'is_published'
+    return SiteCounter.ACTIVE_USERS, 'is_active'
+
+
+def _adjust_counter(counter, delta):
+    from .stats import invalidate_public_stats
+
+    SiteCounter.objects.adjust(counter, delta)
+    # The homepage stats show the counters
+    invalidate_public_stats()
+
+
+def _store_state(sender, instance, value, using):
+    """Write ``value`` to the stored row's counted field. True if it changed.
+
+    The conditional UPDATE both reads and changes the state, so of two saves
+    racing to the same state only one sees the change and counts it.
+    """
+    _, field = _counter_for(sender)
+    rows = sender._default_manager.using(using).filter(pk=instance.pk).exclude(**{field: value})
+    return bool(rows.update(**{field: value}))
+
+
+@receiver(pre_save, sender=PageContent)
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def count_state_change(sender, instance, using, update_fields, **kwargs):
+    # Both models save in a transaction, so the state and counter written
+    # here are rolled back if the save itself then fails
+    counter, field = _counter_for(sender)
+    # New rows are counted once inserted; saves of other fields (a login's
+    # last_login) leave the state alone
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    value = bool(getattr(instance, field))
+    if _store_state(sender, instance, value, using):
+        _adjust_counter(counter, 1 if value else -1)
+
+
+@receiver(post_save, sender=PageContent)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_site_counters(sender, instance, created, **kwargs):
+    counter, field = _counter_for(sender)
+    if created and getattr(instance, field):
+        _adjust_counter(counter, 1)
+
+
+# pre_delete runs inside the deletion's transaction, while the row still exists
+@receiver(pre_delete, sender=PageContent)
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def release_site_counters(sender, instance, using, **kwargs):
+    counter, _ = _counter_for(sender)
+    if _store_state(sender, instance, False, using):
+        _adjust_counter(counter, -1)
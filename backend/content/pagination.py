@@ -0,0 +1,151 @@
+"""
+Keyset pagination over ``(publish_date, id)``, newest first.
+
+Pages are selected with a range condition on the last row of the previous
+page instead of an OFFSET, so every page costs the same as the first one.
+Drafts with no publish date sort after everything else. Cursors are opaque
+base64 strings shared by the REST list endpoint and the GraphQL connection.
+"""
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULTS = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+    # Counting the whole filtered table is the one O(n) part of a page;
+    # deployments with very large tables can turn it off.
+    'INCLUDE_COUNT': True,
+}
+
+ORDERING = (F('publish_date').desc(nulls_last=True), F('id').desc())
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def pagination_setting(name):
+    return getattr(settings, 'CONTENT_PAGINATION', {}).get(name, DEFAULTS[name])
+
+
+def page_size_for(requested):
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return pagination_setting('PAGE_SIZE')
+    return max(1, min(requested, pagination_setting('MAX_PAGE_SIZE')))
+
+
+def encode_cursor(page):
+    """Cursor for the position just after ``page`` (a model instance or a values() row)."""
+    if isinstance(page, dict):
+        publish_date, pk = page['publish_date'], page['id']
+    else:
+        publish_date, pk = page.publish_date, page.pk
+    position = {'d': publish_date.isoformat() if publish_date else None, 'i': pk}
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        publish_date = parse_datetime(position['d']) if position['d'] is not None else None
+        pk = int(position['i'])
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if position['d'] is not None and publish_date is None:
+        raise InvalidCursor(cursor)
+    return publish_date, pk
+
+
+def after_cursor(queryset, cursor):
+    """Rows that come after ``cursor`` in keyset order."""
+    publish_date, pk = decode_cursor(cursor)
+    if publish_date is None:
+        return queryset.filter(publish_date__isnull=True, id__lt=pk)
+    return queryset.filter(
+        Q(publish_date__lt=publish_date)
+        | Q(publish_date=publish_date, id__lt=pk)
+        | Q(publish_date__isnull=True)
+    )
+
+
+def paginate(queryset, first=None, after=None):
+    """Return ``(rows, has_next)`` for one page of ``queryset``."""
+    size = page_size_for(first)
+    if after:
+        queryset = after_cursor(queryset, after)
+    rows = list(queryset.order_by(*ORDERING)[:size + 1])
+    return rows[:size], len(rows) > size
+
+
+async def apaginate(queryset, first=None, after=None):
+    """``paginate`` through the async ORM API."""
+    size = page_size_for(first)
+    if after:
+        queryset = after_cursor(queryset, after)
+    rows = [row async for row in queryset.order_by(*ORDERING)[:size + 1]]
+    return rows[:size], len(rows) > size
+
+
+class PublishDateCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        """``count`` may be passed in when the caller has already counted the rows."""
+        self.request = request
+        self.count = None
+        if self.include_count(request):
+            self.count = queryset.count() if count is None else count
+        return self.select_rows(queryset, request)
+
+    def include_count(self, request):
+        return pagination_setting('INCLUDE_COUNT') and request.query_params.get(self.count_query_param) not in ('0', 'false')
+
+    def select_rows(self, queryset, request):
+        """The rows of the requested page, without counting."""
+        try:
+            rows, self.has_next = paginate(
+                queryset,
+                first=request.query_params.get(self.page_size_query_param),
+                after=request.query_params.get(self.cursor_query_param),
+            )
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link()}
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,164 @@
+"""
+Static pre-rendering of published pages.
+
+Each live page is written to ``STATIC_PRERENDER['ROOT']`` as ``<slug>.json``
+(the REST detail representation) and ``<slug>.html``, each with a ``.gz``
+variant and, when the ``brotli`` package is installed, a ``.br`` one. A
+``<slug>.hash`` file records the content hash the artifacts were built from,
+so rendering a page whose title, body, meta description and ``updated_at``
+have not changed is skipped. Files are written to a temporary name and
+renamed, so readers never see a partial artifact.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from .models import PageContent
+from .serializers import page_content_reader
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULTS = {
+    'ROOT': None,
+    'WORKERS': 4,
+}
+
+FORMATS = {
+    'json': 'application/json',
+    'html': 'text/html; charset=utf-8',
+}
+
+# Encodings in order of preference when a client accepts several
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+HASH_FIELDS = ('title', 'body', 'meta_description', 'updated_at')
+
+BUILT, UNCHANGED, REMOVED = 'built', 'unchanged', 'removed'
+
+
+def prerender_setting(name):
+    return getattr(settings, 'STATIC_PRERENDER', {}).get(name, DEFAULTS[name])
+
+
+def artifact_root():
+    return Path(prerender_setting('ROOT') or Path(settings.BASE_DIR) / 'prerendered')
+
+
+def artifact_path(slug, suffix):
+    return artifact_root() / f'{slug}{suffix}'
+
+
+def content_hash(row):
+    digest = hashlib.sha256()
+    for field in HASH_FIELDS:
+        value = row[field]
+        digest.update(str(value.isoformat() if hasattr(value, 'isoformat') else value or '').encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def stored_hash(slug):
+    try:
+        return artifact_path(slug, '.hash').read_text()
+    except FileNotFoundError:
+        return None
+
+
+def live_pages():
+    return PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now())
+
+
+def is_live(page):
+    """Whether ``page`` is one of ``live_pages()``."""
+    return page.is_published and page.publish_date is not None and page.publish_date <= timezone.now()
+
+
+def _write(path, data):
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _variants(data):
+    yield '', data
+    yield '.gz', gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress(data)
+
+
+def render_artifacts(row, force=False):
+    """Write the artifacts for one page (a ``page_content_reader`` values() row)."""
+    slug = row['slug']
+    digest = content_hash(row)
+    if not force and stored_hash(slug) == digest:
+        return UNCHANGED
+
+    representation = page_content_reader.to_representation(row)
+    documents = {
+        'json': json.dumps(representation, cls=JSONEncoder, ensure_ascii=False).encode(),
+        'html': render_to_string('content/prerendered_page.html', {'page': representation}).encode(),
+    }
+    artifact_root().mkdir(parents=True, exist_ok=True)
+    for extension, document in documents.items():
+        for suffix, data in _variants(document):
+            _write(artifact_path(slug, f'.{extension}{suffix}'), data)
+    # Written last: a hash on disk means every artifact next to it is current
+    _write(artifact_path(slug, '.hash'), digest.encode())
+    return BUILT
+
+
+def remove_artifacts(slug):
+    removed = False
+    # Slugs contain no dots, so this only matches this page's files
+    for path in artifact_root().glob(f'{slug}.*'):
+        path.unlink(missing_ok=True)
+        removed = True
+    return removed
+
+
+def prerender_pages(slugs, force=False):
+    """Build or drop the artifacts of ``slugs``. Returns ``{slug: outcome}``."""
+    rows = {row['slug']: row for row in page_content_reader.values(live_pages().filter(slug__in=slugs))}
+    outcomes = {}
+    for slug in slugs:
+        if slug in rows:
+            outcomes[slug] = render_artifacts(rows[slug], force=force)
+        else:
+            # Unpublished, scheduled for later or deleted
+            remove_artifacts(slug)
+            outcomes[slug] = REMOVED
+    return outcomes
+
+
+def find_artifact(slug, extension, accept_encoding=''):
+    """``(path, content_encoding, etag)`` of the best prebuilt variant, or None."""
+    digest = stored_hash(slug)
+    if digest is None:
+        return None
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+    for encoding, suffix in ENCODINGS:
+        path = artifact_path(slug, f'.{extension}{suffix}')
+        if encoding in accepted and path.exists():
+            return path, encoding, f'"{digest}-{encoding}"'
+    path = artifact_path(slug, f'.{extension}')
+    if path.exists():
+        return path, None, f'"{digest}"'
+    return None
+
+
+def prerendered_slugs():
+    return {path.stem for path in artifact_root().glob('*.hash')}
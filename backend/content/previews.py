@@ -0,0 +1,49 @@
+"""
+Signed preview tokens.
+
+A token is ``<page id>-<version>-<expiry>`` signed with SECRET_KEY, so it
+is checked without any shared storage: the signature and expiry need no
+lookup, and the version is compared with the page row the preview reads
+anyway. Revoking every outstanding token of a page bumps its
+``preview_token_version``.
+"""
+import time
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from .models import PageContent
+
+DEFAULT_MAX_AGE = 60 * 60
+
+SALT = 'content.preview'
+
+
+def preview_token_max_age():
+    return getattr(settings, 'PREVIEW_TOKEN_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def make_preview_token(page, max_age=None):
+    """``(token, expires)`` for previewing ``page``; ``expires`` is a Unix timestamp."""
+    expires = int(time.time()) + (preview_token_max_age() if max_age is None else max_age)
+    value = f'{page.pk}-{signing.b62_encode(page.preview_token_version)}-{signing.b62_encode(expires)}'
+    return signing.Signer(salt=SALT).sign(value), expires
+
+
+def read_preview_token(token, pk):
+    """The page version ``token`` was issued for, or None if it is forged, expired or for another page."""
+    try:
+        value = signing.Signer(salt=SALT).unsign(token)
+        token_pk, version, expires = value.split('-')
+        version, expires = signing.b62_decode(version), signing.b62_decode(expires)
+    except (signing.BadSignature, ValueError):
+        return None
+    if token_pk != str(pk) or expires < time.time():
+        return None
+    return version
+
+
+def revoke_preview_tokens(pk):
+    """Invalidate every preview token issued so far for page ``pk``. False if there is no such page."""
+    # update() leaves updated_at and the save receivers alone: nothing the
+    # page shows has changed
+    return bool(PageContent.objects.filter(pk=pk).update(preview_token_version=F('preview_token_version') + 1))
@@ -1,13 +1,72 @@
 import graphene
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from graphql import GraphQLError
 from graphene_django.types import DjangoObjectType
+from django.contrib.auth import get_user_model
+from .loaders import get_loader, optimize_queryset, prime_relations, unselected_fields
 from .models import PageContent
+from .pagination import InvalidCursor, apaginate, encode_cursor, paginate, pagination_setting
+from .search import search_page_contents
 from django.utils import timezone
-from django.utils.text import slugify
+
+# Left in the database unless the query asks for them
+LARGE_FIELDS = ('body',)
+
+class AuthorType(DjangoObjectType):
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'username', 'first_name', 'last_name')
 
 class PageContentType(DjangoObjectType):
     class Meta:
         model = PageContent
-        fields = "__all__"
+        exclude = ("preview_token_version",)
+
+    def resolve_author(self, info):
+        if PageContent.author.is_cached(self):
+            return self.author
+        return get_loader(info, get_user_model()).load(self.author_id)
+
+class PageContentConnection(graphene.relay.Connection):
+    class Meta:
+        node = PageContentType
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        # Only counted when the client asks for it
+        if not pagination_setting('INCLUDE_COUNT'):
+            return None
+        return self.queryset.count()
+
+def build_connection(connection_class, queryset, rows, has_next, after):
+    """One page of ``rows`` as a relay connection."""
+    edges = [connection_class.Edge(node=row, cursor=encode_cursor(row)) for row in rows]
+    connection = connection_class(
+        edges=edges,
+        page_info=graphene.relay.PageInfo(
+            has_next_page=has_next,
+            has_previous_page=bool(after),
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+    )
+    connection.queryset = queryset
+    return connection
+
+class SearchResultType(graphene.ObjectType):
+    page_content = graphene.Field(PageContentType)
+    rank = graphene.Float()
+    title_highlight = graphene.String()
+    snippet = graphene.String()
+
+    def resolve_page_content(self, info):
+        return self.page
+
+def published_page_contents(info, path=()):
+    queryset = PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now())
+    return optimize_queryset(queryset.defer(*unselected_fields(info, LARGE_FIELDS, path)), info, path)
 
 class CreatePageContent(graphene.Mutation):
     class Arguments:
@@ -20,19 +79,9 @@ class CreatePageContent(graphene.Mutation):
     page_content = graphene.Field(PageContentType)
 
     def mutate(self, info, title, body, content_type="article", meta_description="", is_published=False):
-        # Generate slug from title
-        slug = slugify(title)
-        
-        # Ensure unique slug
-        counter = 1
-        original_slug = slug
-        while PageContent.objects.filter(slug=slug).exists():
-            slug = f"{original_slug}-{counter}"
-            counter += 1
-
+        # The slug is allocated from the title by PageContent.save
         page_content = PageContent.objects.create(
             title=title,
-            slug=slug,
             body=body,
             content_type=content_type,
             meta_description=meta_description,
@@ -79,15 +128,78 @@ class Mutation(graphene.ObjectType):
 class Query(graphene.ObjectType):
     page_content = graphene.Field(PageContentType, id=graphene.Int())
     page_content_by_slug = graphene.Field(PageContentType, slug=graphene.String(required=True))
-    all_page_contents = graphene.List(PageContentType)
+    all_page_contents = graphene.Field(PageContentConnection, first=graphene.Int(), after=graphene.String())
+    search_page_contents = graphene.List(
+        SearchResultType,
+        q=graphene.String(required=True),
+        limit=graphene.Int(default_value=20),
+        offset=graphene.Int(default_value=0),
+    )
 
     def resolve_page_content(self, info, id):
-        return PageContent.objects.filter(id=id, is_published=True, publish_date__lte=timezone.now()).first()
+        return published_page_contents(info).filter(id=id).first()
 
     def resolve_page_content_by_slug(self, info, slug):
-        return PageContent.objects.filter(slug=slug, is_published=True, publish_date__lte=timezone.now()).first()
+        return published_page_contents(info).filter(slug=slug).first()
+
+    def resolve_all_page_contents(self, info, first=None, after=None):
+        queryset = published_page_contents(info, path=('edges', 'node'))
+        try:
+            rows, has_next = paginate(queryset, first=first, after=after)
+        except InvalidCursor:
+            raise GraphQLError('Invalid cursor')
+        return build_connection(PageContentConnection, queryset, rows, has_next, after)
+
+    def resolve_search_page_contents(self, info, q, limit, offset):
+        hits, total = search_page_contents(q, limit=max(1, min(limit, 50)), offset=max(0, offset),
+                                           defer=unselected_fields(info, LARGE_FIELDS, ('pageContent',)))
+        prime_relations(info, [hit.page for hit in hits], ['author'])
+        return hits
+
+schema = graphene.Schema(query=Query, mutation=Mutation)
+
+
+class AsyncPageContentConnection(PageContentConnection):
+    class Meta:
+        name = 'PageContentConnection'
+        node = PageContentType
+
+    async def resolve_total_count(self, info):
+        if not pagination_setting('INCLUDE_COUNT'):
+            return None
+        return await self.queryset.acount()
+
+def _search_with_authors(q, limit, offset, defer):
+    hits, total = search_page_contents(q, limit=limit, offset=offset, defer=defer)
+    prefetch_related_objects([hit.page for hit in hits], 'author')
+    return hits
+
+# The queries of Query with coroutine resolvers, for the async GraphQL view.
+# Relations are always loaded with the rows (optimize_queryset plans them),
+# since nested resolvers cannot reach the database from the event loop.
+# Mutations are served by the sync schema.
+class AsyncQuery(Query):
+    class Meta:
+        name = 'Query'
+
+    all_page_contents = graphene.Field(AsyncPageContentConnection, first=graphene.Int(), after=graphene.String())
+
+    async def resolve_page_content(self, info, id):
+        return await published_page_contents(info).filter(id=id).afirst()
+
+    async def resolve_page_content_by_slug(self, info, slug):
+        return await published_page_contents(info).filter(slug=slug).afirst()
+
+    async def resolve_all_page_contents(self, info, first=None, after=None):
+        queryset = published_page_contents(info, path=('edges', 'node'))
+        try:
+            rows, has_next = await apaginate(queryset, first=first, after=after)
+        except InvalidCursor:
+            raise GraphQLError('Invalid cursor')
+        return build_connection(AsyncPageContentConnection, queryset, rows, has_next, after)
 
-    def resolve_all_page_contents(self, info):
-        return PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now())
+    async def resolve_search_page_contents(self, info, q, limit, offset):
+        return await sync_to_async(_search_with_authors)(q, max(1, min(limit, 50)), max(0, offset),
+                                                         unselected_fields(info, LARGE_FIELDS, ('pageContent',)))
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
+async_schema = graphene.Schema(query=AsyncQuery)
\ No newline at end of file
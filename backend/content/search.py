@@ -0,0 +1,150 @@
+"""
+Full-text search over PageContent.
+
+SQLite uses an external-content FTS5 table kept in sync by triggers, and
+PostgreSQL a generated ``search_vector`` tsvector column with a GIN index.
+Both are created by migration 0004. Other backends fall back to plain
+``icontains`` filtering with no ranking.
+"""
+import html
+import re
+from collections import namedtuple
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import PageContent
+
+FTS_TABLE = 'content_pagecontent_fts'
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# The database marks matches with these, so the text can be HTML-escaped
+# before they become tags
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+SNIPPET_WORDS = 24
+
+SearchHit = namedtuple('SearchHit', ['page', 'rank', 'title_highlight', 'snippet'])
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts5_query(query):
+    """Turn free text into an FTS5 expression: all words, last one as a prefix."""
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _vendor():
+    return connection.vendor
+
+
+def matching_ids(query):
+    """Subquery of the ids of every page matching ``query``, for use with ``pk__in``."""
+    if _vendor() == 'sqlite':
+        expression = fts5_query(query)
+        if expression is None:
+            return RawSQL('SELECT NULL WHERE 0', [])
+        return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression])
+    if _vendor() == 'postgresql':
+        return RawSQL(
+            "SELECT id FROM content_pagecontent WHERE search_vector @@ websearch_to_tsquery('english', %s)",
+            [query],
+        )
+    return PageContent.objects.filter(
+        Q(title__icontains=query) | Q(body__icontains=query) | Q(slug__icontains=query)
+    ).values('pk')
+
+
+def _marked(text):
+    """Page text as HTML, with the matches the database marked wrapped in ``<mark>``."""
+    return html.escape(text or '').replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+
+def _published_clause(alias):
+    return f'{alias}.is_published AND {alias}.publish_date <= %s'
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+def _sqlite_search(query, limit, offset):
+    expression = fts5_query(query)
+    if expression is None:
+        return [], 0
+    now = _now()
+    match = f'FROM {FTS_TABLE} JOIN content_pagecontent p ON p.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s AND {_published_clause("p")}'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) {match}', [expression, now])
+        total = cursor.fetchone()[0]
+        # bm25() weights: title, body, meta_description. Lower is better.
+        cursor.execute(
+            f'SELECT p.id, -bm25({FTS_TABLE}, 10.0, 1.0, 4.0), '
+            f'highlight({FTS_TABLE}, 0, %s, %s), '
+            f'snippet({FTS_TABLE}, 1, %s, %s, %s, %s) '
+            f'{match} ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 4.0) LIMIT %s OFFSET %s',
+            [MATCH_START, MATCH_END, MATCH_START, MATCH_END, '…', SNIPPET_WORDS,
+             expression, now, limit, offset],
+        )
+        return cursor.fetchall(), total
+
+
+def _postgresql_search(query, limit, offset):
+    now = _now()
+    match = (
+        "FROM content_pagecontent p, websearch_to_tsquery('english', %s) q "
+        f"WHERE p.search_vector @@ q AND {_published_clause('p')}"
+    )
+    options = f'StartSel="{MATCH_START}", StopSel="{MATCH_END}"'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) {match}', [query, now])
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            'SELECT p.id, ts_rank_cd(p.search_vector, q), '
+            "ts_headline('english', p.title, q, %s), "
+            "ts_headline('english', p.body, q, %s) "
+            f'{match} ORDER BY 2 DESC, p.id LIMIT %s OFFSET %s',
+            [f'{options}, HighlightAll=true', f'{options}, MaxWords={SNIPPET_WORDS}', query, now, limit, offset],
+        )
+        return cursor.fetchall(), total
+
+
+def _fallback_search(query, limit, offset):
+    pages = PageContent.objects.filter(
+        pk__in=matching_ids(query), is_published=True, publish_date__lte=timezone.now()
+    ).order_by('-publish_date', '-id')
+    total = pages.count()
+    return [(pk, 0.0, title, body[:200]) for pk, title, body in pages.values_list('pk', 'title', 'body')[offset:offset + limit]], total
+
+
+def search_page_contents(query, limit=20, offset=0, defer=()):
+    """Ranked published pages matching ``query``.
+
+    Returns ``(hits, total)`` where ``hits`` is a list of SearchHit, best
+    match first, and ``total`` the number of matches across all pages.
+    The pages are loaded without the fields in ``defer``.
+    """
+    query = (query or '').strip()
+    if not query:
+        return [], 0
+
+    if _vendor() == 'sqlite':
+        rows, total = _sqlite_search(query, limit, offset)
+    elif _vendor() == 'postgresql':
+        rows, total = _postgresql_search(query, limit, offset)
+    else:
+        rows, total = _fallback_search(query, limit, offset)
+
+    pages = PageContent.objects.select_related('author').defer(*defer).in_bulk([row[0] for row in rows])
+    hits = [
+        SearchHit(pages[pk], rank, _marked(title_highlight), _marked(snippet))
+        for pk, rank, title_highlight, snippet in rows
+        if pk in pages
+    ]
+    return hits, total
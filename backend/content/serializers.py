@@ -8,10 +8,12 @@ class PageContentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PageContent
-        fields = '__all__'
+        exclude = ['preview_token_version']
         read_only_fields = ('author', 'created_at', 'updated_at')
     
     def get_author_details(self, obj):
+        if obj.author is None:
+            return None
         return {
             'id': obj.author.id,
             'username': obj.author.username,
@@ -24,7 +26,81 @@ class PageContentListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PageContent
-        fields = ['id', 'title', 'slug', 'content_type', 'publish_date', 'is_published', 'author', 'created_at']
+        fields = ['id', 'title', 'slug', 'content_type', 'publish_date', 'is_published', 'author', 'created_at',
+                  'excerpt', 'word_count', 'reading_time']
+
+AUTHOR_VALUES = ['author', 'author__username', 'author__first_name', 'author__last_name']
+
+# Fields whose to_representation() only coerces to the type the database
+# driver already returns, so values() rows can be copied as they are.
+NATIVE_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def author_name(row):
+    # Same as StringRelatedField: the user's __str__ is the username
+    return row['author__username']
+
+
+def author_details(row):
+    if row['author'] is None:
+        return None
+    return {
+        'id': row['author'],
+        'username': row['author__username'],
+        'first_name': row['author__first_name'],
+        'last_name': row['author__last_name'],
+    }
+
+
+class ValuesReader:
+    """Read-only fast path producing the same output as a ModelSerializer.
+
+    The serializer's fields are bound once and applied directly to
+    ``QuerySet.values()`` rows, so rows are never turned into model instances
+    and no per-row serializer is built. The author is joined into the same
+    query and the author-derived fields are built by ``computed``.
+    """
+
+    def __init__(self, serializer_class, computed):
+        self.serializer_class = serializer_class
+        self.computed = computed
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = [
+                (name, self.computed[name], None) if name in self.computed
+                else (name, field.source, None if isinstance(field, NATIVE_FIELDS) else field)
+                for name, field in self.serializer_class().fields.items()
+            ]
+        return self._columns
+
+    def values(self, queryset):
+        sources = [source for name, source, _ in self.columns if name not in self.computed]
+        return queryset.values(*sources, *AUTHOR_VALUES)
+
+    def to_representation(self, row):
+        data = {}
+        for name, source, field in self.columns:
+            if name in self.computed:
+                data[name] = source(row)
+            elif field is None:
+                data[name] = row[source]
+            else:
+                value = row[source]
+                data[name] = None if value is None else field.to_representation(value)
+        return data
+
+
+page_content_list_reader = ValuesReader(PageContentListSerializer, {'author': author_name})
+page_content_reader = ValuesReader(PageContentSerializer, {'author': author_name, 'author_details': author_details})
+
+class SearchHitSerializer(serializers.Serializer):
+    content = PageContentListSerializer(source='page')
+    rank = serializers.FloatField()
+    title_highlight = serializers.CharField()
+    snippet = serializers.CharField()
 
 class PageContentPreviewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,109 @@
+"""
+Unique slug allocation for PageContent.
+
+One query over the ``<base>-`` prefix range of the slug index finds the
+highest numbered copy of a title, so the cost does not grow with the number
+of collisions the way probing one candidate at a time does. Two writers can
+still pick the same slug at once; the unique index rejects the second one
+and it allocates again.
+"""
+import re
+from collections import Counter
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+SLUG_ATTEMPTS = 10
+# Long titles are cut so that '-<n>' still fits for up to a million copies
+SUFFIX_ROOM = 7
+# Titles per numbered-copies lookup in allocate_slugs; SQLite caps the depth
+# of a WHERE clause
+CROWDED_CHUNK = 100
+# Used when a title has no characters slugify() keeps
+FALLBACK_SLUG = 'page'
+
+
+def base_slug(title, max_length):
+    return slugify(title)[:max_length - SUFFIX_ROOM].rstrip('-') or FALLBACK_SLUG
+
+
+def _prefixed(prefix):
+    if connection.vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and never uses the index, but
+        # slugs sort bytewise and '-' is followed by '.', so this is the
+        # same set of rows as a range scan.
+        return Q(slug__gte=prefix, slug__lt=prefix[:-1] + '.')
+    # Elsewhere startswith is served by the slug's pattern index
+    return Q(slug__startswith=prefix)
+
+
+def next_free_slug(model, title, exclude_pk=None):
+    """``<base>`` if no page uses it or a numbered copy, else ``<base>-<n+1>`` for the highest ``n`` in use."""
+    base = base_slug(title, model._meta.get_field('slug').max_length)
+    taken = model._default_manager.filter(
+        Q(slug=base) | _prefixed(base + '-') & Q(slug__regex=rf'^{re.escape(base)}-[0-9]+$')
+    )
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    # Longest first, then highest, puts the biggest number on top and <base> last
+    highest = taken.order_by(Length('slug').desc(), '-slug').values_list('slug', flat=True).first()
+    if highest is None:
+        return base
+    if highest == base:
+        return f'{base}-1'
+    return f'{base}-{int(highest.rsplit("-", 1)[1]) + 1}'
+
+
+def save_with_unique_slug(instance, save, title):
+    """Allocate ``instance.slug`` from ``title`` and call ``save``, retrying on a slug collision."""
+    model = type(instance)
+    for attempt in range(SLUG_ATTEMPTS):
+        instance.slug = next_free_slug(model, title, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            taken = model._default_manager.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if not taken or attempt == SLUG_ATTEMPTS - 1:
+                raise
+
+
+def allocate_slugs(model, titles, reserved=()):
+    """Unique slugs for a batch of new rows, in order.
+
+    One query finds which titles are taken, and the numbered copies of those
+    are read with one more query per ``CROWDED_CHUNK`` titles.
+
+    ``reserved`` slugs are treated as taken, for rows of the same batch that
+    bring their own slug.
+    """
+    max_length = model._meta.get_field('slug').max_length
+    bases = [base_slug(title, max_length) for title in titles]
+    taken = set(reserved)
+    taken.update(model._default_manager.filter(slug__in=set(bases)).values_list('slug', flat=True))
+
+    # Only titles that are taken or repeated need their numbered copies looked up
+    highest = {}
+    counts = Counter(bases)
+    crowded = {base for base in counts if base in taken or counts[base] > 1}
+    crowded_list = sorted(crowded)
+    for start in range(0, len(crowded_list), CROWDED_CHUNK):
+        condition = Q()
+        for base in crowded_list[start:start + CROWDED_CHUNK]:
+            condition |= _prefixed(base + '-')
+        for slug in model._default_manager.filter(condition).values_list('slug', flat=True).iterator():
+            base, _, suffix = slug.rpartition('-')
+            if base in crowded and suffix.isdigit():
+                highest[base] = max(highest.get(base, 0), int(suffix))
+
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken:
+            highest[base] = highest.get(base, 0) + 1
+            slug = f'{base}-{highest[base]}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
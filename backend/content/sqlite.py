@@ -0,0 +1,117 @@
+"""
+SQLite tuned for a production web server.
+
+Every new SQLite connection gets the pragmas of the ``SQLITE_PROFILE``
+setting: WAL journaling, so readers and the writer do not block each other;
+``synchronous=NORMAL``, which in WAL mode only syncs at checkpoints; a memory
+map and page cache sized for the working set; and a busy timeout, so a
+writer waits for the lock instead of failing at once. A setting of None
+leaves SQLite's default.
+
+SQLite still allows one writer at a time. Threads of a process that save
+pages at once would each wait on the database lock, and give up with
+"database is locked" after the busy timeout. ``serialized_write`` queues them
+in the process instead, in the order they arrived, so the database only
+ever sees one writer per process.
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+DEFAULTS = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    # Negative sizes are in KiB
+    'CACHE_SIZE': -64 * 1024,
+    'BUSY_TIMEOUT': 5000,
+    'SERIALIZE_WRITES': True,
+}
+
+PRAGMAS = {
+    'JOURNAL_MODE': 'journal_mode',
+    'SYNCHRONOUS': 'synchronous',
+    'MMAP_SIZE': 'mmap_size',
+    'CACHE_SIZE': 'cache_size',
+    'BUSY_TIMEOUT': 'busy_timeout',
+}
+
+
+def sqlite_setting(name):
+    return getattr(settings, 'SQLITE_PROFILE', {}).get(name, DEFAULTS[name])
+
+
+def apply_profile(connection):
+    """Set the profile's pragmas on a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, pragma in PRAGMAS.items():
+            value = sqlite_setting(name)
+            if value is not None:
+                # In-memory databases keep journal_mode=memory whatever is asked
+                cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+class WriteQueue:
+    """A lock handed to its waiters in the order they asked for it."""
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.waiters = deque()
+        self.owner = None
+
+    def acquire(self, timeout):
+        """Wait up to ``timeout`` seconds for the lock. False if it did not come."""
+        with self.mutex:
+            if self.owner is None and not self.waiters:
+                self.owner = threading.get_ident()
+                return True
+            waiter = threading.Lock()
+            waiter.acquire()
+            self.waiters.append(waiter)
+        if not waiter.acquire(timeout=timeout):
+            with self.mutex:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                    return False
+            # Handed over just as the wait ran out
+        self.owner = threading.get_ident()
+        return True
+
+    def release(self):
+        with self.mutex:
+            self.owner = None
+            if self.waiters:
+                # Stays taken: the first waiter owns it from here
+                self.owner = 0
+                self.waiters.popleft().release()
+
+    def held(self):
+        return self.owner == threading.get_ident()
+
+
+write_queue = WriteQueue()
+
+
+@contextmanager
+def serialized_write(using=DEFAULT_DB_ALIAS):
+    """Wait for this process's turn to write to a SQLite ``using``, and keep it for the block.
+
+    Writes inside a transaction go straight through: it may already hold the
+    database lock that the current turn's writer is waiting for.
+    """
+    connection = connections[using]
+    if (connection.vendor != 'sqlite' or not sqlite_setting('SERIALIZE_WRITES')
+            or connection.in_atomic_block or write_queue.held()):
+        yield
+        return
+    # Queued for as long as SQLite itself would wait for the lock
+    if not write_queue.acquire(timeout=(sqlite_setting('BUSY_TIMEOUT') or 0) / 1000):
+        raise OperationalError('database is locked')
+    try:
+        yield
+    finally:
+        write_queue.release()
@@ -0,0 +1,196 @@
+"""
+Cached homepage stats.
+
+The payload is kept in the Django cache with a generation number. Saving or
+deleting a page, deleting a user or a change in the active user count bumps
+the generation (after the transaction commits), which marks the cached payload stale without dropping it. Stale
+payloads are still served while one worker, holding a ``cache.add`` lock,
+recomputes; a payload older than ``FRESH_FOR`` seconds is refreshed the
+same way so scheduled pages show up once their publish date passes.
+"""
+import asyncio
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from metrics.registry import record_cache
+from .async_api import gather_reads
+from .models import PageContent, SiteCounter
+from .pagination import ORDERING
+
+CACHE_KEY = 'content:public_stats'
+GENERATION_KEY = 'content:public_stats:generation'
+LOCK_KEY = 'content:public_stats:lock'
+
+FRESH_FOR = 60
+# How long a stale payload may still be served while it is being rebuilt
+STALE_FOR = 60 * 60
+LOCK_TIMEOUT = 30
+
+# A worker that finds nothing cached waits this long for the lock holder
+# before computing the stats itself.
+WAIT_FOR = 2.0
+WAIT_INTERVAL = 0.05
+
+RECENT_CONTENT = 6
+
+
+def _recent_content():
+    recent = (
+        PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now())
+        # The keyset order, so the published-rows index serves it on every backend
+        .order_by(*ORDERING)
+        # The excerpt stored on save, so the body is never read
+        .values('id', 'title', 'excerpt', 'content_type', 'created_at', 'meta_description',
+                'author', 'author__username', 'author__first_name', 'author__last_name')
+        [:RECENT_CONTENT]
+    )
+
+    recent_content = []
+    for row in recent:
+        author = None
+        if row['author'] is not None:
+            author = {
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+            }
+        recent_content.append({
+            'id': row['id'],
+            'title': row['title'],
+            'content': row['excerpt'],
+            'content_type': row['content_type'],
+            'author': author,
+            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+            'meta_description': row['meta_description'],
+        })
+    return recent_content
+
+
+def _totals():
+    return SiteCounter.objects.values_for(SiteCounter.PUBLISHED_CONTENT, SiteCounter.ACTIVE_USERS)
+
+
+def _payload(totals, recent_content):
+    total_content, total_users = totals
+    return {
+        'total_content': total_content,
+        'total_users': total_users,
+        'recent_content': recent_content,
+    }
+
+
+def compute_public_stats():
+    return _payload(_totals(), _recent_content())
+
+
+async def acompute_public_stats():
+    """``compute_public_stats`` with the counters and the recent list read concurrently."""
+    return _payload(*await gather_reads(_totals, _recent_content))
+
+
+def _generation():
+    cache.add(GENERATION_KEY, 0, None)
+    return cache.get(GENERATION_KEY, 0)
+
+
+def _is_fresh(entry, generation):
+    return entry['generation'] == generation and entry['computed_at'] + FRESH_FOR > time.time()
+
+
+def _entry(data, generation):
+    return {'data': data, 'generation': generation, 'computed_at': time.time()}
+
+
+def _refresh(generation):
+    data = compute_public_stats()
+    cache.set(CACHE_KEY, _entry(data, generation), FRESH_FOR + STALE_FOR)
+    return data
+
+
+def get_public_stats():
+    """Homepage stats, served from the cache whenever possible."""
+    cached = cache.get_many([CACHE_KEY, GENERATION_KEY])
+    entry = cached.get(CACHE_KEY)
+    generation = cached.get(GENERATION_KEY)
+    if generation is None:
+        generation = _generation()
+    if entry is not None and _is_fresh(entry, generation):
+        record_cache('public_stats', 'hit')
+        return entry['data']
+
+    if cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        record_cache('public_stats', 'miss')
+        try:
+            return _refresh(generation)
+        finally:
+            cache.delete(LOCK_KEY)
+
+    if entry is not None:
+        record_cache('public_stats', 'stale')
+        return entry['data']
+
+    # Cold cache and someone else is already computing
+    deadline = time.monotonic() + WAIT_FOR
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(CACHE_KEY)
+        if entry is not None:
+            record_cache('public_stats', 'hit')
+            return entry['data']
+    record_cache('public_stats', 'miss')
+    return compute_public_stats()
+
+
+async def _ageneration():
+    await cache.aadd(GENERATION_KEY, 0, None)
+    return await cache.aget(GENERATION_KEY, 0)
+
+
+async def aget_public_stats():
+    """``get_public_stats`` for async views: the same cache protocol through the async cache API."""
+    cached = await cache.aget_many([CACHE_KEY, GENERATION_KEY])
+    entry = cached.get(CACHE_KEY)
+    generation = cached.get(GENERATION_KEY)
+    if generation is None:
+        generation = await _ageneration()
+    if entry is not None and _is_fresh(entry, generation):
+        record_cache('public_stats', 'hit')
+        return entry['data']
+
+    if await cache.aadd(LOCK_KEY, True, LOCK_TIMEOUT):
+        record_cache('public_stats', 'miss')
+        try:
+            data = await acompute_public_stats()
+            await cache.aset(CACHE_KEY, _entry(data, generation), FRESH_FOR + STALE_FOR)
+            return data
+        finally:
+            await cache.adelete(LOCK_KEY)
+
+    if entry is not None:
+        record_cache('public_stats', 'stale')
+        return entry['data']
+
+    deadline = time.monotonic() + WAIT_FOR
+    while time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_INTERVAL)
+        entry = await cache.aget(CACHE_KEY)
+        if entry is not None:
+            record_cache('public_stats', 'hit')
+            return entry['data']
+    record_cache('public_stats', 'miss')
+    return await acompute_public_stats()
+
+
+def _bump_generation():
+    _generation()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(GENERATION_KEY, 1, None)
+
+
+def invalidate_public_stats():
+    """Mark the cached stats stale once the current transaction commits."""
+    transaction.on_commit(_bump_generation)
@@ -1,7 +1,30 @@
 from celery import shared_task
+from .debounce import flush_due
+
+
+def revalidate(slugs):
+    from .prerender import UNCHANGED, prerender_pages
+
+    outcomes = prerender_pages(slugs)
+    changed = [slug for slug, outcome in outcomes.items() if outcome != UNCHANGED]
+    print(f"[CELERY] Prerendered {len(changed)} of {len(slugs)} slugs, triggering static regeneration for: {', '.join(changed)}")
+    # You can make a call to Next.js (e.g., revalidate tag or API call to rebuild)
+    # Example: call Next.js preview webhook or API endpoint
+
 
 @shared_task
 def regenerate_static_page(slug):
-    print(f"[CELERY] Triggering static regeneration for slug: {slug}")
-    # You can make a call to Next.js (e.g., revalidate tag or API call to rebuild)
-    # Example: call Next.js preview webhook or API endpoint
\ No newline at end of file
+    revalidate([slug])
+
+
+@shared_task
+def regenerate_static_pages(slugs):
+    # One revalidation call for a whole batch of slugs
+    revalidate(slugs)
+
+
+@shared_task
+def flush_static_regenerations():
+    flushed = flush_due(revalidate)
+    if flushed:
+        print(f"[CELERY] Flushed {flushed} debounced regenerations")
@@ -1,3 +1,1190 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import json
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, update_last_login
+from django.core.cache import cache
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.db.models.signals import pre_save
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import renderers as drf_renderers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from backend import renderers, throttling
+from backend.graphql_views import only_queries
+from django.core.management import call_command
+from graphql.language.parser import Parser
+from .models import PageContent, SiteCounter
+from .pagination import ORDERING
+from .loaders import prime_relations
+from .schema import PageContentType, schema
+from .serializers import PageContentListSerializer, PageContentSerializer, page_content_reader
+from .search import matching_ids, search_page_contents
+from .sqlite import WriteQueue, serialized_write
+from . import async_api, debounce, prerender, slugs, stats
 
-# Create your tests here.
+
+class PatchedTasksMixin:
+    """Keeps post_save hooks from reaching the Celery broker."""
+    task_targets = [
+        'content.models.schedule_static_regeneration',
+        'recommendations.tasks.update_recommendations.delay',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        for target in self.task_targets:
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ContentTestCase(PatchedTasksMixin, TestCase):
+    """A TestCase whose saves queue no tasks; PatchedTasksMixin does the same for TransactionTestCase."""
+
+
+class SearchTests(ContentTestCase):
+    def create(self, title, body, is_published=True, **kwargs):
+        kwargs.setdefault('publish_date', timezone.now() - timedelta(days=1))
+        return PageContent.objects.create(title=title, body=body, is_published=is_published, **kwargs)
+
+    def test_ranks_title_matches_first(self):
+        in_body = self.create('Release notes', 'This week we improved caching for list views.')
+        in_title = self.create('Caching strategies', 'Where to put a cache.')
+        self.create('Caching drafts', 'Caching', is_published=False)
+        self.create('Scheduled caching', 'Caching', publish_date=timezone.now() + timedelta(days=1))
+
+        hits, total = search_page_contents('caching')
+
+        self.assertEqual(total, 2)
+        self.assertEqual([hit.page for hit in hits], [in_title, in_body])
+        self.assertEqual(hits[0].title_highlight, '<mark>Caching</mark> strategies')
+        self.assertIn('<mark>caching</mark>', hits[1].snippet)
+
+    def test_index_follows_writes(self):
+        page = self.create('Gardening', 'Tomatoes')
+        page.body = 'Cucumbers'
+        page.save()
+
+        self.assertEqual(search_page_contents('tomatoes')[1], 0)
+        self.assertEqual(search_page_contents('cucumbers')[1], 1)
+        self.assertEqual(search_page_contents('cucum')[1], 1)
+
+        PageContent.objects.filter(pk=page.pk).update(title='Vegetables')
+        self.assertEqual(search_page_contents('vegetables')[1], 1)
+
+        page.delete()
+        self.assertEqual(search_page_contents('cucumbers')[1], 0)
+
+    def test_highlights_escape_page_text(self):
+        self.create('Caching <script>alert(1)</script>', 'Caching & <b>bold</b> claims')
+        hit = search_page_contents('caching')[0][0]
+        self.assertEqual(hit.title_highlight, '<mark>Caching</mark> &lt;script&gt;alert(1)&lt;/script&gt;')
+        self.assertEqual(hit.snippet, '<mark>Caching</mark> &amp; &lt;b&gt;bold&lt;/b&gt; claims')
+
+    def test_query_syntax_is_escaped(self):
+        self.create('C++ AND "quotes"', 'Body')
+        self.assertEqual(search_page_contents('"quotes" AND (')[1], 1)
+        self.assertEqual(search_page_contents('*')[1], 0)
+
+    def test_admin_lookup_includes_drafts(self):
+        draft = self.create('Caching drafts', 'Body', is_published=False)
+        self.assertEqual(list(PageContent.objects.filter(pk__in=matching_ids('caching'))), [draft])
+
+    def test_rest_endpoint_paginates(self):
+        for number in range(3):
+            self.create(f'Caching part {number}', 'Body')
+
+        response = APIClient().get('/api/content/search/', {'q': 'caching', 'page': 2, 'page_size': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(set(response.data['results'][0]), {'content', 'rank', 'title_highlight', 'snippet'})
+        self.assertEqual(APIClient().get('/api/content/search/').status_code, 400)
+
+    def test_graphql_field(self):
+        page = self.create('Caching strategies', 'Body')
+
+        result = schema.execute('{ searchPageContents(q: "caching") { titleHighlight pageContent { slug } } }')
+
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['searchPageContents'], [
+            {'titleHighlight': '<mark>Caching</mark> strategies', 'pageContent': {'slug': page.slug}},
+        ])
+
+
+class PaginationTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        # Two pages share a publish date so the id tie-break is exercised
+        self.pages = [
+            PageContent.objects.create(title=f'Page {number}', body='Body', is_published=True,
+                                       publish_date=now - timedelta(days=number // 2))
+            for number in range(5)
+        ]
+        self.expected = sorted(self.pages, key=lambda page: (page.publish_date, page.pk), reverse=True)
+
+    def test_rest_pages_follow_keyset_order(self):
+        client = APIClient()
+        response = client.get('/api/content/', {'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+
+        seen = []
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = client.get(response.data['next'])
+        self.assertEqual(seen, [page.pk for page in self.expected])
+
+    def test_rest_count_can_be_switched_off(self):
+        response = APIClient().get('/api/content/', {'count': 'false'})
+        self.assertNotIn('count', response.data)
+        with self.settings(CONTENT_PAGINATION={'INCLUDE_COUNT': False}):
+            self.assertNotIn('count', APIClient().get('/api/content/').data)
+
+    def test_rest_page_size_is_capped(self):
+        with self.settings(CONTENT_PAGINATION={'MAX_PAGE_SIZE': 3}):
+            response = APIClient().get('/api/content/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_rest_invalid_cursor(self):
+        self.assertEqual(APIClient().get('/api/content/', {'cursor': 'garbage'}).status_code, 404)
+
+    def test_graphql_connection(self):
+        query = '''
+            query ($after: String) {
+                allPageContents(first: 3, after: $after) {
+                    totalCount
+                    pageInfo { hasNextPage endCursor }
+                    edges { node { id } }
+                }
+            }
+        '''
+        first = schema.execute(query).data['allPageContents']
+        self.assertEqual(first['totalCount'], 5)
+        self.assertTrue(first['pageInfo']['hasNextPage'])
+
+        second = schema.execute(query, variables={'after': first['pageInfo']['endCursor']}).data['allPageContents']
+        self.assertFalse(second['pageInfo']['hasNextPage'])
+
+        ids = [int(edge['node']['id']) for edge in first['edges'] + second['edges']]
+        self.assertEqual(ids, [page.pk for page in self.expected])
+
+
+class GraphQLQueryCountTests(ContentTestCase):
+    query = '''
+        {
+            allPageContents(first: 50) {
+                edges { node { title ...AuthorFields } }
+            }
+        }
+        fragment AuthorFields on PageContentType { author { username } }
+    '''
+
+    def create_pages(self, count):
+        start = PageContent.objects.count()
+        for number in range(start, start + count):
+            author = get_user_model().objects.create_user(username=f'author{number}')
+            PageContent.objects.create(title=f'Page {number}', body='Body', is_published=True,
+                                       publish_date=timezone.now() - timedelta(days=1), author=author)
+
+    def execute(self, query):
+        result = schema.execute(query, context_value=RequestFactory().get('/graphql/'))
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_list_query_count_is_constant(self):
+        self.create_pages(2)
+        with self.assertNumQueries(1):
+            data = self.execute(self.query)
+        self.assertEqual(data['allPageContents']['edges'][0]['node']['author'], {'username': 'author1'})
+
+        self.create_pages(8)
+        with self.assertNumQueries(1):
+            self.execute(self.query)
+
+    def test_loader_batches_unplanned_lookups(self):
+        self.create_pages(3)
+        request = RequestFactory().get('/graphql/')
+        pages = list(PageContent.objects.all())
+        info = mock.Mock(context=request)
+        prime_relations(info, pages, ['author'])
+
+        with self.assertNumQueries(1):
+            authors = [PageContentType.resolve_author(page, info) for page in pages]
+        self.assertEqual(authors, [page.author for page in pages])
+
+
+class ReadFastPathTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        author = get_user_model().objects.create_user(username='writer', first_name='Ada', last_name='L')
+        self.pages = [
+            PageContent.objects.create(title='With author', body='Body', is_published=True, author=author,
+                                       publish_date=timezone.now() - timedelta(days=1), meta_description='Meta'),
+            PageContent.objects.create(title='Anonymous', body='Body', is_published=True,
+                                       publish_date=timezone.now() - timedelta(days=2)),
+        ]
+
+    def test_list_matches_serializer(self):
+        with self.assertNumQueries(2):
+            response = APIClient().get('/api/content/')
+        expected = PageContentListSerializer(self.pages, many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+
+    def test_detail_matches_serializer(self):
+        for page in self.pages:
+            with self.assertNumQueries(1):
+                response = APIClient().get(f'/api/content/{page.pk}/')
+            self.assertEqual(response.json(), json.loads(json.dumps(PageContentSerializer(page).data)))
+        self.assertEqual(APIClient().get('/api/content/0/').status_code, 404)
+
+
+class PublicStatsTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = get_user_model().objects.create_user(username='writer', first_name='Ada', last_name='L')
+        PageContent.objects.create(title='First', body='x' * 300, is_published=True, author=self.author,
+                                   publish_date=timezone.now() - timedelta(days=1))
+
+    def get(self):
+        return APIClient().get('/api/public/').json()
+
+    def test_served_from_cache(self):
+        data = self.get()
+        self.assertEqual(data['total_content'], 1)
+        self.assertEqual(data['recent_content'][0]['content'], 'x' * 200 + '...')
+        self.assertEqual(data['recent_content'][0]['author']['username'], 'writer')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), data)
+
+    def test_writes_invalidate(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            PageContent.objects.create(title='Second', body='Body', is_published=True,
+                                       publish_date=timezone.now() - timedelta(hours=1))
+        data = self.get()
+        self.assertEqual(data['total_content'], 2)
+        self.assertEqual(data['recent_content'][0]['title'], 'Second')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.create_user(username='reader')
+        self.assertEqual(self.get()['total_users'], 2)
+
+    def test_logins_keep_the_cache(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.author)
+        with self.assertNumQueries(0):
+            self.get()
+
+        self.author.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.get()['total_users'], 0)
+
+    def test_stale_payload_served_while_locked(self):
+        before = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            PageContent.objects.create(title='Second', body='Body', is_published=True,
+                                       publish_date=timezone.now())
+        cache.add(stats.LOCK_KEY, True)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), before)
+        cache.delete(stats.LOCK_KEY)
+        self.assertEqual(self.get()['total_content'], 2)
+
+
+class PageSummaryTests(ContentTestCase):
+    body_column = '"content_pagecontent"."body"'
+
+    def setUp(self):
+        super().setUp()
+        self.page = PageContent.objects.create(title='Long read', body='word ' * 450, is_published=True,
+                                               publish_date=timezone.now() - timedelta(days=1))
+
+    def test_summary_is_stored_on_save(self):
+        self.assertEqual((self.page.word_count, self.page.reading_time), (450, 3))
+        self.assertEqual(self.page.excerpt, ('word ' * 40) + '...')
+        self.page.body = 'Short body'
+        self.page.save(update_fields=['body'])
+        self.page.refresh_from_db()
+        self.assertEqual((self.page.excerpt, self.page.word_count, self.page.reading_time), ('Short body', 2, 1))
+
+    def test_lists_leave_the_body_in_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/content/')
+            result = schema.execute('{ allPageContents { edges { node { title excerpt readingTime } } } }',
+                                    context_value=RequestFactory().get('/graphql/'))
+        self.assertEqual(response.json()['results'][0]['word_count'], 450)
+        self.assertEqual(result.data['allPageContents']['edges'][0]['node']['readingTime'], 3)
+        self.assertFalse([query for query in queries if self.body_column in query['sql']])
+
+        result = schema.execute('{ allPageContents { edges { node { body } } } }',
+                                context_value=RequestFactory().get('/graphql/'))
+        self.assertEqual(result.data['allPageContents']['edges'][0]['node']['body'], self.page.body)
+
+    def test_backfill_fills_pages_written_without_summary(self):
+        PageContent.objects.create(title='Short', body='Two words', is_published=True)
+        # As rows written before the columns existed
+        PageContent.objects.update(excerpt='', word_count=0, reading_time=0)
+        call_command('backfill_summaries', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(
+            list(PageContent.objects.order_by('id').values_list('word_count', 'reading_time')),
+            [(450, 3), (2, 1)],
+        )
+        self.assertEqual(PageContent.objects.get(pk=self.page.pk).excerpt, self.page.excerpt)
+
+
+@override_settings(ROOT_URLCONF='backend.urls_async')
+class AsyncReadPathTests(ContentTestCase):
+    """The async views (served under ASGI) answer exactly as the sync ones."""
+    graphql = 'query { allPageContents(first: 2) { totalCount edges { cursor node { title author { username } } } } }'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = get_user_model().objects.create_user(username='writer')
+        self.pages = [
+            PageContent.objects.create(title=f'Page {number}', body='Body', is_published=True, author=self.author,
+                                       publish_date=timezone.now() - timedelta(hours=number))
+            for number in range(3)
+        ]
+        self.login = {'Authorization': f'Bearer {AccessToken.for_user(self.author)}'}
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            client = APIClient()
+            self.sync = {
+                path: client.get(path, headers=self.login) for path in
+                ['/api/content/?page_size=2', f'/api/content/{self.pages[0].pk}/', '/api/public/',
+                 f'/api/recommendations/{self.pages[0].slug}/']
+            }
+            self.sync_graphql = client.post('/graphql/', {'query': self.graphql}, format='json')
+        cache.clear()
+
+    async def test_rest_endpoints_match(self):
+        client = AsyncClient()
+        for path, expected in self.sync.items():
+            response = await client.get(path, headers=self.login)
+            self.assertEqual((response.status_code, response.json()), (expected.status_code, expected.json()), path)
+            self.assertEqual(response.headers.get('ETag'), expected.headers.get('ETag'), path)
+            if 'ETag' in response.headers:
+                again = await client.get(path, headers={**self.login, 'If-None-Match': response.headers['ETag']})
+                self.assertEqual(again.status_code, 304, path)
+
+    async def test_writes_fall_back_to_sync_views(self):
+        client = AsyncClient()
+        self.assertEqual((await client.post('/api/content/', {'title': 'New', 'body': 'Body'})).status_code, 401)
+        self.assertEqual((await client.get('/api/recommendations/page-0/')).status_code, 401)
+        response = await client.post('/graphql/', {'query': 'mutation { createPageContent(title: "New", body: "Body") { pageContent { title } } }'},
+                                     content_type='application/json')
+        self.assertEqual(response.json(), {'data': {'createPageContent': {'pageContent': {'title': 'New'}}}})
+
+    async def test_graphql_matches(self):
+        response = await AsyncClient().post('/graphql/', {'query': self.graphql}, content_type='application/json')
+        self.assertEqual(response.content, self.sync_graphql.content)
+        response = await AsyncClient().post('/graphql/', {'query': '{ allPageContents(after: "bogus") { totalCount } }'},
+                                            content_type='application/json')
+        self.assertEqual(response.json()['errors'][0]['message'], 'Invalid cursor')
+
+    async def test_graphql_errors_match(self):
+        body = {'query': '{ allPageContents { missingField } }'}
+        response = await AsyncClient().post('/graphql/', body, content_type='application/json')
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            expected = await sync_to_async(APIClient().post)('/graphql/', body, format='json')
+        self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+
+
+class GatherReadsTests(PatchedTasksMixin, TransactionTestCase):
+    """Outside a transaction the reads run at once, each in a worker thread on its own connection."""
+
+    def setUp(self):
+        super().setUp()
+        PageContent.objects.create(title='Shared', body='Body', is_published=True)
+
+    def test_reads_run_concurrently_and_release_their_connections(self):
+        # Each read waits for the other, so run one after another they would time out
+        barrier = threading.Barrier(2, timeout=5)
+
+        def read():
+            barrier.wait()
+            return threading.get_ident(), connections[DEFAULT_DB_ALIAS], PageContent.objects.count()
+
+        with mock.patch('content.async_api.close_old_connections', wraps=close_old_connections) as close:
+            results = async_to_sync(async_api.gather_reads)(read, read)
+
+        threads, wrappers, counts = zip(*results)
+        self.assertEqual(counts, (1, 1))
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(len(set(threads)), 2)
+        self.assertIsNot(wrappers[0], wrappers[1])
+        self.assertEqual(close.call_count, 2)
+
+
+class SiteCounterTests(ContentTestCase):
+    def counts(self):
+        return SiteCounter.objects.values_for(SiteCounter.PUBLISHED_CONTENT, SiteCounter.ACTIVE_USERS)
+
+    def test_signals_track_state_changes(self):
+        author = get_user_model().objects.create_user(username='writer')
+        draft = PageContent.objects.create(title='Draft', body='Body', author=author)
+        page = PageContent.objects.create(title='Live', body='Body', is_published=True, author=author)
+        self.assertEqual(self.counts(), [1, 1])
+
+        draft.is_published = True
+        draft.save()
+        page.title = 'Still live'
+        page.save()
+        self.assertEqual(self.counts(), [2, 1])
+
+        page.delete()
+        get_user_model().objects.create_user(username='inactive', is_active=False)
+        self.assertEqual(self.counts(), [1, 1])
+
+        # Deleting the author cascades to the remaining page
+        author.delete()
+        self.assertEqual(self.counts(), [0, 0])
+
+    def test_racing_saves_count_once(self):
+        page = PageContent.objects.create(title='Draft', body='Body')
+        first, second = PageContent.objects.get(pk=page.pk), PageContent.objects.get(pk=page.pk)
+        first.is_published = second.is_published = True
+
+        def save_second(sender, instance, **kwargs):
+            # The second editor saves while the first save is under way
+            if instance is first:
+                pre_save.disconnect(save_second, sender=PageContent)
+                second.save()
+
+        pre_save.connect(save_second, sender=PageContent)
+        self.addCleanup(pre_save.disconnect, save_second, sender=PageContent)
+        first.save()
+        self.assertEqual(self.counts(), [1, 0])
+
+    def test_failed_save_leaves_state_and_counter(self):
+        get_user_model().objects.create_user(username='taken')
+        user = get_user_model().objects.create_user(username='other')
+        user.username = 'taken'
+        user.is_active = False
+        with self.assertRaises(IntegrityError):
+            user.save()
+        self.assertEqual(self.counts(), [0, 2])
+        self.assertTrue(get_user_model().objects.get(pk=user.pk).is_active)
+
+    def test_reconcile_command(self):
+        PageContent.objects.create(title='Live', body='Body', is_published=True)
+        PageContent.objects.update(is_published=False)
+        self.assertEqual(self.counts(), [1, 0])
+        call_command('reconcile_counters', stdout=io.StringIO())
+        self.assertEqual(self.counts(), [0, 0])
+
+
+class ConditionalGetTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = PageContent.objects.create(title='Cached', body='Body', is_published=True,
+                                               publish_date=timezone.now() - timedelta(days=1))
+
+    def test_detail(self):
+        url = f'/api/content/{self.page.pk}/'
+        response = APIClient().get(url)
+        self.assertIn('Last-Modified', response.headers)
+        etag = response.headers['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertEqual(APIClient().get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(APIClient().get(url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified']).status_code, 304)
+
+        self.page.title = 'Edited'
+        self.page.save()
+        response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_list(self):
+        response = APIClient().get('/api/content/')
+        etag = response.headers['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(APIClient().get('/api/content/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(APIClient().get('/api/content/?page_size=1', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        PageContent.objects.create(title='Another', body='Body', is_published=True, publish_date=timezone.now())
+        self.assertEqual(APIClient().get('/api/content/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_has_no_last_modified(self):
+        # Unpublishing a page would not move it, so If-Modified-Since alone never validates a list
+        response = APIClient().get('/api/content/')
+        self.assertNotIn('Last-Modified', response.headers)
+        self.page.is_published = False
+        self.page.save()
+        since = http_date(time.time() + 60)
+        self.assertEqual(APIClient().get('/api/content/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_graphql_get(self):
+        params = {
+            'query': 'query Page($slug: String!) { pageContentBySlug(slug: $slug) { title } }',
+            'variables': json.dumps({'slug': self.page.slug}),
+        }
+        response = self.client.get('/graphql/', params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['data']['pageContentBySlug']['title'], 'Cached')
+        etag = response.headers['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/graphql/', params, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        other = {**params, 'query': params['query'].replace('title', 'title slug')}
+        response = self.client.get('/graphql/', other, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Queries outside the single-page fields are not validated
+        response = self.client.get('/graphql/', {'query': '{ allPageContents { totalCount } }'}, HTTP_ACCEPT='application/json')
+        self.assertNotIn('ETag', response.headers)
+
+
+class PreviewTokenTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username='previewer', password='secret', role='author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.page = PageContent.objects.create(title='Draft', body='Body', author=self.user)
+
+    def issue(self, page=None):
+        page = page or self.page
+        response = self.client.post(f'/api/content/{page.pk}/generate-preview-token/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def preview(self, token, page=None):
+        return APIClient().get(f'/api/content/{(page or self.page).pk}/preview/{token}/')
+
+    def test_token_opens_preview(self):
+        response = self.preview(self.issue())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Draft')
+
+    def test_rejects_other_page_forged_and_expired_tokens(self):
+        other = PageContent.objects.create(title='Other', body='Body', author=self.user)
+        token = self.issue()
+        self.assertEqual(self.preview(token, page=other).status_code, 403)
+        self.assertEqual(self.preview(token[:-1] + ('A' if token[-1] != 'A' else 'B')).status_code, 403)
+        with override_settings(PREVIEW_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.preview(self.issue()).status_code, 403)
+
+    def test_revocation(self):
+        token = self.issue()
+        response = self.client.delete(f'/api/content/{self.page.pk}/generate-preview-token/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.preview(token).status_code, 403)
+        self.assertEqual(self.preview(self.issue()).status_code, 200)
+        self.assertEqual(self.client.post('/api/content/0/generate-preview-token/').status_code, 404)
+
+    def test_only_author_and_editors_manage_tokens(self):
+        token = self.issue()
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(username='other', role='author'))
+        url = f'/api/content/{self.page.pk}/generate-preview-token/'
+        self.assertEqual(other.delete(url).status_code, 403)
+        self.assertEqual(other.post(url).status_code, 403)
+        self.assertEqual(APIClient().post(url).status_code, 401)
+        self.assertEqual(self.preview(token).status_code, 200)
+
+        other.force_authenticate(get_user_model().objects.create_user(username='editor', role='editor'))
+        self.assertEqual(other.delete(url).status_code, 204)
+        self.assertEqual(self.preview(token).status_code, 403)
+
+
+class QueryPlanTests(ContentTestCase):
+    """EXPLAIN every query of the hot read paths and reject table scans and sorts."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='planner', password='secret')
+        now = timezone.now()
+        for number in range(6):
+            PageContent.objects.create(title=f'Plan {number}', body='Body', is_published=number % 3 != 0,
+                                       publish_date=now - timedelta(days=number), author=self.user)
+
+    def plan_problems(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables make a sequential scan the cheapest plan;
+                # this asks whether an index could serve the query at all
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute('EXPLAIN ' + sql)
+                lines = [row[0] for row in cursor.fetchall()]
+                return [line for line in lines if 'Seq Scan' in line or re.search(r'(^|-> +)(Incremental )?Sort\b', line.strip())]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+            return [detail for detail in details if detail.startswith('SCAN ') or 'TEMP B-TREE' in detail]
+
+    def page_queries(self, fetch):
+        with CaptureQueriesContext(connection) as context:
+            fetch()
+        queries = [query['sql'] for query in context.captured_queries if '"content_pagecontent"' in query['sql']]
+        self.assertTrue(queries)
+        return queries
+
+    def graphql(self, query):
+        return lambda: self.client.post('/graphql/', json.dumps({'query': query}), content_type='application/json')
+
+    def test_hot_paths_use_indexes(self):
+        first_page = APIClient().get('/api/content/?page_size=2').data
+        page = PageContent.objects.filter(is_published=True).first()
+        paths = {
+            'rest list': lambda: APIClient().get('/api/content/?page_size=2'),
+            'rest list, next page': lambda: APIClient().get(first_page['next']),
+            'rest detail': lambda: APIClient().get(f'/api/content/{page.pk}/'),
+            'public stats': lambda: (cache.clear(), APIClient().get('/api/public/')),
+            'graphql all': self.graphql('{ allPageContents(first: 2) { edges { node { title author { username } } } } }'),
+            'graphql by slug': self.graphql(f'{{ pageContentBySlug(slug: "{page.slug}") {{ title }} }}'),
+            'graphql by id': self.graphql(f'{{ pageContent(id: {page.pk}) {{ title }} }}'),
+            'author pages': lambda: list(PageContent.objects.filter(author=self.user).order_by(*ORDERING)[:20]),
+            'published by type': lambda: list(
+                PageContent.objects.filter(is_published=True, publish_date__lte=timezone.now(), content_type='article')
+                .order_by(*ORDERING)[:20]
+            ),
+        }
+        for name, fetch in paths.items():
+            for sql in self.page_queries(fetch):
+                with self.subTest(name, sql=sql):
+                    self.assertEqual(self.plan_problems(sql), [])
+
+
+class SlugAllocationTests(ContentTestCase):
+    def test_suffixes_in_one_query(self):
+        for _ in range(3):
+            PageContent.objects.create(title='Weekly update', body='Body')
+        PageContent.objects.create(title='Weekly update archive', body='Body')
+        with self.assertNumQueries(1):
+            self.assertEqual(slugs.next_free_slug(PageContent, 'Weekly update'), 'weekly-update-3')
+
+    def test_long_and_empty_titles(self):
+        first = PageContent.objects.create(title='word ' * 20, body='Body')
+        second = PageContent.objects.create(title='word ' * 20, body='Body')
+        self.assertEqual(second.slug, first.slug + '-1')
+        self.assertLessEqual(len(second.slug), 50)
+        self.assertEqual(PageContent.objects.create(title='!!!', body='Body').slug, 'page')
+
+    def test_retries_after_collision(self):
+        PageContent.objects.create(title='Clash', body='Body')
+        # Simulate another writer taking the slug between lookup and insert
+        with mock.patch.object(slugs, 'next_free_slug', side_effect=['clash', 'clash-1']):
+            page = PageContent.objects.create(title='Clash', body='Body')
+        self.assertEqual(page.slug, 'clash-1')
+
+    def test_graphql_mutation_uses_allocator(self):
+        PageContent.objects.create(title='Mutated', body='Body')
+        request = RequestFactory().post('/graphql/')
+        request.user = AnonymousUser()
+        result = schema.execute(
+            'mutation { createPageContent(title: "Mutated", body: "Body") { pageContent { slug } } }',
+            context_value=request,
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data['createPageContent']['pageContent']['slug'], 'mutated-1')
+
+
+class ConcurrentSlugTests(PatchedTasksMixin, TransactionTestCase):
+    creates = 1000
+    # Tries per create, 10ms apart: about SQLite's default busy timeout
+    attempts = 500
+
+    def create(self, index):
+        try:
+            for attempt in range(self.attempts):
+                try:
+                    return PageContent.objects.create(title='Weekly update', body=f'Issue {index}').slug
+                except OperationalError as error:
+                    # Threads share the in-memory test database's cache, where
+                    # SQLite reports a table lock (or, for the FTS table, a
+                    # failed vtable constructor) at once instead of waiting.
+                    contended = 'locked' in str(error) or 'vtable constructor failed' in str(error)
+                    if not contended or attempt == self.attempts - 1:
+                        raise
+                    time.sleep(0.01)
+        finally:
+            connection.close()
+
+    def test_parallel_creates_get_distinct_slugs(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            created = list(pool.map(self.create, range(self.creates)))
+        self.assertEqual(len(set(created)), self.creates)
+        self.assertEqual(PageContent.objects.filter(title='Weekly update').count(), self.creates)
+
+
+class SQLiteProfileTests(PatchedTasksMixin, TransactionTestCase):
+    """A SQLite file copied from the test database, as a production one would be."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [f'{directory.name}/file.sqlite3'])
+        connections.settings['file'] = {**connection.settings_dict, 'NAME': f'{directory.name}/file.sqlite3'}
+        self.addCleanup(self.remove_alias)
+        patcher = mock.patch.object(type(self), 'databases', {'default', 'file'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def remove_alias(self):
+        connections['file'].close()
+        del connections['file']
+        del connections.settings['file']
+
+    def pragma(self, name):
+        with connections['file'].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_get_the_profile(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(connections['file'].transaction_mode, 'IMMEDIATE')
+
+    def test_parallel_writes_wait_their_turn(self):
+        counters = SiteCounter.objects.using('file')
+        counters.create(name='writes', value=0)
+
+        def write(index):
+            try:
+                if index % 2:
+                    # Reads, then writes: a deferred transaction would fail
+                    # here at once if another thread wrote in between
+                    with transaction.atomic(using='file'):
+                        value = counters.get(name='writes').value
+                        counters.filter(name='writes').update(value=value + 1)
+                else:
+                    with serialized_write('file'):
+                        counters.filter(name='writes').update(value=F('value') + 1)
+            finally:
+                connections['file'].close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(write, range(200)))
+        self.assertEqual(counters.get(name='writes').value, 200)
+
+    def test_write_queue_is_first_come_first_served(self):
+        queue = WriteQueue()
+        self.assertTrue(queue.acquire(timeout=1))
+        served = []
+
+        def wait(index):
+            self.assertTrue(queue.acquire(timeout=5))
+            served.append(index)
+            queue.release()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            waiting = []
+            for index in range(4):
+                waiting.append(pool.submit(wait, index))
+                # Each queues up before the next arrives
+                while len(queue.waiters) <= index:
+                    time.sleep(0.001)
+            with ThreadPoolExecutor(max_workers=1) as late:
+                self.assertFalse(late.submit(queue.acquire, 0.01).result())
+            queue.release()
+            for future in waiting:
+                future.result()
+        self.assertEqual(served, [0, 1, 2, 3])
+
+
+class ImportContentTests(ContentTestCase):
+    def write(self, suffix, text):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        with handle:
+            handle.write(text)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def run_import(self, path, **options):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch('content.management.commands.import_content.regenerate_static_pages.delay') as regenerate, \
+                mock.patch('content.management.commands.import_content.rebuild_recommendations.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('import_content', path, stdout=stdout, stderr=stderr, **options)
+        return regenerate, stderr.getvalue()
+
+    def test_jsonl_batches(self):
+        PageContent.objects.create(title='Weekly update', body='Body')
+        lines = [
+            {'title': 'Weekly update', 'body': 'One', 'is_published': True},
+            {'title': 'Weekly update', 'body': 'Two', 'is_published': True},
+            {'title': 'Custom', 'slug': 'weekly-update-1', 'body': 'Three'},
+            {'title': 'No body'},
+            {'title': 'Dated', 'body': 'Four', 'is_published': True, 'publish_date': '2024-01-02T03:04:05Z'},
+        ]
+        path = self.write('.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n')
+        regenerate, errors = self.run_import(path, batch_size=3)
+
+        self.assertEqual(errors.count('Skipped'), 2)
+        self.assertEqual(
+            sorted(PageContent.objects.values_list('slug', flat=True)),
+            ['dated', 'weekly-update', 'weekly-update-1', 'weekly-update-2', 'weekly-update-3'],
+        )
+        # One regeneration job per batch that published anything
+        self.assertEqual(regenerate.call_count, 2)
+        self.assertEqual(SiteCounter.objects.value(SiteCounter.PUBLISHED_CONTENT), 3)
+        self.assertTrue(PageContent.objects.get(slug='dated').tokens.exists())
+
+    def test_slug_taken_during_import_skips_the_row(self):
+        lines = [
+            {'title': 'Custom', 'slug': 'custom', 'body': 'One'},
+            {'title': 'Generated', 'body': 'Two'},
+        ]
+        path = self.write('.jsonl', '\n'.join(json.dumps(line) for line in lines))
+        real_allocate = slugs.allocate_slugs
+
+        def allocate_after_another_writer(*args, **kwargs):
+            # Another writer takes the supplied slug after it was checked
+            if not PageContent.objects.filter(slug='custom').exists():
+                PageContent.objects.create(title='Other', slug='custom', body='Body')
+            return real_allocate(*args, **kwargs)
+
+        with mock.patch('content.management.commands.import_content.allocate_slugs',
+                        side_effect=allocate_after_another_writer):
+            _, errors = self.run_import(path)
+        self.assertIn("Skipped record 1: slug 'custom' is already taken", errors)
+        self.assertEqual(dict(PageContent.objects.values_list('slug', 'title')),
+                         {'custom': 'Other', 'generated': 'Generated'})
+
+    def test_csv(self):
+        path = self.write('.csv', 'title,body,is_published\nFrom CSV,Body,true\nDraft,Body,false\n')
+        self.run_import(path)
+        self.assertEqual(dict(PageContent.objects.values_list('slug', 'is_published')), {'from-csv': True, 'draft': False})
+
+
+@override_settings(STATIC_REGENERATION={'BACKEND': 'memory', 'DEBOUNCE_SECONDS': 5, 'MAX_BATCH_SIZE': 2})
+class DebouncedRegenerationTests(TestCase):
+    def setUp(self):
+        # A fresh in-memory store for every test
+        debounce.reset_store(setting='STATIC_REGENERATION')
+        patcher = mock.patch('content.tasks.flush_static_regenerations')
+        self.flush_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_saves_within_window_coalesce(self):
+        for _ in range(10):
+            debounce.schedule_static_regeneration('autosaved')
+        debounce.schedule_static_regeneration('other')
+        debounce.schedule_static_regeneration('third')
+        self.assertEqual(self.flush_task.apply_async.call_count, 3)
+
+        revalidate = mock.Mock()
+        self.assertEqual(debounce.flush_due(revalidate), 0)
+        self.assertEqual(debounce.flush_due(revalidate, now=time.time() + 6), 3)
+        self.assertEqual([len(call.args[0]) for call in revalidate.call_args_list], [2, 1])
+
+        # The window closed, so the next save opens a new one
+        debounce.schedule_static_regeneration('autosaved')
+        self.assertEqual(self.flush_task.apply_async.call_count, 4)
+
+    def test_lost_flush_is_requeued(self):
+        debounce.get_store().add('stuck', time.time() - 60)
+        debounce.schedule_static_regeneration('stuck')
+        self.flush_task.delay.assert_called_once()
+
+    def test_publishing_schedules_regeneration(self):
+        with mock.patch('recommendations.tasks.update_recommendations.delay'):
+            PageContent.objects.create(title='Draft', body='Body')
+            PageContent.objects.create(title='Live', body='Body', is_published=True)
+        self.assertEqual(self.flush_task.apply_async.call_count, 1)
+        revalidate = mock.Mock()
+        debounce.flush_due(revalidate, now=time.time() + 6)
+        revalidate.assert_called_once_with(['live'])
+
+
+class PrerenderTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = override_settings(STATIC_PRERENDER={'ROOT': root.name, 'WORKERS': 2})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.page = PageContent.objects.create(title='Static', body='Body', is_published=True,
+                                               publish_date=timezone.now() - timedelta(days=1))
+
+    def test_content_hash_skips_unchanged_pages(self):
+        self.assertEqual(prerender.prerender_pages(['static']), {'static': prerender.BUILT})
+        self.assertEqual(prerender.prerender_pages(['static']), {'static': prerender.UNCHANGED})
+        self.assertTrue(prerender.artifact_path('static', '.html.gz').exists())
+
+        self.page.body = 'New body'
+        self.page.save()
+        self.assertEqual(prerender.prerender_pages(['static']), {'static': prerender.BUILT})
+
+        self.page.is_published = False
+        self.page.save()
+        self.assertEqual(prerender.prerender_pages(['static']), {'static': prerender.REMOVED})
+        self.assertEqual(prerender.prerendered_slugs(), set())
+
+    def test_served_from_artifact(self):
+        first = APIClient().get('/api/pages/static/', HTTP_ACCEPT_ENCODING='gzip')
+        with self.assertNumQueries(0):
+            response = APIClient().get('/api/pages/static/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        body = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(body, json.loads(json.dumps(PageContentSerializer(self.page).data)))
+        first.close()
+        response.close()
+
+        etag = response.headers['ETag']
+        self.assertEqual(APIClient().get('/api/pages/static/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        html = APIClient().get('/api/pages/static/html/')
+        self.assertIn(b'<h1>Static</h1>', b''.join(html.streaming_content))
+        html.close()
+
+        PageContent.objects.create(title='Draft', body='Body')
+        self.assertEqual(APIClient().get('/api/pages/draft/').status_code, 404)
+
+    def test_unpublished_and_deleted_pages_stop_being_served(self):
+        APIClient().get('/api/pages/static/')
+        self.page.is_published = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save()
+        self.assertEqual(APIClient().get('/api/pages/static/').status_code, 404)
+
+        self.page.is_published = True
+        self.page.save()
+        APIClient().get('/api/pages/static/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.delete()
+        self.assertEqual(APIClient().get('/api/pages/static/').status_code, 404)
+
+    def test_artifact_removed_while_served_is_rebuilt(self):
+        APIClient().get('/api/pages/static/').close()
+        found = prerender.find_artifact('static', 'json')
+
+        def removed_after_lookup():
+            # The first lookup finds artifacts that are gone by the time they are opened
+            prerender.remove_artifacts('static')
+            lookups = iter([found])
+            return mock.patch('content.views.find_artifact',
+                              side_effect=lambda *args: next(lookups, None) or prerender.find_artifact(*args))
+
+        with removed_after_lookup():
+            response = APIClient().get('/api/pages/static/')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        PageContent.objects.filter(pk=self.page.pk).update(is_published=False)
+        with removed_after_lookup():
+            self.assertEqual(APIClient().get('/api/pages/static/').status_code, 404)
+
+    def test_site_command_builds_and_prunes(self):
+        prerender.render_artifacts({**page_content_reader.values(PageContent.objects.all()).get(), 'slug': 'gone'})
+        stdout = io.StringIO()
+        call_command('prerender_site', stdout=stdout)
+        self.assertEqual(prerender.prerendered_slugs(), {'static'})
+        self.assertIn('1 built, 0 unchanged, 1 removed', stdout.getvalue())
+
+
+class JSONRenderingTests(ContentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = PageContent.objects.create(
+            title='Caf\u00e9 \U0001f600', body='Line\u2028break "quoted" \\ \x01', is_published=True,
+            publish_date=timezone.now(),
+        )
+
+    def test_matches_drf_renderer(self):
+        data = {
+            'page': PageContentSerializer(self.page).data,
+            'when': timezone.now(),
+            'naive': timezone.now().replace(tzinfo=None),
+            'day': timezone.now().date(),
+            'id': uuid.uuid4(),
+            'price': Decimal('12.50'),
+            'numbers': (1, 2.5, None, True),
+            7: 'integer key',
+        }
+        expected = drf_renderers.JSONRenderer().render(data)
+        self.assertEqual(renderers.JSONRenderer().render(data), expected)
+        self.assertIn(b'\\u2028', expected)
+        self.assertEqual(renderers.JSONRenderer().render(2 ** 70), b'1180591620717411303424')
+        self.assertEqual(renderers.JSONRenderer().render(data, 'application/json; indent=4'),
+                         drf_renderers.JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_parser(self):
+        parser = renderers.JSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"title": "Caf\u00e9"}'.encode())), {'title': 'Caf\u00e9'})
+        with self.assertRaisesMessage(Exception, 'JSON parse error'):
+            parser.parse(io.BytesIO(b'{"title": '))
+
+    def test_graphql_response_matches_graphene(self):
+        query = 'query Page($slug: String!) { pageContentBySlug(slug: $slug) { title body } }'
+        response = self.client.post('/graphql/', json.dumps({'query': query, 'variables': {'slug': self.page.slug}}),
+                                    content_type='application/json')
+        payload = json.loads(response.content)
+        self.assertEqual(payload['data']['pageContentBySlug']['title'], self.page.title)
+        self.assertEqual(response.content, json.dumps(payload, separators=(',', ':')).encode())
+        self.assertEqual(self.client.post('/graphql/', '[]', content_type='application/json').status_code, 400)
+
+
+class GraphQLThrottleTests(ContentTestCase):
+    query = json.dumps({'query': '{ allPageContents { totalCount } }'})
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(THROTTLING={'PATH': f'{directory.name}/throttle.sqlite3'})
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(throttling.SharedRateThrottle, 'THROTTLE_RATES', {'graphql_anon': '1/min'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_anonymous_requests_are_limited(self):
+        self.assertEqual(self.client.post('/graphql/', self.query, content_type='application/json').status_code, 200)
+        response = self.client.post('/graphql/', self.query, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.content)['errors'][0]['message'], 'Request was throttled.')
+        self.assertIn(response['Retry-After'], ('59', '60'))
+
+        self.client.force_login(get_user_model().objects.create_user(username='reader'))
+        self.assertEqual(self.client.post('/graphql/', self.query, content_type='application/json').status_code, 200)
+
+    @override_settings(ROOT_URLCONF='backend.urls_async')
+    async def test_async_view_counts_each_request_once(self):
+        client = AsyncClient()
+        mutation = json.dumps({'query': 'mutation { createPageContent(title: "New", body: "Body") { pageContent { title } } }'})
+        with mock.patch.object(throttling.SharedRateThrottle, 'THROTTLE_RATES', {'graphql_anon': '2/min'}):
+            # Handed to the sync view, which must not count it again
+            await client.post('/graphql/', mutation, content_type='application/json')
+            self.assertEqual((await client.post('/graphql/', self.query, content_type='application/json')).status_code, 200)
+            self.assertEqual((await client.post('/graphql/', self.query, content_type='application/json')).status_code, 429)
+
+
+class ReplicaRoutingTests(PatchedTasksMixin, TransactionTestCase):
+    """SQLite copies of the test database stand in for two replicas that stopped replicating."""
+    aliases = ['replica1', 'replica2']
+
+    def setUp(self):
+        super().setUp()
+        self.author = get_user_model().objects.create_user(username='editor', role='editor')
+        PageContent.objects.create(title='Replicated', body='Body', is_published=True, author=self.author,
+                                   publish_date=timezone.now() - timedelta(hours=1))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in self.aliases:
+            path = f'{directory.name}/{alias}.sqlite3'
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM INTO %s', [path])
+            connections.settings[alias] = {**connection.settings_dict, 'NAME': path}
+            self.addCleanup(self.remove_alias, alias)
+        # Let the test reach the aliases added above
+        patcher = mock.patch.object(type(self), 'databases', {'default', *self.aliases})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Stickiness needs a cache that processes share
+        override = override_settings(
+            READ_REPLICAS={'ALIASES': self.aliases, 'STICKY_SECONDS': 10, 'HEALTH_CHECK_INTERVAL': 30},
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                'LOCATION': f'{directory.name}/cache'}},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # Only the primary has this one
+        PageContent.objects.create(title='Primary only', body='Body', is_published=True, author=self.author,
+                                   publish_date=timezone.now() - timedelta(hours=1))
+
+    def remove_alias(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def titles(self, client):
+        response = client.get('/api/content/')
+        self.assertEqual(response.status_code, 200)
+        return {item['title'] for item in response.data['results']}
+
+    def test_reads_go_to_replicas_in_turn(self):
+        with CaptureQueriesContext(connections['replica1']) as first, CaptureQueriesContext(connections['replica2']) as second:
+            self.assertEqual(self.titles(APIClient()), {'Replicated'})
+            self.assertEqual(self.titles(APIClient()), {'Replicated'})
+        self.assertTrue(first.captured_queries)
+        self.assertTrue(second.captured_queries)
+        # Writes and views that did not opt in stay on the primary
+        self.assertEqual(PageContent.objects.count(), 2)
+
+    def test_unhealthy_replica_is_skipped(self):
+        connections.settings['replica1']['NAME'] = '/nonexistent/replica1.sqlite3'
+        connections['replica1'].close()
+        del connections['replica1']
+        for _ in range(3):
+            self.assertEqual(self.titles(APIClient()), {'Replicated'})
+
+    def test_writers_read_their_writes(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.post('/api/content/', {'title': 'Fresh', 'body': 'Body', 'is_published': True,
+                                                 'publish_date': timezone.now().isoformat()}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Fresh', self.titles(client))
+        self.assertNotIn('Fresh', self.titles(APIClient()))
+
+    def test_per_process_cache_keeps_users_on_the_primary(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        self.assertEqual(self.titles(client), {'Replicated'})
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(self.titles(client), {'Replicated', 'Primary only'})
+            self.assertEqual(self.titles(APIClient()), {'Replicated'})
+
+    def test_graphql_routing_reads_the_operation_types(self):
+        self.assertTrue(only_queries('{ allPageContents { totalCount } }'))
+        self.assertTrue(only_queries('query Pages($mutation: Boolean) { allPageContents { totalCount } }'))
+        self.assertFalse(only_queries('query A { a } mutation B { b }'))
+        self.assertFalse(only_queries('subscription { updates }'))
+        self.assertFalse(only_queries('{ "unterminated }'))
+
+        query = json.dumps({'query': '{ allPageContents { edges { node { title } } } }'})
+        with mock.patch.object(Parser, 'parse_document', autospec=True,
+                               side_effect=Parser.parse_document) as parse_document:
+            self.client.post('/graphql/', query, content_type='application/json')
+        parse_document.assert_called_once()
+
+    def test_graphql_queries_use_replicas_and_mutations_the_primary(self):
+        query = json.dumps({'query': '{ allPageContents { edges { node { title } } } }'})
+        response = self.client.post('/graphql/', query, content_type='application/json')
+        titles = {edge['node']['title'] for edge in json.loads(response.content)['data']['allPageContents']['edges']}
+        self.assertEqual(titles, {'Replicated'})
+
+        self.client.force_login(self.author)
+        mutation = json.dumps({'query': 'mutation { updatePageContent(id: %d, title: "Renamed") { pageContent { title } } }'
+                                        % PageContent.objects.get(title='Primary only').pk})
+        response = self.client.post('/graphql/', mutation, content_type='application/json')
+        self.assertEqual(json.loads(response.content)['data']['updatePageContent']['pageContent']['title'], 'Renamed')
+        response = self.client.post('/graphql/', query, content_type='application/json')
+        titles = {edge['node']['title'] for edge in json.loads(response.content)['data']['allPageContents']['edges']}
+        self.assertEqual(titles, {'Replicated', 'Renamed'})
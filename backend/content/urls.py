@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PageContentViewSet, generate_preview_token, public_content_stats
+from .views import PageContentViewSet, generate_preview_token, prerendered_page, public_content_stats
 
 router = DefaultRouter()
 router.register(r'content', PageContentViewSet)
@@ -9,4 +9,6 @@ urlpatterns = [
     path('', include(router.urls)),
     path('content/<int:pk>/generate-preview-token/', generate_preview_token),
     path('public/', public_content_stats, name='public_content_stats'),
+    path('pages/<slug:slug>/', prerendered_page, name='prerendered_page'),
+    path('pages/<slug:slug>/html/', prerendered_page, {'extension': 'html'}, name='prerendered_page_html'),
 ]
\ No newline at end of file
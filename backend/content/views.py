@@ -3,26 +3,52 @@ from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .permissions import IsAuthorOrReadOnly
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.shortcuts import get_object_or_404
 from django.db import models
+from metrics.registry import record_cache
+from .async_api import AsyncAPIView, gather_reads
+from .conditional import Validators, arow_validators, is_conditional, row_validators
 from .models import PageContent
+from .pagination import PublishDateCursorPagination
+from .previews import make_preview_token, read_preview_token, revoke_preview_tokens
+from .prerender import FORMATS as ARTIFACT_TYPES, REMOVED, find_artifact, prerender_pages
+from .search import search_page_contents
+from .stats import aget_public_stats, get_public_stats
 from .serializers import (
     PageContentSerializer,
     PageContentListSerializer,
     PageContentPreviewSerializer,
     CreatePageContentSerializer,
-    UpdatePageContentSerializer
+    UpdatePageContentSerializer,
+    SearchHitSerializer,
+    page_content_list_reader,
+    page_content_reader
 )
-import secrets
+from datetime import datetime, timezone as dt_timezone
 from django.utils import timezone
 
-# In-memory token store (for demo purposes)
-PREVIEW_TOKENS = {}
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+
+
+def _positive_int(value, default, maximum=None):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    if value < 1:
+        return default
+    return min(value, maximum) if maximum else value
 
 class PageContentViewSet(viewsets.ModelViewSet):
     queryset = PageContent.objects.all()
     serializer_class = PageContentSerializer
     permission_classes = [IsAuthorOrReadOnly]
+    pagination_class = PublishDateCursorPagination
+    # Safe requests may read from a replica (see backend.db_routers)
+    replica_reads = True
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -41,6 +67,37 @@ class PageContentViewSet(viewsets.ModelViewSet):
                 )
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        reader = page_content_list_reader
+        queryset = self.filter_queryset(self.get_queryset())
+        # The visible rows depend on the user, the page on the query string
+        validators, count = Validators.for_list(queryset, request.get_full_path(), request.user.pk)
+        not_modified = validators.not_modified(request)
+        if not_modified:
+            return not_modified
+
+        page = self.paginator.paginate_queryset(reader.values(queryset), request, view=self, count=count)
+        return validators.apply(self.get_paginated_response([reader.to_representation(row) for row in page]))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = page_content_reader
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        queryset = self.filter_queryset(self.get_queryset()).filter(**lookup)
+
+        if is_conditional(request):
+            validators = row_validators('detail', queryset)
+            if validators.last_modified:
+                not_modified = validators.not_modified(request)
+                if not_modified:
+                    return not_modified
+
+        row = reader.values(queryset).first()
+        if row is None:
+            raise Http404
+        # Object permissions only look at the author for writes
+        self.check_object_permissions(request, row)
+        return Validators.for_rows('detail', [row]).apply(Response(reader.to_representation(row)))
+
     def get_serializer_class(self):
         if self.action == 'list':
             return PageContentListSerializer
@@ -50,58 +107,161 @@ class PageContentViewSet(viewsets.ModelViewSet):
             return UpdatePageContentSerializer
         return PageContentSerializer
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = _positive_int(request.query_params.get('page'), 1)
+        page_size = _positive_int(request.query_params.get('page_size'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+        # SearchHitSerializer lists the page without its body
+        hits, total = search_page_contents(query, limit=page_size, offset=(page - 1) * page_size, defer=['body'])
+        return Response({
+            'count': total,
+            'page': page,
+            'page_size': page_size,
+            'results': SearchHitSerializer(hits, many=True).data,
+        })
+
     @action(detail=True, methods=['get'], url_path='preview/(?P<token>[^/.]+)')
     def preview(self, request, pk=None, token=None):
         content = get_object_or_404(PageContent, pk=pk)
-        if PREVIEW_TOKENS.get(token) == str(pk):
+        if read_preview_token(token, pk) == content.preview_token_version:
             serializer = PageContentPreviewSerializer(content)
             return Response(serializer.data)
         return Response({'detail': 'Invalid or expired token'}, status=403)
 
-@api_view(['POST'])
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthorOrReadOnly])
 def generate_preview_token(request, pk):
-    token = secrets.token_urlsafe(16)
-    PREVIEW_TOKENS[token] = str(pk)
-    return Response({'token': token})
+    content = get_object_or_404(PageContent.objects.only('id', 'author_id', 'preview_token_version'), pk=pk)
+    # Only the page's author, an admin or an editor issues or revokes its tokens
+    request.parser_context['view'].check_object_permissions(request, content)
+
+    if request.method == 'DELETE':
+        # Revokes every token issued for the page so far
+        if not revoke_preview_tokens(pk):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    token, expires = make_preview_token(content)
+    return Response({
+        'token': token,
+        'expires_at': datetime.fromtimestamp(expires, tz=dt_timezone.utc),
+    })
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def public_content_stats(request):
     """Public endpoint for homepage stats"""
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    total_content = PageContent.objects.filter(is_published=True).count()
-    total_users = User.objects.filter(is_active=True).count()
-    recent_content = PageContent.objects.filter(
-        is_published=True, 
-        publish_date__lte=timezone.now()
-    ).select_related('author').order_by('-publish_date')[:6]
-    
-    recent_content_data = []
-    for content in recent_content:
-        # Handle null author
-        author_data = None
-        if content.author:
-            author_data = {
-                'username': content.author.username,
-                'first_name': content.author.first_name,
-                'last_name': content.author.last_name,
-            }
-        
-        recent_content_data.append({
-            'id': content.id,
-            'title': content.title,
-            'content': content.body[:200] + '...' if len(content.body) > 200 else content.body,
-            'content_type': getattr(content, 'content_type', 'article'),
-            'author': author_data,
-            'created_at': content.created_at.isoformat() if content.created_at else None,
-            'meta_description': getattr(content, 'meta_description', ''),
-        })
-    
-    return Response({
-        'total_content': total_content,
-        'total_users': total_users,
-        'recent_content': recent_content_data,
-    })
\ No newline at end of file
+    return Response(get_public_stats())
+
+
+# api_view has no decorator for it, so it is set on the view class
+public_content_stats.cls.replica_reads = True
+
+
+def _rebuild_artifact(slug, extension, accept_encoding):
+    """Build the artifacts of ``slug`` and find them again; Http404 if it is not live."""
+    if prerender_pages([slug])[slug] == REMOVED:
+        raise Http404
+    found = find_artifact(slug, extension, accept_encoding)
+    if found is None:
+        # Removed again by a concurrent unpublish
+        raise Http404
+    return found
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def prerendered_page(request, slug, extension='json'):
+    """Serve a live page from its prebuilt artifact, building it on a miss"""
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    found = find_artifact(slug, extension, accept_encoding)
+    record_cache('prerendered_pages', 'miss' if found is None else 'hit')
+    if found is None:
+        found = _rebuild_artifact(slug, extension, accept_encoding)
+    path, encoding, etag = found
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            artifact = open(path, 'rb')
+        except FileNotFoundError:
+            # Regenerated or removed since it was found
+            path, encoding, etag = _rebuild_artifact(slug, extension, accept_encoding)
+            try:
+                artifact = open(path, 'rb')
+            except FileNotFoundError:
+                raise Http404
+        response = FileResponse(artifact, content_type=ARTIFACT_TYPES[extension])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+class AsyncPageContentList(AsyncAPIView):
+    """``PageContentViewSet.list`` for ASGI; writes go to ``fallback``.
+
+    Unless the request is conditional, the validator aggregate (which also
+    counts the rows) and the page itself are read concurrently.
+    """
+    permission_classes = PageContentViewSet.permission_classes
+    replica_reads = True
+
+    async def get(self, request):
+        reader = page_content_list_reader
+        queryset = PageContentViewSet(request=request, action='list', format_kwarg=None).get_queryset()
+        paginator = PublishDateCursorPagination()
+        extra = (request.get_full_path(), request.user.pk)
+
+        if is_conditional(request):
+            validators, count = await Validators.afor_list(queryset, *extra)
+            not_modified = validators.not_modified(request)
+            if not_modified:
+                return not_modified
+            [rows] = await gather_reads(lambda: paginator.paginate_queryset(reader.values(queryset), request, count=count))
+        else:
+            (validators, count), rows = await gather_reads(
+                lambda: Validators.for_list(queryset, *extra),
+                lambda: paginator.select_rows(reader.values(queryset), request),
+            )
+            paginator.request = request
+            paginator.count = count if paginator.include_count(request) else None
+        return validators.apply(paginator.get_paginated_response([reader.to_representation(row) for row in rows]))
+
+
+class AsyncPageContentDetail(AsyncAPIView):
+    """``PageContentViewSet.retrieve`` for ASGI; writes go to ``fallback``."""
+    permission_classes = PageContentViewSet.permission_classes
+    replica_reads = True
+
+    async def get(self, request, pk):
+        reader = page_content_reader
+        queryset = PageContentViewSet(request=request, action='retrieve', format_kwarg=None).get_queryset().filter(pk=pk)
+
+        if is_conditional(request):
+            validators = await arow_validators('detail', queryset)
+            if validators.last_modified:
+                not_modified = validators.not_modified(request)
+                if not_modified:
+                    return not_modified
+
+        row = await reader.values(queryset).afirst()
+        if row is None:
+            raise Http404
+        self.check_object_permissions(request, row)
+        return Validators.for_rows('detail', [row]).apply(Response(reader.to_representation(row)))
+
+
+class AsyncPublicContentStats(AsyncAPIView):
+    """``public_content_stats`` for ASGI."""
+    permission_classes = [AllowAny]
+    replica_reads = True
+
+    async def get(self, request):
+        return Response(await aget_public_stats())
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metrics'
+
+    def ready(self):
+        from celery.signals import task_postrun, task_prerun
+        from django.db.backends.signals import connection_created
+        from . import receivers
+
+        connection_created.connect(receivers.install_query_timer, dispatch_uid='metrics.install_query_timer')
+        task_prerun.connect(receivers.start_task_timer, dispatch_uid='metrics.start_task_timer')
+        task_postrun.connect(receivers.record_task_duration, dispatch_uid='metrics.record_task_duration')
@@ -0,0 +1,43 @@
+import time
+from inspect import isawaitable
+from .registry import observe
+
+
+class ResolverTimingMiddleware:
+    """Graphene middleware timing the top-level fields of each operation.
+
+    Nested fields are passed straight through; timing every resolver would
+    cost more than most of them take.
+    """
+
+    def resolve(self, next, root, info, **args):
+        if info.path.prev is not None:
+            return next(root, info, **args)
+
+        timing = getattr(info.context, 'metrics', None)
+        if timing is not None and timing.operation is None:
+            timing.operation = info.operation.name.value if info.operation.name else 'anonymous'
+        started = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            self.record(info, timing, started)
+            raise
+        if isawaitable(result):
+            return self.finish(result, info, timing, started)
+        self.record(info, timing, started)
+        return result
+
+    async def finish(self, result, info, timing, started):
+        # Async resolvers are timed until their result is ready
+        try:
+            return await result
+        finally:
+            self.record(info, timing, started)
+
+    @staticmethod
+    def record(info, timing, started):
+        duration = time.perf_counter() - started
+        observe('graphql_resolver_duration_seconds', {'field': f'{info.parent_type.name}.{info.field_name}'}, duration)
+        if timing is not None:
+            timing.resolver_time += duration
@@ -0,0 +1,98 @@
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .registry import get_registry, inc, metrics_setting, observe
+
+# The timing of the request being handled; visible to the worker threads an
+# async view hands its queries to, as they run with a copy of its context
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """What one request spent, filled in by the SQL wrapper and the GraphQL middleware."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.query_time = 0.0
+        self.resolver_time = 0.0
+        self.operation = None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.query_time += duration
+                self.queries += 1
+
+    def server_timing(self, duration):
+        parts = [f'db;dur={self.query_time * 1000:.1f};desc="{self.queries} queries"']
+        if self.operation is not None:
+            parts.append(f'graphql;dur={self.resolver_time * 1000:.1f}')
+        parts.append(f'total;dur={duration * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper on every connection (installed by metrics.models) feeding the current request's timing."""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.execute(execute, sql, params, many, context)
+
+
+class RequestMetricsMiddleware:
+    """Counts requests, latency and SQL per view (and GraphQL operation) for /metrics."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics_setting('ENABLED'):
+            return self.get_response(request)
+
+        timing = request.metrics = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.record(request, response, timing, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not metrics_setting('ENABLED'):
+            return await self.get_response(request)
+
+        timing = request.metrics = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.record(request, response, timing, time.perf_counter() - started)
+
+    def record(self, request, response, timing, duration):
+        match = request.resolver_match
+        labels = {'view': match.view_name if match else 'unmatched', 'operation': timing.operation or ''}
+        inc('http_requests_total', {**labels, 'method': request.method, 'status': str(response.status_code)})
+        observe('http_request_duration_seconds', labels, duration)
+        inc('db_queries_total', {'view': labels['view']}, timing.queries)
+        inc('db_query_duration_seconds_total', {'view': labels['view']}, timing.query_time)
+        get_registry().flush()
+
+        if metrics_setting('SERVER_TIMING'):
+            response.headers['Server-Timing'] = timing.server_timing(duration)
+        return response
@@ -0,0 +1,26 @@
+import time
+from .middleware import time_query
+from .registry import get_registry, observe
+
+# Connected in MetricsConfig.ready(): query and Celery task timing
+_started = {}
+
+
+def install_query_timer(connection, **kwargs):
+    # First in the list, so wrappers pushed and popped around it by
+    # connection.execute_wrapper() blocks are unaffected
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+def start_task_timer(task_id, **kwargs):
+    _started[task_id] = time.perf_counter()
+
+
+def record_task_duration(task_id, task, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    observe('celery_task_duration_seconds', {'task': task.name, 'state': state or 'UNKNOWN'},
+            time.perf_counter() - started)
+    get_registry().flush()
@@ -0,0 +1,246 @@
+"""
+Process-local metrics, shared between worker processes through files.
+
+Each process counts into its own Registry and every ``FLUSH_INTERVAL``
+seconds writes a snapshot to ``<DIR>/<pid>-<start>.json`` (written to a
+temporary name and renamed). ``/metrics`` adds up the snapshots of every
+process that has written one, so the values are the same whichever worker
+answers the scrape. A scrape deletes the snapshots of processes that have
+exited, so the directory does not grow with every restart; the sums drop
+with them, which Prometheus reads as a counter reset.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': None,
+    'FLUSH_INTERVAL': 1.0,
+    'SERVER_TIMING': False,
+    # Series per metric before new label combinations are folded into one
+    'MAX_SERIES': 500,
+    # /metrics answers a scraper with the bearer TOKEN or from ALLOWED_IPS
+    # (addresses or networks), and is a 404 with neither
+    'TOKEN': None,
+    'ALLOWED_IPS': (),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# name: (type, help, buckets)
+FAMILIES = {
+    'http_requests_total': ('counter', 'HTTP requests by view, GraphQL operation, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by view and GraphQL operation.', LATENCY_BUCKETS),
+    'db_queries_total': ('counter', 'SQL queries run while handling requests, by view.', None),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries while handling requests, by view.', None),
+    'graphql_resolver_duration_seconds': ('histogram', 'Time spent in top-level GraphQL resolvers, by field.', LATENCY_BUCKETS),
+    'celery_task_duration_seconds': ('histogram', 'Celery task run time by task and final state.', TASK_BUCKETS),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit, stale or miss).', None),
+}
+
+OVERFLOW = '__other__'
+
+
+def metrics_setting(name):
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+def metrics_dir():
+    return Path(metrics_setting('DIR') or Path(tempfile.gettempdir()) / 'backend-metrics')
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.histograms = {}
+        self.series = defaultdict(set)
+        self.pid = os.getpid()
+        self.path = metrics_dir() / f'{self.pid}-{time.time_ns()}.json'
+        self.flushed_at = 0.0
+
+    def _key(self, name, labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series[name]
+        if key not in series:
+            if len(series) >= metrics_setting('MAX_SERIES'):
+                key = tuple((label, OVERFLOW) for label, _ in key)
+            series.add(key)
+        return key
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[name, self._key(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        buckets = FAMILIES[name][2]
+        with self.lock:
+            key = name, self._key(name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            histogram = self.histograms[key]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(buckets)
+            histogram[0][index] += 1
+            histogram[1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, key, value] for (name, key), value in self.counters.items()],
+                'histograms': [[name, key, list(counts), total] for (name, key), (counts, total) in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Write this process's snapshot if FLUSH_INTERVAL has passed since the last one."""
+        now = time.monotonic()
+        if not force and now - self.flushed_at < metrics_setting('FLUSH_INTERVAL'):
+            return
+        self.flushed_at = now
+        data = json.dumps(self.snapshot()).encode()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                output.write(data)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None or _registry.pid != os.getpid():
+        # A forked child (Celery prefork, gunicorn) starts its own registry
+        with _registry_lock:
+            if _registry is None or _registry.pid != os.getpid():
+                _registry = Registry()
+    return _registry
+
+
+@receiver(setting_changed)
+def reset_registry(setting, **kwargs):
+    global _registry
+    if setting == 'METRICS':
+        _registry = None
+
+
+@atexit.register
+def _flush_at_exit():
+    if _registry is not None and _registry.pid == os.getpid():
+        try:
+            _registry.flush(force=True)
+        except OSError:
+            pass
+
+
+def inc(name, labels, amount=1):
+    if metrics_setting('ENABLED'):
+        get_registry().inc(name, labels, amount)
+
+
+def observe(name, labels, value):
+    if metrics_setting('ENABLED'):
+        get_registry().observe(name, labels, value)
+
+
+def record_cache(cache, result):
+    """Count one lookup of ``cache``; ``result`` is 'hit', 'stale' or 'miss'."""
+    inc('cache_requests_total', {'cache': cache, 'result': result})
+
+
+def _process_exited(path):
+    try:
+        os.kill(int(path.stem.split('-')[0]), 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, OSError):
+        # Not ours to signal (PermissionError), or not a snapshot name
+        pass
+    return False
+
+
+def collect():
+    """Counters and histograms summed over the snapshots of every running process."""
+    get_registry().flush(force=True)
+    counters = defaultdict(float)
+    histograms = {}
+    for path in metrics_dir().glob('*.json'):
+        if _process_exited(path):
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            snapshot = json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            continue
+        for name, key, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, key))] += value
+        for name, key, counts, total in snapshot['histograms']:
+            key = name, tuple(map(tuple, key))
+            if key not in histograms:
+                histograms[key] = [[0] * len(counts), 0.0]
+            for index, count in enumerate(counts):
+                histograms[key][0][index] += count
+            histograms[key][1] += total
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def exposition():
+    """Every metric in the Prometheus text format (version 0.0.4)."""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in FAMILIES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (family, key), value in sorted(counters.items()):
+                if family == name:
+                    lines.append(f'{name}{_labels(key)} {_number(value)}')
+            continue
+        for (family, key), (counts, total) in sorted(histograms.items()):
+            if family != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, math.inf), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(key, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(key)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
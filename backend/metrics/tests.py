@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from celery import shared_task
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from . import registry
+
+
+@shared_task
+def add(x, y):
+    return x + y
+
+
+def sample(text, name, **labels):
+    """The value of one series in an exposition, or None."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf'{name}(?:\{{(.*)\}})? (\S+)', line)
+        if match and dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or '')) == labels:
+            return float(match.group(2))
+    return None
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.settings_override = override_settings(METRICS={'DIR': directory.name, 'FLUSH_INTERVAL': 0,
+                                                           'ALLOWED_IPS': ['127.0.0.0/8']})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_counts_requests_queries_and_cache(self):
+        for _ in range(2):
+            self.client.get('/api/public/')
+        text = self.scrape()
+        view = 'public_content_stats'
+        self.assertEqual(sample(text, 'http_requests_total', view=view, operation='', method='GET', status='200'), 2)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count', view=view, operation=''), 2)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_bucket', view=view, operation='', le='+Inf'), 2)
+        self.assertGreater(sample(text, 'db_queries_total', view=view), 0)
+        self.assertEqual(sample(text, 'cache_requests_total', cache='public_stats', result='miss'), 1)
+        self.assertEqual(sample(text, 'cache_requests_total', cache='public_stats', result='hit'), 1)
+
+    def test_graphql_operation_and_resolvers(self):
+        query = 'query Latest { allPageContents(first: 1) { edges { node { title } } } }'
+        self.client.post('/graphql/', json.dumps({'query': query}), content_type='application/json')
+        text = self.scrape()
+        self.assertEqual(sample(text, 'http_requests_total', view='graphql', operation='Latest', method='POST', status='200'), 1)
+        self.assertEqual(sample(text, 'graphql_resolver_duration_seconds_count', field='Query.allPageContents'), 1)
+
+    def test_sums_every_process(self):
+        self.client.get('/api/public/')
+        other = {
+            'counters': [['http_requests_total',
+                          [['method', 'GET'], ['operation', ''], ['status', '200'], ['view', 'public_content_stats']],
+                          5]],
+            'histograms': [],
+        }
+        with open(f'{self.directory}/1-1.json', 'w') as output:
+            json.dump(other, output)
+        text = self.scrape()
+        self.assertEqual(sample(text, 'http_requests_total', view='public_content_stats',
+                                operation='', method='GET', status='200'), 6)
+
+    def test_prunes_exited_processes(self):
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        path = f'{self.directory}/{exited.pid}-1.json'
+        with open(path, 'w') as output:
+            json.dump({'counters': [['cache_requests_total', [['cache', 'gone'], ['result', 'hit']], 1]],
+                       'histograms': []}, output)
+        self.assertIsNone(sample(self.scrape(), 'cache_requests_total', cache='gone', result='hit'))
+        self.assertFalse(os.path.exists(path))
+
+    def test_celery_task_duration(self):
+        add.apply(args=(1, 2))
+        text = self.scrape()
+        self.assertEqual(sample(text, 'celery_task_duration_seconds_count', task=add.name, state='SUCCESS'), 1)
+
+    def test_series_limit(self):
+        with override_settings(METRICS={'DIR': self.directory, 'MAX_SERIES': 2, 'ALLOWED_IPS': ['127.0.0.1']}):
+            for name in ('a', 'b', 'c', 'd'):
+                registry.record_cache(name, 'hit')
+            text = self.scrape()
+        self.assertEqual(sample(text, 'cache_requests_total', cache='b', result='hit'), 1)
+        self.assertEqual(sample(text, 'cache_requests_total', cache=registry.OVERFLOW, result=registry.OVERFLOW), 2)
+
+    def test_server_timing_and_token(self):
+        with override_settings(METRICS={'DIR': self.directory, 'SERVER_TIMING': True, 'TOKEN': 'scrape'}):
+            response = self.client.get('/api/public/')
+            self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.scrape(HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertNotIn('Server-Timing', self.client.get('/api/public/'))
+
+    def test_access(self):
+        with override_settings(METRICS={'DIR': self.directory}):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(METRICS={'DIR': self.directory, 'ALLOWED_IPS': ['10.0.0.0/8']}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.scrape(REMOTE_ADDR='10.1.2.3')
@@ -0,0 +1,31 @@
+import hmac
+from ipaddress import ip_address, ip_network
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from .registry import exposition, metrics_setting
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _allowed_address(request):
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ip_network(network, strict=False) for network in metrics_setting('ALLOWED_IPS'))
+
+
+@require_GET
+def metrics(request):
+    """Every process's metrics in the Prometheus text format.
+
+    Served to a scraper that sends the bearer TOKEN or connects from one of
+    ALLOWED_IPS; with neither configured there is no endpoint.
+    """
+    token = metrics_setting('TOKEN')
+    if not token and not metrics_setting('ALLOWED_IPS'):
+        raise Http404
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not _allowed_address(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
@@ -0,0 +1,87 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from content.models import PageContent, SiteCounter
+from recommendations.models import ContentToken, content_terms
+from recommendations.similarity import rebuild_recommendations, update_recommendations_for
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the cost of one incremental recommendation update at several corpus sizes. '
+        'Synthetic pages are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,2000,4000,8000',
+                            help='Comma separated corpus sizes to measure')
+        parser.add_argument('--edits', type=int, default=50, help='Edits timed per corpus size')
+        parser.add_argument('--body-words', type=int, default=120)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write(f'{"pages":>8} {"rebuild s":>10} {"edit ms":>9} {"queries/edit":>13}')
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self.measure(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def measure(self, size, options):
+        rng = random.Random(options['seed'])
+        # Vocabulary grows with the corpus (Heaps' law) and word use is Zipfian
+        vocabulary = [f'term{index}' for index in range(int(40 * size ** 0.6))]
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+        def text(words):
+            return ' '.join(rng.choices(vocabulary, weights, k=words))
+
+        PageContent.objects.all().delete()
+        pages = PageContent.objects.bulk_create(
+            [
+                PageContent(title=text(6), slug=f'bench-{index}', body=text(options['body_words']), is_published=True)
+                for index in range(size)
+            ],
+            batch_size=1000,
+        )
+        ContentToken.objects.bulk_create(
+            [
+                ContentToken(token=token, content=page, count=count)
+                for page in pages
+                for token, count in content_terms(page).items()
+            ],
+            batch_size=5000,
+        )
+        # bulk_create bypasses the signals that keep the published count
+        SiteCounter.objects.reconcile()
+
+        started = time.monotonic()
+        rebuild_recommendations()
+        rebuild_seconds = time.monotonic() - started
+
+        edited = rng.sample(pages, min(options['edits'], size))
+        for page in edited:
+            page.body = text(options['body_words'])
+        PageContent.objects.bulk_update(edited, ['body'])
+
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        started = time.monotonic()
+        with connection.execute_wrapper(count_queries):
+            for page in edited:
+                update_recommendations_for(page.pk)
+        edit_ms = (time.monotonic() - started) * 1000 / len(edited)
+
+        self.stdout.write(f'{size:>8} {rebuild_seconds:>10.2f} {edit_ms:>9.2f} {len(queries) / len(edited):>13.1f}')
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from recommendations.similarity import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, rebuild_recommendations
+from recommendations.tasks import rebuild_recommendations as rebuild_recommendations_task
+
+
+class Command(BaseCommand):
+    help = 'Compute TF-IDF nearest neighbours for every page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--async', action='store_true', dest='run_async',
+                            help='Queue the rebuild on Celery instead of running it here')
+
+    def handle(self, *args, **options):
+        if options['run_async']:
+            result = rebuild_recommendations_task.delay(options['top_k'], options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Queued recommendation rebuild: {result.id}'))
+            return
+
+        started = time.monotonic()
+        scored = rebuild_recommendations(top_k=options['top_k'], chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Computed recommendations for {scored} pages in {time.monotonic() - started:.1f}s')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from content.models import PageContent
+from recommendations.models import ContentToken, TokenFrequency
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the token index used for recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = 0
+        with transaction.atomic():
+            ContentToken.objects.all().delete()
+            TokenFrequency.objects.all().delete()
+            for content in PageContent.objects.only('id', 'title', 'body', 'meta_description', 'content_type').iterator(chunk_size=options['batch_size']):
+                ContentToken.objects.reindex(content)
+                indexed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} content entries')
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('content', '0003_pagecontent_author_pagecontent_content_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='content.pagecontent')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'content'), name='unique_content_token')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_pagecontent_author_pagecontent_content_type_and_more'),
+        ('recommendations', '0002_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVector',
+            fields=[
+                ('content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vector', serialize=False, to='content.pagecontent')),
+                ('norm', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenFrequency',
+            fields=[
+                ('token', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('documents', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='contenttoken',
+            name='unique_content_token',
+        ),
+        migrations.AddIndex(
+            model_name='contenttoken',
+            index=models.Index(fields=['token', '-count', 'content'], name='content_token_champion_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='contenttoken',
+            constraint=models.UniqueConstraint(fields=('content', 'token'), name='unique_content_token_per_page'),
+        ),
+    ]
@@ -1,3 +1,154 @@
-from django.db import models
+from collections import Counter, defaultdict
+from django.db import connection, models
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from content.models import PageContent
+from .text import tokenize
 
-# Create your models here.
+# Title words say more about a page than any single body word
+TITLE_WEIGHT = 3
+
+# Rows per statement in ContentToken.objects.index_new, well under the
+# database's limit on query parameters
+POSTINGS_PER_INSERT = 300
+
+
+def content_terms(content):
+    """Term counts for a page across its title, body and meta description."""
+    terms = Counter(tokenize(content.body))
+    terms.update(tokenize(content.meta_description))
+    for token in tokenize(content.title):
+        terms[token] += TITLE_WEIGHT
+    if content.content_type:
+        terms[f'type:{content.content_type.lower()}'[:64]] += 1
+    return terms
+
+
+class TokenFrequencyManager(models.Manager):
+    def adjust(self, tokens, delta):
+        if not tokens:
+            return
+        if delta > 0:
+            self.bulk_create([self.model(token=token) for token in tokens], ignore_conflicts=True)
+        self.filter(token__in=tokens).update(documents=F('documents') + delta)
+
+
+class TokenFrequency(models.Model):
+    """Number of pages using a token, kept alongside the postings."""
+    token = models.CharField(max_length=64, primary_key=True)
+    documents = models.IntegerField(default=0)
+
+    objects = TokenFrequencyManager()
+
+    def __str__(self):
+        return f"{self.token}: {self.documents}"
+
+
+class ContentTokenManager(models.Manager):
+    def reindex(self, content):
+        """Bring the postings for a single page in line with its current text."""
+        terms = content_terms(content)
+        existing = dict(self.filter(content=content).values_list('token', 'count'))
+        TokenFrequency.objects.adjust(terms.keys() - existing.keys(), 1)
+        TokenFrequency.objects.adjust(existing.keys() - terms.keys(), -1)
+
+        # Tokens whose count changed are rewritten along with the stale ones
+        outdated = {token for token, count in existing.items() if terms.get(token) != count}
+        if outdated:
+            self.filter(content=content, token__in=outdated).delete()
+
+        missing = {token for token in terms if token not in existing or token in outdated}
+        if missing:
+            self.bulk_create(
+                [self.model(token=token, content=content, count=terms[token]) for token in missing],
+                ignore_conflicts=True,
+            )
+
+    def index_new(self, contents):
+        """Postings for pages that have none yet, e.g. rows just added with bulk_create.
+
+        Imports add hundreds of postings per page, so they are written as
+        multi-row INSERT statements rather than built as model instances.
+        """
+        postings = []
+        documents = Counter()
+        for content in contents:
+            terms = content_terms(content)
+            documents.update(terms.keys())
+            postings.extend((token, content.pk, count) for token, count in terms.items())
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            for start in range(0, len(postings), POSTINGS_PER_INSERT):
+                chunk = postings[start:start + POSTINGS_PER_INSERT]
+                cursor.execute(
+                    f'INSERT INTO {table} (token, content_id, count) VALUES {", ".join(["(%s, %s, %s)"] * len(chunk))}',
+                    [value for posting in chunk for value in posting],
+                )
+
+        by_delta = defaultdict(list)
+        for token, delta in documents.items():
+            by_delta[delta].append(token)
+        for delta, tokens in by_delta.items():
+            # Kept well under the database's limit on query parameters
+            for start in range(0, len(tokens), 500):
+                TokenFrequency.objects.adjust(tokens[start:start + 500], delta)
+
+
+class ContentToken(models.Model):
+    """Inverted index posting: one row per (token, page) pair."""
+    token = models.CharField(max_length=64)
+    content = models.ForeignKey(PageContent, on_delete=models.CASCADE, related_name='tokens')
+    count = models.PositiveIntegerField(default=1)
+
+    objects = ContentTokenManager()
+
+    class Meta:
+        constraints = [
+            # Led by content so token lookups go through the champion index
+            models.UniqueConstraint(fields=['content', 'token'], name='unique_content_token_per_page'),
+        ]
+        indexes = [
+            models.Index(fields=['token', '-count', 'content'], name='content_token_champion_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.content_id}"
+
+
+class ContentVector(models.Model):
+    """Euclidean norm of a published page's TF-IDF vector."""
+    content = models.OneToOneField(PageContent, on_delete=models.CASCADE, primary_key=True, related_name='vector')
+    norm = models.FloatField()
+
+    def __str__(self):
+        return f"{self.content_id}: {self.norm:.3f}"
+
+
+class Recommendation(models.Model):
+    """Precomputed nearest neighbour of a page, ordered by rank."""
+    source = models.ForeignKey(PageContent, on_delete=models.CASCADE, related_name='recommendations')
+    target = models.ForeignKey(PageContent, on_delete=models.CASCADE, related_name='recommended_for')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['source', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_id} ({self.score:.3f})"
+
+
+@receiver(post_save, sender=PageContent)
+def update_content_index(sender, instance, **kwargs):
+    ContentToken.objects.reindex(instance)
+
+
+@receiver(pre_delete, sender=PageContent)
+def remove_from_content_index(sender, instance, **kwargs):
+    # The postings themselves go with the cascade
+    tokens = set(ContentToken.objects.filter(content=instance).values_list('token', flat=True))
+    TokenFrequency.objects.adjust(tokens, -1)
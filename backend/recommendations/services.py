@@ -1,17 +1,17 @@
 from content.models import PageContent
 
-def get_recommendations_for(slug):
-    try:
-        content = PageContent.objects.get(slug=slug)
-    except PageContent.DoesNotExist:
-        return []
+DEFAULT_LIMIT = 5
 
-    # Mock logic: return other published pages with shared words in title
-    words = set(content.title.lower().split())
-    recommendations = []
 
-    for item in PageContent.objects.exclude(slug=slug).filter(is_published=True):
-        if words.intersection(set(item.title.lower().split())):
-            recommendations.append(item)
+def get_recommendations_for(slug, limit=DEFAULT_LIMIT):
+    """Published pages most similar to ``slug``, best match first.
 
-    return recommendations[:5]  # return top 5 for example
\ No newline at end of file
+    Neighbours are precomputed by ``recommendations.similarity``; this is a
+    single indexed lookup on (source, rank).
+    """
+    return (
+        PageContent.objects
+        .filter(recommended_for__source__slug=slug, is_published=True)
+        .select_related('author')
+        .order_by('recommended_for__rank')[:limit]
+    )
@@ -0,0 +1,265 @@
+"""
+TF-IDF cosine similarity over the ContentToken inverted index.
+
+Each page is a sparse vector of ``(1 + log(tf)) * idf`` weights. Neighbours are
+found by walking the postings of a page's tokens (the sparse equivalent of a
+row of ``X @ X.T``), so only pages that share at least one token are scored.
+Source pages are processed in chunks so memory stays bounded by the postings
+touched by one chunk rather than by the size of the corpus.
+
+Vector norms of published pages are kept in ContentVector so a single edited
+page can be re-scored against the corpus without recomputing anything else;
+see ``update_recommendations_for``.
+"""
+import heapq
+import math
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import Count
+from content.models import PageContent, SiteCounter
+from .models import ContentToken, ContentVector, Recommendation, TokenFrequency
+
+DEFAULT_TOP_K = 10
+DEFAULT_CHUNK_SIZE = 500
+
+# Tokens present in more than this share of the corpus carry almost no signal
+# and have the longest postings lists, so they are left out of scoring. In a
+# corpus smaller than MIN_CORPUS_FOR_MAX_DF nearly every shared token would
+# be, so there all of them are kept.
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_CORPUS_FOR_MAX_DF = 100
+
+# Only the pages that use a token most (its "champion list") are considered
+# as neighbours through that token. This bounds the postings read to score a
+# page no matter how large the corpus grows.
+MAX_POSTINGS_PER_TOKEN = 200
+
+# How many of an edited page's best matches get the page patched into their
+# own neighbour lists.
+REVERSE_CANDIDATES = 100
+
+# Champion lists read per statement; SQLite allows at most 500 terms in a
+# compound SELECT
+TOKENS_PER_CHAMPION_QUERY = 200
+
+
+def term_weight(count):
+    return 1 + math.log(count)
+
+
+def inverse_document_frequency(total, df, max_df=MAX_DOCUMENT_FREQUENCY):
+    # A stale corpus size must not turn weights negative
+    total = max(total, df)
+    if df <= 0 or (total >= MIN_CORPUS_FOR_MAX_DF and df > total * max_df):
+        return None
+    return math.log((1 + total) / (1 + df)) + 1
+
+
+def corpus_size():
+    """The number of published pages, from the counter kept up to date on publish and unpublish."""
+    return SiteCounter.objects.value(SiteCounter.PUBLISHED_CONTENT)
+
+
+# One token's champion list. Only published pages have a stored vector, so
+# the join doubles as the publication filter.
+CHAMPION_SQL = """
+    SELECT * FROM (
+        SELECT t.token, t.content_id, t.count, v.norm
+        FROM {postings} t INNER JOIN {vectors} v ON v.content_id = t.content_id
+        WHERE t.token = %s
+        ORDER BY t.count DESC, t.content_id
+        LIMIT %s
+    ) champions_{number}
+"""
+
+
+class CorpusStats:
+    """Inverse document frequencies, from TokenFrequency."""
+
+    def __init__(self, tokens=None, total=None):
+        self.total = corpus_size() if total is None else total
+        frequencies = TokenFrequency.objects.all()
+        if tokens is not None:
+            frequencies = frequencies.filter(token__in=tokens)
+        self.idf = {}
+        for token, df in frequencies.values_list('token', 'documents').iterator():
+            idf = inverse_document_frequency(self.total, df)
+            if idf is not None:
+                self.idf[token] = idf
+
+    @classmethod
+    def rebuild(cls):
+        """Recount document frequencies and persist the norm of every published page."""
+        with transaction.atomic():
+            TokenFrequency.objects.all().delete()
+            TokenFrequency.objects.bulk_create(
+                [
+                    TokenFrequency(token=token, documents=df)
+                    for token, df in ContentToken.objects.values('token').annotate(df=Count('id')).values_list('token', 'df').iterator()
+                ],
+                batch_size=DEFAULT_CHUNK_SIZE,
+            )
+        # Recounted, as pages written with bulk_create bypass the counter
+        published = SiteCounter.objects.reconcile()[SiteCounter.PUBLISHED_CONTENT]
+        stats = cls(total=published)
+
+        norms = defaultdict(float)
+        postings = ContentToken.objects.filter(content__is_published=True).values_list('content_id', 'token', 'count')
+        for content_id, token, count in postings.iterator():
+            idf = stats.idf.get(token)
+            if idf is not None:
+                norms[content_id] += (term_weight(count) * idf) ** 2
+
+        with transaction.atomic():
+            ContentVector.objects.all().delete()
+            ContentVector.objects.bulk_create(
+                [ContentVector(content_id=content_id, norm=math.sqrt(total)) for content_id, total in norms.items()],
+                batch_size=DEFAULT_CHUNK_SIZE,
+            )
+        return stats
+
+    def vectors(self, source_ids):
+        vectors = defaultdict(dict)
+        postings = ContentToken.objects.filter(content_id__in=source_ids).values_list('content_id', 'token', 'count')
+        for content_id, token, count in postings:
+            idf = self.idf.get(token)
+            if idf is not None:
+                vectors[content_id][token] = term_weight(count) * idf
+        return vectors
+
+    def postings(self, tokens):
+        """Champion lists ``{token: [(content_id, weight, norm), ...]}`` for published pages.
+
+        Each token is a bounded range scan on the (token, count) index, which
+        is what keeps the cost of scoring one page flat as the corpus grows.
+        The scans are joined with UNION ALL, so up to
+        TOKENS_PER_CHAMPION_QUERY tokens are read in one statement.
+        """
+        tables = {'postings': ContentToken._meta.db_table, 'vectors': ContentVector._meta.db_table}
+        tokens = list(tokens)
+        postings = defaultdict(list)
+        with connection.cursor() as cursor:
+            for start in range(0, len(tokens), TOKENS_PER_CHAMPION_QUERY):
+                batch = tokens[start:start + TOKENS_PER_CHAMPION_QUERY]
+                sql = ' UNION ALL '.join(CHAMPION_SQL.format(number=number, **tables) for number in range(len(batch)))
+                cursor.execute(sql, [value for token in batch for value in (token, MAX_POSTINGS_PER_TOKEN)])
+                for token, content_id, count, norm in cursor.fetchall():
+                    if norm:
+                        postings[token].append((content_id, term_weight(count) * self.idf[token], norm))
+        return postings
+
+
+def vector_norm(vector):
+    return math.sqrt(sum(weight * weight for weight in vector.values()))
+
+
+def cosine_scores(source_id, vector, postings):
+    """``{target_id: cosine}`` for every published page sharing a token with ``vector``."""
+    source_norm = vector_norm(vector)
+    dots = defaultdict(float)
+    norms = {}
+    for token, weight in vector.items():
+        for target_id, target_weight, target_norm in postings[token]:
+            if target_id != source_id:
+                dots[target_id] += weight * target_weight
+                norms[target_id] = target_norm
+    return {target_id: dot / (source_norm * norms[target_id]) for target_id, dot in dots.items()}
+
+
+def top_neighbours(scores, top_k=DEFAULT_TOP_K):
+    return heapq.nlargest(top_k, ((score, target_id) for target_id, score in scores.items()))
+
+
+def score_chunk(source_ids, stats, top_k=DEFAULT_TOP_K):
+    """Return ``{source_id: [(score, target_id), ...]}`` for a chunk of pages."""
+    vectors = stats.vectors(source_ids)
+    tokens = set()
+    for vector in vectors.values():
+        tokens.update(vector)
+    postings = stats.postings(tokens)
+
+    return {
+        source_id: top_neighbours(cosine_scores(source_id, vectors[source_id], postings), top_k)
+        if vectors.get(source_id) else []
+        for source_id in source_ids
+    }
+
+
+def store_neighbours(neighbours):
+    """Replace the stored neighbour lists for every source in ``neighbours``."""
+    with transaction.atomic():
+        Recommendation.objects.filter(source_id__in=list(neighbours)).delete()
+        Recommendation.objects.bulk_create([
+            Recommendation(source_id=source_id, target_id=target_id, score=score, rank=rank)
+            for source_id, ranked in neighbours.items()
+            for rank, (score, target_id) in enumerate(ranked)
+        ])
+
+
+def rebuild_recommendations(top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recompute the neighbour table for every page. Returns the number of pages scored."""
+    stats = CorpusStats.rebuild()
+    source_ids = list(PageContent.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(source_ids), chunk_size):
+        chunk = source_ids[start:start + chunk_size]
+        store_neighbours(score_chunk(chunk, stats, top_k=top_k))
+    return len(source_ids)
+
+
+def update_recommendations_for(content_id, top_k=DEFAULT_TOP_K, reverse_candidates=REVERSE_CANDIDATES):
+    """Re-score one edited page and patch the neighbour lists it affects.
+
+    The page's own list is recomputed, and it is merged into (or dropped from)
+    the lists of its best matches and of every page that currently lists it.
+    Unpublished pages are evicted from all other lists. Other pages' norms are
+    taken as of the last full rebuild and document frequencies come from
+    TokenFrequency, so an edit only reads the champion lists of the edited
+    page's own tokens.
+    """
+    page = PageContent.objects.filter(pk=content_id).first()
+    if page is None:
+        # Deleted pages drop out of every list through the cascade
+        return
+
+    ContentToken.objects.reindex(page)
+    tokens = list(ContentToken.objects.filter(content=page).values_list('token', flat=True))
+    stats = CorpusStats(tokens=tokens)
+    vector = stats.vectors([page.pk]).get(page.pk, {})
+
+    with transaction.atomic():
+        if not page.is_published or not vector:
+            Recommendation.objects.filter(target=page).delete()
+            ContentVector.objects.filter(content=page).delete()
+        else:
+            ContentVector.objects.update_or_create(content=page, defaults={'norm': vector_norm(vector)})
+
+        scores = cosine_scores(page.pk, vector, stats.postings(vector)) if vector else {}
+        store_neighbours({page.pk: top_neighbours(scores, top_k)})
+
+        if page.is_published and scores:
+            _patch_reverse_lists(page.pk, scores, top_k, reverse_candidates)
+
+
+def _patch_reverse_lists(page_id, scores, top_k, reverse_candidates):
+    affected = {target_id for _, target_id in top_neighbours(scores, reverse_candidates)}
+    affected.update(Recommendation.objects.filter(target_id=page_id).values_list('source_id', flat=True))
+
+    current = defaultdict(list)
+    rows = Recommendation.objects.filter(source_id__in=affected).values_list('source_id', 'score', 'target_id')
+    for source_id, score, target_id in rows:
+        current[source_id].append((score, target_id))
+
+    patched = {}
+    for source_id in affected:
+        existing = current[source_id]
+        ranked = [entry for entry in existing if entry[1] != page_id]
+        if source_id in scores:
+            # Cosine similarity is symmetric, so the page's score against
+            # this source is also the source's score against the page.
+            ranked.append((scores[source_id], page_id))
+        ranked = heapq.nlargest(top_k, ranked)
+        if ranked != sorted(existing, reverse=True):
+            patched[source_id] = ranked
+
+    if patched:
+        store_neighbours(patched)
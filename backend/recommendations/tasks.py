@@ -0,0 +1,19 @@
+from celery import shared_task
+from .similarity import rebuild_recommendations as rebuild, update_recommendations_for
+
+
+@shared_task
+def rebuild_recommendations(top_k=None, chunk_size=None):
+    options = {}
+    if top_k:
+        options['top_k'] = top_k
+    if chunk_size:
+        options['chunk_size'] = chunk_size
+    scored = rebuild(**options)
+    print(f"[CELERY] Rebuilt recommendations for {scored} pages")
+    return scored
+
+
+@shared_task
+def update_recommendations(content_id):
+    update_recommendations_for(content_id)
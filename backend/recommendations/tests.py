@@ -1,3 +1,122 @@
+from unittest import mock
 from django.test import TestCase
+from content.models import PageContent
+from .models import ContentToken, Recommendation
+from .services import get_recommendations_for
+from .similarity import (
+    CorpusStats, corpus_size, inverse_document_frequency, rebuild_recommendations, update_recommendations_for,
+)
 
-# Create your tests here.
+
+@mock.patch('recommendations.tasks.update_recommendations.delay')
+@mock.patch('content.models.schedule_static_regeneration')
+class RecommendationIndexTests(TestCase):
+    def tokens(self, page):
+        return dict(ContentToken.objects.filter(content=page).values_list('token', 'count'))
+
+    def test_index_follows_content_changes(self, regenerate, update):
+        page = PageContent.objects.create(title='Django caching', body='Caching views')
+        self.assertEqual(self.tokens(page), {'django': 3, 'caching': 4, 'views': 1, 'type:article': 1})
+
+        page.title = 'Django testing'
+        page.save()
+        self.assertEqual(self.tokens(page), {'django': 3, 'testing': 3, 'caching': 1, 'views': 1, 'type:article': 1})
+
+
+@mock.patch('recommendations.tasks.update_recommendations.delay')
+@mock.patch('content.models.schedule_static_regeneration')
+class RecommendationTests(TestCase):
+    def create(self, title, body, is_published=True):
+        return PageContent.objects.create(title=title, body=body, is_published=is_published)
+
+    def test_small_corpora_keep_shared_tokens(self, regenerate, update):
+        for total, df in [(2, 2), (3, 2), (10, 6)]:
+            self.assertIsNotNone(inverse_document_frequency(total, df))
+        self.assertIsNone(inverse_document_frequency(1000, 600))
+        # A stale corpus size smaller than the document frequency
+        self.assertGreater(inverse_document_frequency(0, 5), 0)
+
+    def test_rebuild_counts_bulk_created_pages(self, regenerate, update):
+        PageContent.objects.bulk_create([
+            PageContent(title=f'Django caching {number}', slug=f'django-caching-{number}', body='Redis cache',
+                        is_published=True)
+            for number in range(3)
+        ])
+        stats = CorpusStats.rebuild()
+        self.assertEqual(stats.total, 3)
+        self.assertEqual(corpus_size(), 3)
+
+    def test_corpus_size_counts_published_pages(self, regenerate, update):
+        self.create('Django caching', 'Redis cache')
+        draft = self.create('Django drafts', 'Not yet', is_published=False)
+        self.assertEqual(corpus_size(), 1)
+        draft.is_published = True
+        draft.save()
+        self.assertEqual(corpus_size(), 2)
+
+    def test_champion_lists_in_one_query(self, regenerate, update):
+        source = self.create('Django caching', 'Redis cache')
+        other = self.create('Django caching again', 'Redis cache')
+        rebuild_recommendations()
+        stats = CorpusStats()
+
+        with self.assertNumQueries(1):
+            postings = stats.postings(stats.idf)
+        self.assertEqual(set(postings), set(stats.idf))
+        self.assertEqual([content_id for content_id, _, _ in postings['redis']], [source.pk, other.pk])
+        self.assertEqual([content_id for content_id, _, _ in postings['again']], [other.pk])
+
+    def test_recommendations_ranked_by_similarity(self, regenerate, update):
+        source = self.create('Django caching guide', 'Cache views and querysets with Redis.')
+        close = self.create('Caching in Django', 'Redis cache backends for views and querysets.')
+        distant = self.create('Django forms guide', 'Validating forms and widgets.')
+        self.create('Django caching drafts', 'Redis cache views querysets.', is_published=False)
+        self.create('Gardening', 'Tomatoes need sun.')
+        self.create('Baking', 'Bread needs flour.')
+        self.create('Cycling', 'Tyres need air.')
+
+        rebuild_recommendations()
+
+        recommended = list(get_recommendations_for(source.slug))
+        self.assertEqual(recommended[:2], [close, distant])
+        self.assertNotIn('Django caching drafts', [page.title for page in recommended])
+        self.assertEqual(Recommendation.objects.filter(source=source).first().target, close)
+
+    def test_served_with_one_query(self, regenerate, update):
+        source = self.create('Django caching', 'Redis cache')
+        other = self.create('Django caching again', 'Redis cache')
+        rebuild_recommendations()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(get_recommendations_for(source.slug)), [other])
+
+    def test_unknown_slug(self, regenerate, update):
+        self.assertEqual(list(get_recommendations_for('missing')), [])
+
+    def test_incremental_update_patches_affected_lists(self, regenerate, update):
+        source = self.create('Django caching guide', 'Cache views and querysets with Redis.')
+        self.create('Django forms guide', 'Validating forms and widgets.')
+        self.create('Python packaging', 'Wheels and sdists.')
+        edited = self.create('Gardening', 'Tomatoes need sun.')
+        rebuild_recommendations()
+        self.assertNotEqual(list(get_recommendations_for(source.slug))[0], edited)
+
+        edited.title = 'Redis caching'
+        edited.body = 'Cache querysets and views in Redis.'
+        edited.save()
+        update_recommendations_for(edited.pk)
+
+        self.assertEqual(list(get_recommendations_for(source.slug))[0], edited)
+        self.assertEqual(list(get_recommendations_for(edited.slug))[0], source)
+
+    def test_unpublished_page_is_evicted(self, regenerate, update):
+        source = self.create('Django caching', 'Redis cache')
+        other = self.create('Django caching again', 'Redis cache')
+        rebuild_recommendations()
+
+        other.is_published = False
+        other.save()
+        update_recommendations_for(other.pk)
+
+        self.assertFalse(Recommendation.objects.filter(target=other).exists())
+        self.assertEqual(list(get_recommendations_for(source.slug)), [])
@@ -0,0 +1,22 @@
+import re
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Words too common to say anything about how two pages relate
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how',
+    'in', 'is', 'it', 'of', 'on', 'or', 'our', 'that', 'the', 'this', 'to',
+    'was', 'we', 'what', 'with', 'you', 'your',
+})
+
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, dropping stop words."""
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if token not in STOP_WORDS and len(token) <= MAX_TOKEN_LENGTH
+    ]
@@ -1,10 +1,25 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from content.async_api import AsyncAPIView
 from content.serializers import PageContentListSerializer
 from .services import get_recommendations_for
 
 @api_view(['GET'])
 def get_recommendations(request, slug):
-    recommended = get_recommendations_for(slug)
+    # The list serializer has no use for the body
+    recommended = get_recommendations_for(slug).defer('body')
     serializer = PageContentListSerializer(recommended, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+# Read from a replica (see backend.db_routers); api_view has no decorator for it
+get_recommendations.cls.replica_reads = True
+
+
+class AsyncRecommendations(AsyncAPIView):
+    """``get_recommendations`` for ASGI."""
+    replica_reads = True
+
+    async def get(self, request, slug):
+        recommended = [content async for content in get_recommendations_for(slug).defer('body')]
+        return Response(PageContentListSerializer(recommended, many=True).data)
@@ -0,0 +1,131 @@
+"""
+JWT authentication that resolves users from a per-process cache.
+
+A valid access token names its user by id; ``JWTAuthentication`` loads that
+user from the database on every request. ``CachedJWTAuthentication`` keeps
+the loaded users in a bounded LRU for ``USER_TTL`` seconds. Saving or
+deleting a user (a role change, deactivation, a new password) evicts it in
+the process that made the change; other processes pick the change up when
+their entry expires, so ``USER_TTL`` bounds how long they may act on the old
+row. ``QuerySet.update()`` sends no signals and is bounded the same way.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+DEFAULTS = {
+    'USER_CACHE_SIZE': 10_000,
+    'USER_TTL': 60,
+    # Blacklisted refresh tokens the filter is sized for before it grows,
+    # and the share of other tokens it may send to the database
+    'BLACKLIST_CAPACITY': 100_000,
+    'BLACKLIST_ERROR_RATE': 0.001,
+    # Expired outstanding tokens deleted per statement and per purge run
+    'PURGE_BATCH_SIZE': 1000,
+    'PURGE_MAX_BATCHES': 50,
+}
+
+
+def jwt_cache_setting(name):
+    return getattr(settings, 'JWT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class UserCache:
+    """Least recently used users by id, each kept for at most ``ttl`` seconds.
+
+    Callers get their own copy of a cached user, so changes a request makes
+    to ``request.user`` do not leak into the next one.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped by every eviction, so a load that started before one is
+        # not stored afterwards
+        self.generation = 0
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        return copy.copy(user)
+
+    def put(self, user_id, user, generation):
+        with self.lock:
+            if generation != self.generation or self.size <= 0:
+                return
+            self.entries[user_id] = (copy.copy(user), time.monotonic() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(user_id, None)
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache(jwt_cache_setting('USER_CACHE_SIZE'), jwt_cache_setting('USER_TTL'))
+    return _user_cache
+
+
+def forget_user(user):
+    # Tokens carry the id as a string
+    get_user_cache().evict(str(getattr(user, api_settings.USER_ID_FIELD)))
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    global _user_cache
+    if setting in ('JWT_CACHE', 'SIMPLE_JWT'):
+        _user_cache = None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves the token's user from the process's UserCache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user_id = str(user_id)
+        cache = get_user_cache()
+        user = cache.get(user_id)
+        if user is None:
+            generation = cache.generation
+            # Inactive and missing users raise here and are never cached
+            user = super().get_user(validated_token)
+            cache.put(user_id, user, generation)
+            return user
+
+        # The revocation claim belongs to the token, so it is checked on every request
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
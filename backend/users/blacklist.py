@@ -0,0 +1,172 @@
+"""
+An in-memory filter in front of the refresh token blacklist.
+
+Every refresh and logout checks its token against ``BlacklistedToken``,
+and nearly every token checked is not on it. Each process keeps a Bloom
+filter of the blacklisted JTIs: a token the filter has never seen is not
+blacklisted, and only the rest (blacklisted ones and about
+``BLACKLIST_ERROR_RATE`` of the others) are looked up in the database.
+
+A filter that is missing a JTI would let a revoked token through, so the
+filter is kept in step through the Django cache. When a blacklisting
+commits, ``publish_blacklisted`` bumps a generation number and stores the
+JTI under that generation; a process that finds the generation moved adds
+the JTIs it missed, and rebuilds the filter from the table when one of them
+is gone from the cache. Processes only see each other's blacklistings when
+they share a cache backend, so with a per-process one (LocMemCache,
+DummyCache) the filter is skipped and every check goes to the table.
+"""
+import hashlib
+import math
+import secrets
+import threading
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import jwt_cache_setting
+
+GENERATION_KEY = 'users:blacklist:generation'
+JTI_KEY = 'users:blacklist:jti:{}'
+# How long a published JTI stays in the cache for processes catching up;
+# one that falls further behind rebuilds instead
+JTI_TTL = 24 * 60 * 60
+# Generations a process catches up on one by one before it rebuilds
+MAX_CATCH_UP = 1000
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & 1 << (position & 7) for position in self._positions(value))
+
+
+def cache_is_shared():
+    # Blacklistings made by other processes never reach a per-process cache
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _start():
+    # A generation key lost from the cache restarts at a random number, so
+    # it does not count up again through numbers a process has seen
+    return secrets.randbits(48)
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _start(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _bump_generation():
+    current_generation()
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        generation = _start()
+        cache.set(GENERATION_KEY, generation, None)
+        return generation
+
+
+def publish_blacklisted(jti):
+    """Tell every process's filter that ``jti`` is blacklisted. Call once the row has committed."""
+    cache.set(JTI_KEY.format(_bump_generation()), jti, JTI_TTL)
+
+
+def invalidate_filters():
+    """Have every process rebuild its filter, e.g. after blacklisted rows were deleted."""
+    _bump_generation()
+
+
+class BlacklistFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = None
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def might_contain(self, jti):
+        if not cache_is_shared():
+            return True
+        generation = current_generation()
+        if generation is None:
+            return True
+        if generation != self.generation:
+            self.sync(generation)
+        return jti in self.bloom
+
+    def sync(self, generation):
+        with self.lock:
+            if generation == self.generation:
+                return
+            behind = generation - self.generation if self.generation is not None else None
+            if behind is not None and 0 < behind <= MAX_CATCH_UP:
+                keys = [JTI_KEY.format(number) for number in range(self.generation + 1, generation + 1)]
+                missed = cache.get_many(keys)
+                if len(missed) == behind and self.bloom.count + behind <= self.bloom.capacity:
+                    for jti in missed.values():
+                        self.bloom.add(jti)
+                    self.generation = generation
+                    return
+            self.rebuild(generation)
+
+    def rebuild(self, generation):
+        # ``generation`` was read before the table, so anything committed
+        # since is announced by a later one
+        jtis = list(BlacklistedToken.objects.values_list('token__jti', flat=True).iterator())
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.generation = generation
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_filter():
+    global _filter
+    if _filter is None:
+        with _filter_lock:
+            if _filter is None:
+                _filter = BlacklistFilter(jwt_cache_setting('BLACKLIST_CAPACITY'), jwt_cache_setting('BLACKLIST_ERROR_RATE'))
+    return _filter
+
+
+@receiver(setting_changed)
+def reset_filter(setting, **kwargs):
+    global _filter
+    if setting in ('JWT_CACHE', 'CACHES'):
+        _filter = None
+
+
+class RefreshToken(tokens.RefreshToken):
+    """simplejwt's RefreshToken, checking the process's filter before the blacklist table."""
+
+    def check_blacklist(self):
+        if get_filter().might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import forget_user
+from .blacklist import publish_blacklisted
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -8,4 +12,26 @@ class CustomUser(AbstractUser):
         ('author', 'Author'),
         ('viewer', 'Viewer'),
     )
-    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='viewer')
\ No newline at end of file
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='viewer')
+
+    def save(self, *args, **kwargs):
+        # The active user count is adjusted in pre_save (see content.models),
+        # so it must roll back with a save that fails
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(CustomUser, instance=self)):
+            super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def evict_cached_user(sender, instance, **kwargs):
+    # Evicted again on commit: a request reading the user in between would
+    # have cached the row as it was before this change
+    forget_user(instance)
+    transaction.on_commit(lambda: forget_user(instance))
+
+
+@receiver(post_save, sender='token_blacklist.BlacklistedToken')
+def announce_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        jti = instance.token.jti
+        transaction.on_commit(lambda: publish_blacklisted(jti))
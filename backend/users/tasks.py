@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from .authentication import jwt_cache_setting
+from .blacklist import invalidate_filters
+
+
+def purge_expired_tokens(batch_size=None, max_batches=None):
+    """Delete up to ``max_batches`` batches of expired outstanding tokens. Returns the number deleted.
+
+    Their blacklist entries go with them (on_delete=CASCADE). Tokens are
+    issued with a fixed lifetime, so the oldest ids expire first and a batch
+    taken in id order is found near the start of the table.
+    """
+    batch_size = batch_size or jwt_cache_setting('PURGE_BATCH_SIZE')
+    max_batches = max_batches or jwt_cache_setting('PURGE_MAX_BATCHES')
+    now = timezone.now()
+    deleted = 0
+    for _ in range(max_batches):
+        ids = list(OutstandingToken.objects.filter(expires_at__lt=now).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    if deleted:
+        # Drop the purged JTIs from every process's blacklist filter
+        invalidate_filters()
+    return deleted
+
+
+@shared_task
+def purge_expired_outstanding_tokens(batch_size=None, max_batches=None):
+    deleted = purge_expired_tokens(batch_size, max_batches)
+    print(f"[CELERY] Purged {deleted} expired outstanding tokens")
+    return deleted
@@ -1,3 +1,138 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from backend.throttling import SQLiteRateStore, SharedRateThrottle
+from . import authentication, blacklist
+from .blacklist import RefreshToken
+from .models import CustomUser
+from .tasks import purge_expired_tokens
 
-# Create your tests here.
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication.reset_user_cache(setting='JWT_CACHE')
+        self.user = CustomUser.objects.create_user('ada', password='analytical-engine', role='viewer')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        return response, [query for query in queries if 'users_customuser' in query['sql']]
+
+    def test_user_is_loaded_once(self):
+        self.assertEqual(len(self.user_queries()[1]), 1)
+        self.assertEqual(self.user_queries()[1], [])
+
+    def test_saving_the_user_evicts_it(self):
+        self.user_queries()
+        self.user.role = 'editor'
+        self.user.save()
+        response, queries = self.user_queries()
+        self.assertEqual(response.data['role'], 'editor')
+        self.assertEqual(len(queries), 1)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+def shared_cache(test):
+    """Give ``test`` a default cache that processes could share."""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name,
+    }})
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class BlacklistFilterTests(TestCase):
+    def setUp(self):
+        shared_cache(self)
+        blacklist.reset_filter(setting='JWT_CACHE')
+        self.user = CustomUser.objects.create_user('grace', password='compiler-a0')
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return APIClient().post('/api/auth/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_fresh_token_skips_the_blacklist_table(self):
+        token = RefreshToken.for_user(self.user)
+        blacklist.get_filter().might_contain('warm-up')
+        with CaptureQueriesContext(connection) as queries:
+            RefreshToken(str(token))
+        self.assertFalse([query for query in queries if 'blacklistedtoken' in query['sql']])
+
+    def test_rotated_token_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_catches_up_with_other_processes(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(blacklist.get_filter().might_contain(str(token['jti'])))
+        # As another process would announce it
+        blacklist.publish_blacklisted(token['jti'])
+        self.assertTrue(blacklist.get_filter().might_contain(token['jti']))
+
+    def test_per_process_cache_checks_the_table(self):
+        token = RefreshToken.for_user(self.user)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with CaptureQueriesContext(connection) as queries:
+                RefreshToken(str(token))
+        self.assertTrue([query for query in queries if 'blacklistedtoken' in query['sql']])
+
+    def test_purge_deletes_expired_tokens(self):
+        expired = timezone.now() - timedelta(minutes=1)
+        for index in range(5):
+            outstanding = OutstandingToken.objects.create(user=self.user, jti=f'old-{index}', token='', expires_at=expired)
+            BlacklistedToken.objects.create(token=outstanding)
+        RefreshToken.for_user(self.user)
+
+        self.assertEqual(purge_expired_tokens(batch_size=2, max_batches=2), 4)
+        self.assertEqual(purge_expired_tokens(batch_size=2), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/throttle.sqlite3'
+        override = override_settings(THROTTLING={'PATH': self.path})
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(SharedRateThrottle, 'THROTTLE_RATES', {'user': '100/day', 'login': '2/min', 'register': '1/hour'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_store_allows_bursts_then_spaces_requests(self):
+        store = SQLiteRateStore(self.path)
+        self.assertEqual([store.acquire('client', 10, 30) for _ in range(3)], [None] * 3)
+        self.assertAlmostEqual(store.acquire('client', 10, 30), 10, delta=1)
+        self.assertIsNone(store.acquire('other', 10, 30))
+
+    def test_login_is_limited_with_retry_after(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.post('/api/auth/login/', {'username': 'nobody', 'password': 'x'}).status_code, 401)
+        response = client.post('/api/auth/login/', {'username': 'nobody', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']), 30)
+        # Other addresses and scopes keep their own allowance
+        self.assertEqual(client.post('/api/auth/login/', {'username': 'nobody', 'password': 'x'},
+                                     REMOTE_ADDR='10.0.0.2').status_code, 401)
+        self.assertEqual(client.post('/api/auth/register/', {}).status_code, 400)
+        self.assertEqual(client.post('/api/auth/register/', {}).status_code, 429)
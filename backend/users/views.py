@@ -2,15 +2,16 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import authenticate
+from .blacklist import RefreshToken
 from .serializers import CustomTokenObtainPairSerializer, UserRegistrationSerializer, UserSerializer
 from .models import CustomUser
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'login'
 
 
 @api_view(['POST'])
@@ -28,6 +29,10 @@ def register(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# api_view has no decorator for the scope, so it is set on the view class
+register.cls.throttle_scope = 'register'
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout(request):